@@ -8,6 +8,7 @@ from click import command
 from datadog_sync.commands.shared.options import (
     common_options,
     destination_auth_options,
+    import_options,
     source_auth_options,
     storage_options,
 )
@@ -19,6 +20,7 @@ from datadog_sync.constants import Command
 @source_auth_options
 @destination_auth_options
 @common_options
+@import_options
 @storage_options
 def _import(**kwargs):
     """Import Datadog resources."""
@@ -9,6 +9,8 @@ from datadog_sync.commands.shared.options import (
     common_options,
     destination_auth_options,
     diffs_common_options,
+    import_options,
+    migrate_options,
     source_auth_options,
     sync_common_options,
     storage_options,
@@ -23,6 +25,8 @@ from datadog_sync.constants import Command
 @common_options
 @diffs_common_options
 @sync_common_options
+@migrate_options
+@import_options
 @storage_options
 def migrate(**kwargs):
     """Migrate Datadog resources from one datacenter to another."""
@@ -16,10 +16,7 @@ def run_cmd(cmd: Command, **kwargs):
     try:
         asyncio.run(run_cmd_async(cfg, handler, cmd))
     except KeyboardInterrupt:
-        cfg.logger.error("Process interrupted by user")
         if cmd in [Command.SYNC, Command.MIGRATE, Command.RESET]:
-            cfg.logger.info("Writing synced resources to disk before exit...")
-            cfg.state.dump_state()
             exit(0)
 
     if cfg.logger.exception_logged:
@@ -42,8 +39,11 @@ async def run_cmd_async(cfg: Configuration, handler: ResourcesHandler, cmd: Comm
         elif cmd == Command.DIFFS:
             await handler.diffs()
         elif cmd == Command.MIGRATE:
-            await handler.import_resources()
-            await handler.apply_resources()
+            if cfg.pipelined_migrate:
+                await handler.migrate_resources()
+            else:
+                await handler.import_resources()
+                await handler.apply_resources()
         elif cmd == Command.RESET:
             await handler.reset()
         else:
@@ -51,8 +51,15 @@ async def run_cmd_async(cfg: Configuration, handler: ResourcesHandler, cmd: Comm
             return
 
         cfg.logger.info(f"Finished {cmd.value}")
+    except (asyncio.CancelledError, KeyboardInterrupt):
+        # Interrupted, the state is written before exit_async() closes it
+        cfg.logger.error("Process interrupted by user")
+        if cmd in [Command.SYNC, Command.MIGRATE, Command.RESET]:
+            cfg.logger.info("Writing synced resources to disk before exit...")
+            cfg.state.dump_state()
+        raise
     finally:
         await cfg.exit_async()
-        # Disable progress bar so it doesn't interfere with the logger
-        if handler.worker and handler.worker.pbar:
-            handler.worker.pbar.disable = True
+        # Stop progress reporting so it doesn't interfere with the logger
+        if handler.worker and handler.worker.progress:
+            handler.worker.progress.close()
@@ -14,8 +14,30 @@ DD_DESTINATION_API_KEY = "DD_DESTINATION_API_KEY"
 DD_DESTINATION_APP_KEY = "DD_DESTINATION_APP_KEY"
 DD_HTTP_CLIENT_RETRY_TIMEOUT = "DD_HTTP_CLIENT_RETRY_TIMEOUT"
 DD_HTTP_CLIENT_TIMEOUT = "DD_HTTP_CLIENT_TIMEOUT"
+DD_HTTP_CLIENT_RETRY_BASE_DELAY = "DD_HTTP_CLIENT_RETRY_BASE_DELAY"
+DD_HTTP_CLIENT_RETRY_MAX_DELAY = "DD_HTTP_CLIENT_RETRY_MAX_DELAY"
+DD_HTTP_CLIENT_RETRY_BUDGET = "DD_HTTP_CLIENT_RETRY_BUDGET"
+DD_HTTP_CLIENT_CONNECTION_LIMIT = "DD_HTTP_CLIENT_CONNECTION_LIMIT"
+DD_HTTP_CLIENT_CONNECTION_LIMIT_PER_HOST = "DD_HTTP_CLIENT_CONNECTION_LIMIT_PER_HOST"
+DD_HTTP_CLIENT_KEEPALIVE_TIMEOUT = "DD_HTTP_CLIENT_KEEPALIVE_TIMEOUT"
+DD_HTTP_CLIENT_DNS_CACHE_TTL = "DD_HTTP_CLIENT_DNS_CACHE_TTL"
+DD_HTTP_CLIENT_PROXY = "DD_HTTP_CLIENT_PROXY"
+DD_HTTP_CLIENT_PAGE_CONCURRENCY = "DD_HTTP_CLIENT_PAGE_CONCURRENCY"
+DD_HTTP_CLIENT_REQUEST_COMPRESSION = "DD_HTTP_CLIENT_REQUEST_COMPRESSION"
+DD_HTTP_CLIENT_REQUEST_COMPRESSION_THRESHOLD = "DD_HTTP_CLIENT_REQUEST_COMPRESSION_THRESHOLD"
+DD_HTTP_CLIENT_MEMOIZE_LISTINGS = "DD_HTTP_CLIENT_MEMOIZE_LISTINGS"
 DD_RESOURCES = "DD_RESOURCES"
 MAX_WORKERS = "MAX_WORKERS"
+DD_RESOURCE_CONCURRENCY = "DD_RESOURCE_CONCURRENCY"
+DD_ADAPTIVE_CONCURRENCY = "DD_ADAPTIVE_CONCURRENCY"
+DD_PIPELINED_MIGRATE = "DD_PIPELINED_MIGRATE"
+DD_PROGRESS = "DD_PROGRESS"
+DD_HTTP_STATS_FILE = "DD_HTTP_STATS_FILE"
+DD_CPU_WORKERS = "DD_CPU_WORKERS"
+DD_HTTP_CACHE = "DD_HTTP_CACHE"
+DD_HTTP_CACHE_PATH = "DD_HTTP_CACHE_PATH"
+DD_STATE_JOURNAL = "DD_STATE_JOURNAL"
+DD_STATE_JOURNAL_COMPACT_INTERVAL = "DD_STATE_JOURNAL_COMPACT_INTERVAL"
 DD_FILTER = "DD_FILTER"
 DD_FILTER_OPERATOR = "DD_FILTER_OPERATOR"
 DD_CLEANUP = "DD_CLEANUP"
@@ -23,14 +45,39 @@ DD_VALIDATE = "DD_VALIDATE"
 DD_VERIFY_DDR_STATUS = "DD_VERIFY_DDR_STATUS"
 
 LOCAL_STORAGE_TYPE = "local"
+LOCAL_SHARDED_STORAGE_TYPE = "local-sharded"
 S3_STORAGE_TYPE = "s3"
+SQLITE_STORAGE_TYPE = "sqlite"
 STORAGE_TYPES = [
     LOCAL_STORAGE_TYPE,
+    LOCAL_SHARDED_STORAGE_TYPE,
     S3_STORAGE_TYPE,
+    SQLITE_STORAGE_TYPE,
+]
+
+PROGRESS_AUTO = "auto"
+PROGRESS_BAR = "bar"
+PROGRESS_LOG = "log"
+PROGRESS_OFF = "off"
+PROGRESS_MODES = [
+    PROGRESS_AUTO,
+    PROGRESS_BAR,
+    PROGRESS_LOG,
+    PROGRESS_OFF,
+]
+
+COMPRESSION_NONE = "none"
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_DEFLATE = "deflate"
+COMPRESSION_TYPES = [
+    COMPRESSION_NONE,
+    COMPRESSION_GZIP,
+    COMPRESSION_DEFLATE,
 ]
 
 DD_DESTINATION_RESOURCES_PATH = "DD_DESTINATION_RESOURCES_PATH"
 DD_SOURCE_RESOURCES_PATH = "DD_SOURCE_RESOURCES_PATH"
+DD_SQLITE_PATH = "DD_SQLITE_PATH"
 
 # S3 env parameter names
 AWS_ACCESS_KEY_ID = "AWS_ACCESS_KEY_ID"
@@ -62,8 +109,13 @@ FORCE = 2
 # State parameters
 SOURCE_PATH_PARAM = "source_resources_path"
 SOURCE_PATH_DEFAULT = "resources/source"
+HTTP_CACHE_DIR = ".http_cache"
 DESTINATION_PATH_PARAM = "destination_resources_path"
 DESTINATION_PATH_DEFAULT = "resources/destination"
+STATE_JOURNAL_FILE = ".state_journal"
+SQLITE_PATH_PARAM = "sqlite_path"
+SQLITE_PATH_DEFAULT = "resources/state.db"
+STATE_JOURNAL_COMPACT_INTERVAL_DEFAULT = 1000
 
 
 # Commands
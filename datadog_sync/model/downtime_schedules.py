@@ -3,7 +3,7 @@
 # This product includes software developed at Datadog (https://www.datadoghq.com/).
 # Copyright 2019 Datadog, Inc.
 from __future__ import annotations
-from typing import TYPE_CHECKING, Optional, List, Dict, Tuple
+from typing import TYPE_CHECKING, AsyncIterator, Optional, List, Dict, Tuple
 from datetime import datetime, timedelta
 from dateutil.parser import parse
 
@@ -44,14 +44,12 @@ class DowntimeSchedules(BaseResource):
     )
     # Additional DowntimeSchedules specific attributes
 
-    async def get_resources(self, client: CustomClient) -> List[Dict]:
-        resp = await client.paginated_request(client.get)(
+    def paginated_resources(self, client: CustomClient) -> AsyncIterator[List[Dict]]:
+        return client.paginated_pages(client.get)(
             self.resource_config.base_path,
             pagination_config=self.pagination_config,
         )
 
-        return resp
-
     async def import_resource(self, _id: Optional[str] = None, resource: Optional[Dict] = None) -> Tuple[str, Dict]:
         if _id:
             source_client = self.config.source_client
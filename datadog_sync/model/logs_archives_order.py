@@ -37,7 +37,7 @@ class LogsArchivesOrderIdsComparator(BaseOperator):
 class LogsArchivesOrder(BaseResource):
     resource_type = "logs_archives_order"
     resource_config = ResourceConfig(
-        concurrent=False,
+        max_concurrency=1,
         base_path="/api/v2/logs/config/archive-order",
         resource_connections={
             "logs_archives": ["data.attributes.archive_ids"],
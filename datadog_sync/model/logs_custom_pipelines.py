@@ -16,7 +16,7 @@ if TYPE_CHECKING:
 class LogsCustomPipelines(BaseResource):
     resource_type = "logs_custom_pipelines"
     resource_config = ResourceConfig(
-        concurrent=False,
+        max_concurrency=1,
         base_path="/api/v1/logs/config/pipelines",
         excluded_attributes=["id", "type", "is_read_only"],
     )
@@ -16,7 +16,7 @@ class LogsIndexes(BaseResource):
     resource_type = "logs_indexes"
     resource_config = ResourceConfig(
         base_path="/api/v1/logs/config/indexes",
-        concurrent=False,
+        max_concurrency=1,
         excluded_attributes=[
             "is_rate_limited",
         ],
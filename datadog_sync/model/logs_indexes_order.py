@@ -16,7 +16,7 @@ if TYPE_CHECKING:
 class LogsIndexesOrder(BaseResource):
     resource_type = "logs_indexes_order"
     resource_config = ResourceConfig(
-        concurrent=False,
+        max_concurrency=1,
         base_path="/api/v1/logs/config/index-order",
         resource_connections={
             "logs_indexes": ["index_names"],
@@ -19,7 +19,7 @@ if TYPE_CHECKING:
 class LogsPipelines(BaseResource):
     resource_type = "logs_pipelines"
     resource_config = ResourceConfig(
-        concurrent=False,
+        max_concurrency=1,
         base_path="/api/v1/logs/config/pipelines",
         excluded_attributes=["id", "type", "__datadog_sync_invalid", "meta"],
         non_nullable_attr=[
@@ -16,7 +16,7 @@ if TYPE_CHECKING:
 class LogsPipelinesOrder(BaseResource):
     resource_type = "logs_pipelines_order"
     resource_config = ResourceConfig(
-        concurrent=False,
+        max_concurrency=1,
         base_path="/api/v1/logs/config/pipeline-order",
         resource_connections={
             "logs_pipelines": ["pipeline_ids"],
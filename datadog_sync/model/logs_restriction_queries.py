@@ -4,7 +4,7 @@
 # Copyright 2019 Datadog, Inc.
 
 from __future__ import annotations
-from typing import TYPE_CHECKING, Any, Optional, List, Dict, Tuple
+from typing import TYPE_CHECKING, AsyncIterator, Any, Optional, List, Dict, Tuple
 
 from datadog_sync.utils.base_resource import BaseResource, ResourceConfig
 from datadog_sync.utils.custom_client import PaginationConfig
@@ -33,11 +33,10 @@ class LogsRestrictionQueries(BaseResource):
     )
     logs_restriction_query_roles_path: str = "/api/v2/logs/config/restriction_queries/{}/roles"
 
-    async def get_resources(self, client: CustomClient) -> List[Dict]:
-        resp = await client.paginated_request(client.get)(
+    def paginated_resources(self, client: CustomClient) -> AsyncIterator[List[Dict]]:
+        return client.paginated_pages(client.get)(
             self.resource_config.base_path, pagination_config=self.pagination_config
         )
-        return resp
 
     async def import_resource(
         self, _id: Optional[str] = None, resource: Optional[Dict[str, Any]] = None
@@ -5,7 +5,7 @@
 
 from __future__ import annotations
 import re
-from typing import TYPE_CHECKING, Optional, List, Dict, Tuple, cast
+from typing import TYPE_CHECKING, AsyncIterator, Optional, List, Dict, Tuple, cast
 
 from datadog_sync.utils.base_resource import BaseResource, ResourceConfig, TaggingConfig
 from datadog_sync.utils.custom_client import PaginationConfig
@@ -49,13 +49,11 @@ class Monitors(BaseResource):
         response_list_accessor=None,
     )
 
-    async def get_resources(self, client: CustomClient) -> List[Dict]:
-        resp = await client.paginated_request(client.get)(
+    def paginated_resources(self, client: CustomClient) -> AsyncIterator[List[Dict]]:
+        return client.paginated_pages(client.get)(
             self.resource_config.base_path, pagination_config=self.pagination_config
         )
 
-        return resp
-
     async def import_resource(self, _id: Optional[str] = None, resource: Optional[Dict] = None) -> Tuple[str, Dict]:
         if _id:
             source_client = self.config.source_client
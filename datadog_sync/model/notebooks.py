@@ -4,7 +4,7 @@
 # Copyright 2019 Datadog, Inc.
 
 from __future__ import annotations
-from typing import TYPE_CHECKING, Optional, List, Dict, Tuple, cast
+from typing import TYPE_CHECKING, AsyncIterator, Optional, List, Dict, Tuple, cast
 
 from datadog_sync.utils.base_resource import BaseResource, ResourceConfig
 from datadog_sync.utils.custom_client import PaginationConfig
@@ -39,13 +39,11 @@ class Notebooks(BaseResource):
         page_number_func=lambda idx, page_size, page_number: page_size * (idx + 1),
     )
 
-    async def get_resources(self, client: CustomClient) -> List[Dict]:
-        resp = await client.paginated_request(client.get)(
+    def paginated_resources(self, client: CustomClient) -> AsyncIterator[List[Dict]]:
+        return client.paginated_pages(client.get)(
             self.resource_config.base_path, params={"include_cells": "true"}, pagination_config=self.pagination_config
         )
 
-        return resp
-
     async def import_resource(self, _id: Optional[str] = None, resource: Optional[Dict] = None) -> Tuple[str, Dict]:
         if _id:
             source_client = self.config.source_client
@@ -2,7 +2,7 @@
 # under the 3-clause BSD style license (see LICENSE).
 # This product includes software developed at Datadog (https://www.datadoghq.com/).
 # Copyright 2019 Datadog, Inc.
-from typing import Optional, List, Dict, Tuple
+from typing import AsyncIterator, Optional, List, Dict, Tuple
 
 from datadog_sync.utils.base_resource import BaseResource, ResourceConfig
 from datadog_sync.utils.custom_client import CustomClient, PaginationConfig
@@ -27,14 +27,12 @@ class Powerpacks(BaseResource):
         remaining_func=lambda *args: 1,
     )
 
-    async def get_resources(self, client: CustomClient) -> List[Dict]:
-        resp = await client.paginated_request(client.get)(
+    def paginated_resources(self, client: CustomClient) -> AsyncIterator[List[Dict]]:
+        return client.paginated_pages(client.get)(
             self.resource_config.base_path,
             pagination_config=self.pagination_config,
         )
 
-        return resp
-
     async def import_resource(self, _id: Optional[str] = None, resource: Optional[Dict] = None) -> Tuple[str, Dict]:
         if _id:
             source_client = self.config.source_client
@@ -5,7 +5,7 @@
 
 from __future__ import annotations
 import copy
-from typing import TYPE_CHECKING, Optional, List, Dict, Tuple, cast
+from typing import AsyncIterator, TYPE_CHECKING, Optional, List, Dict, Tuple, cast
 
 from datadog_sync.utils.base_resource import BaseResource, ResourceConfig
 from datadog_sync.utils.resource_utils import CustomClientHTTPError, check_diff
@@ -18,6 +18,8 @@ class Roles(BaseResource):
     resource_type = "roles"
     resource_config = ResourceConfig(
         base_path="/api/v2/roles",
+        # Most resource types connect to roles, sync them first
+        priority=1,
         excluded_attributes=[
             "attributes.created_at",
             "attributes.created_by_handle",
@@ -34,10 +36,8 @@ class Roles(BaseResource):
     destination_roles_mapping: Optional[Dict] = None
     permissions_base_path: str = "/api/v2/permissions"
 
-    async def get_resources(self, client: CustomClient) -> List[Dict]:
-        resp = await client.paginated_request(client.get)(self.resource_config.base_path)
-
-        return resp
+    def paginated_resources(self, client: CustomClient) -> AsyncIterator[List[Dict]]:
+        return client.paginated_pages(client.get)(self.resource_config.base_path)
 
     async def import_resource(self, _id: Optional[str] = None, resource: Optional[Dict] = None) -> Tuple[str, Dict]:
         source_client = self.config.source_client
@@ -20,7 +20,7 @@ class SensitiveDataScannerGroups(BaseResource):
             "id",
             "relationships",
         ],
-        concurrent=False,
+        max_concurrency=1,
     )
     # Additional SensitiveDataScannerGroups specific attributes
 
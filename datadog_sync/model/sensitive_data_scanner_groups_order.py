@@ -38,7 +38,7 @@ class SensitiveDataScannerGroupsOrderIdsComparator(BaseOperator):
 class SensitiveDataScannerGroupsOrder(BaseResource):
     resource_type = "sensitive_data_scanner_groups_order"
     resource_config = ResourceConfig(
-        concurrent=False,
+        max_concurrency=1,
         base_path="/api/v2/sensitive-data-scanner/config",
         resource_connections={
             "sensitive_data_scanner_groups": ["groups"],
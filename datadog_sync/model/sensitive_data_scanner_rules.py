@@ -19,7 +19,7 @@ class SensitiveDataScannerRules(BaseResource):
             "id",
         ],
         resource_connections={"sensitive_data_scanner_groups": ["relationships.group.data.id"]},
-        concurrent=False,
+        max_concurrency=1,
     )
     # Additional SensitiveDataScannerRules specific attributes
     standard_pattern_path = "/api/v2/sensitive-data-scanner/standard-patterns"
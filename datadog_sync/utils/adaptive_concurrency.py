@@ -0,0 +1,107 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from datadog_sync.constants import LOGGER_NAME
+
+
+log = logging.getLogger(LOGGER_NAME)
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on the number of in-flight requests of a client.
+
+    The limit is halved when the API pushes back (429 or 5xx) and grows by roughly one per round trip while
+    latencies stay close to the observed baseline. Requests above the limit wait in `acquire()`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_limit: int,
+        min_limit: int = 1,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        decrease_cooldown: float = 1.0,
+    ) -> None:
+        self.name = name
+        self.max_limit = max(max_limit, min_limit)
+        self.min_limit = min_limit
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self.min_seen_limit = self.limit
+        self.congestion_count = 0
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.decrease_cooldown = decrease_cooldown
+        self._baseline_latency: Optional[float] = None
+        self._increase_credit = 0.0
+        self._last_decrease = 0.0
+        # Created lazily so it binds to the running event loop
+        self._condition: Optional[asyncio.Condition] = None
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name} client concurrency: {self.limit} (lowest: {self.min_seen_limit}, max: {self.max_limit}), "
+            f"throttled {self.congestion_count} times"
+        )
+
+    async def acquire(self) -> None:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self, latency: float) -> None:
+        if self._baseline_latency is None:
+            self._baseline_latency = latency
+        else:
+            self._baseline_latency = 0.9 * self._baseline_latency + 0.1 * latency
+
+        if self.limit >= self.max_limit or latency > self._baseline_latency * self.latency_tolerance:
+            return
+
+        # Additive increase of about one slot per round trip of the whole window
+        self._increase_credit += 1 / self.limit
+        if self._increase_credit >= 1:
+            self._increase_credit = 0.0
+            self._set_limit(self.limit + 1)
+
+    def on_congestion(self) -> None:
+        self.congestion_count += 1
+        now = time.monotonic()
+        # Requests in flight when the limit was hit will also fail; only back off once per burst
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+        self._last_decrease = now
+        self._increase_credit = 0.0
+        self._set_limit(int(self.limit * self.decrease_factor))
+
+    def _set_limit(self, limit: int) -> None:
+        limit = min(max(limit, self.min_limit), self.max_limit)
+        if limit == self.limit:
+            return
+
+        log.debug(f"{self.name} client concurrency changed from {self.limit} to {limit}")
+        grew = limit > self.limit
+        self.limit = limit
+        self.min_seen_limit = min(self.min_seen_limit, limit)
+        if grew and self._condition is not None:
+            asyncio.ensure_future(self._wake_waiters())
+
+    async def _wake_waiters(self) -> None:
+        async with self._condition:
+            self._condition.notify_all()
@@ -5,10 +5,9 @@
 
 from __future__ import annotations
 import abc
-from asyncio import Lock
 from collections import defaultdict
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING, ClassVar, Optional, Dict, List, Tuple
+from typing import TYPE_CHECKING, AsyncIterator, ClassVar, Optional, Dict, List, Tuple
 
 from datadog_sync.utils.custom_client import CustomClient
 from datadog_sync.utils.resource_utils import (
@@ -57,18 +56,19 @@ class ResourceConfig:
     non_nullable_attr: Optional[List[str]] = None
     null_values: Optional[Dict[str]] = None
     excluded_attributes: Optional[List[str]] = None
+    # Same as max_concurrency=1 when False, kept for existing models
     concurrent: bool = True
     deep_diff_config: dict = field(default_factory=lambda: {"ignore_order": True})
     tagging_config: Optional[TaggingConfig] = None
-    async_lock: Optional[Lock] = None
-
-    async def init_async(self) -> None:
-        self.async_lock = Lock()
+    # Max number of items of this resource type processed at once. `None` means bounded by `--max-workers` only.
+    max_concurrency: Optional[int] = None
+    # Ready items of resource types with a higher priority are handed to workers first.
+    priority: int = 0
 
     def __post_init__(self) -> None:
         self.build_excluded_attributes()
-        if not self.concurrent:
-            self.async_lock = Lock()
+        if not self.concurrent and self.max_concurrency is None:
+            self.max_concurrency = 1
 
     def build_excluded_attributes(self) -> None:
         if self.excluded_attributes:
@@ -84,16 +84,40 @@ class BaseResource(abc.ABC):
         self.config = config
 
     async def init_async(self):
-        await self.resource_config.init_async()
+        pass
+
+    def paginated_resources(self, client: CustomClient) -> Optional[AsyncIterator[List[Dict]]]:
+        """Returns the paginated listing of the resources, e.g. `client.paginated_pages(client.get)(path)`.
+
+        Resource types listed this way don't need to implement `get_resources`.
+        """
+        return None
 
-    @abc.abstractmethod
     async def get_resources(self, client: CustomClient) -> List[Dict]:
-        pass
+        pages = self.paginated_resources(client)
+        if pages is None:
+            raise NotImplementedError(f"{type(self).__name__} must implement get_resources or paginated_resources")
+        resources = []
+        async for page in pages:
+            resources.extend(page)
+        return resources
 
     async def _get_resources(self, client: CustomClient) -> List[Dict]:
         r = self.get_resources(client)
         return await r
 
+    async def get_resources_pages(self, client: CustomClient) -> AsyncIterator[List[Dict]]:
+        """Yields the resources page by page as the paginated listing is fetched, all at once otherwise."""
+        pages = self.paginated_resources(client)
+        if pages is None:
+            yield await self.get_resources(client)
+            return
+        async for page in pages:
+            yield page
+
+    def _get_resources_pages(self, client: CustomClient) -> AsyncIterator[List[Dict]]:
+        return self.get_resources_pages(client)
+
     @abc.abstractmethod
     async def import_resource(self, _id: Optional[str] = None, resource: Optional[Dict] = None) -> Tuple[str, Dict]:
         pass
@@ -132,7 +156,7 @@ class BaseResource(abc.ABC):
 
     async def _create_resource(self, _id: str, resource: Dict) -> None:
         _id, r = await self.create_resource(_id, resource)
-        self.config.state.destination[self.resource_type][_id] = r
+        self.config.state.set_destination(self.resource_type, _id, r)
 
     @abc.abstractmethod
     async def update_resource(self, _id: str, resource: Dict) -> Tuple[str, Dict]:
@@ -140,7 +164,7 @@ class BaseResource(abc.ABC):
 
     async def _update_resource(self, _id: str, resource: Dict) -> None:
         _id, r = await self.update_resource(_id, resource)
-        self.config.state.destination[self.resource_type][_id] = r
+        self.config.state.set_destination(self.resource_type, _id, r)
 
     @abc.abstractmethod
     async def delete_resource(self, _id: str) -> None:
@@ -151,12 +175,12 @@ class BaseResource(abc.ABC):
             await self.delete_resource(_id)
         except CustomClientHTTPError as e:
             if e.status_code == 404:
-                self.config.state.destination[self.resource_type].pop(_id, None)
+                self.config.state.remove_destination(self.resource_type, _id)
                 return None
 
             raise e
 
-        self.config.state.destination[self.resource_type].pop(_id, None)
+        self.config.state.remove_destination(self.resource_type, _id)
 
     @abc.abstractmethod
     def connect_id(self, key: str, r_obj: Dict, resource_to_connect: str) -> Optional[List[str]]:
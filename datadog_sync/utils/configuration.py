@@ -4,24 +4,37 @@
 # Copyright 2019 Datadog, Inc.
 
 from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
+import json
 import logging
+import multiprocessing
+import os
 import sys
 import time
 from typing import Any, Optional, Union, Dict, List
 
 from datadog_sync.constants import (
     Command,
+    Origin,
     AWS_CONFIG_PROPERTIES,
+    COMPRESSION_NONE,
     DESTINATION_PATH_DEFAULT,
     DESTINATION_PATH_PARAM,
     FALSE,
     FORCE,
+    HTTP_CACHE_DIR,
+    LOCAL_SHARDED_STORAGE_TYPE,
     LOCAL_STORAGE_TYPE,
     LOGGER_NAME,
+    PROGRESS_AUTO,
     S3_STORAGE_TYPE,
     SOURCE_PATH_DEFAULT,
     SOURCE_PATH_PARAM,
+    SQLITE_PATH_DEFAULT,
+    SQLITE_STORAGE_TYPE,
+    STATE_JOURNAL_COMPACT_INTERVAL_DEFAULT,
+    STATE_JOURNAL_FILE,
     TRUE,
     VALIDATE_ENDPOINT,
     VALID_DDR_STATES,
@@ -31,9 +44,10 @@ from datadog_sync.model.logs_pipelines import LogsPipelines
 from datadog_sync.model.logs_custom_pipelines import LogsCustomPipelines
 from datadog_sync.model.downtimes import Downtimes
 from datadog_sync.model.downtime_schedules import DowntimeSchedules
-from datadog_sync.utils.custom_client import CustomClient
+from datadog_sync.utils.custom_client import ConnectionConfig, CustomClient
 from datadog_sync.utils.base_resource import BaseResource
 from datadog_sync.utils.log import Log
+from datadog_sync.utils.http_cache import HttpCache
 from datadog_sync.utils.filter import Filter, process_filters
 from datadog_sync.utils.resource_utils import CustomClientHTTPError
 from datadog_sync.utils.state import State
@@ -59,6 +73,12 @@ class Configuration(object):
     backup_before_reset: bool
     resources: Dict[str, BaseResource] = field(default_factory=dict)
     resources_arg: List[str] = field(default_factory=list)
+    resource_concurrency: Dict[str, int] = field(default_factory=dict)
+    pipelined_migrate: bool = False
+    progress: str = PROGRESS_AUTO
+    cpu_workers: int = 0
+    cpu_executor: Optional[ProcessPoolExecutor] = None
+    http_stats_file: Optional[str] = None
 
     async def init_async(self, cmd: Command):
         await self.source_client._init_session()
@@ -116,9 +136,42 @@ class Configuration(object):
             await self.source_client.send_metric(f"{cmd.value}.start")
             await self.destination_client.send_metric(f"{cmd.value}.start")
 
+        # Offload diffing to other cores, HTTP stays on the event loop
+        if self.cpu_workers > 0 and cmd in [Command.SYNC, Command.DIFFS, Command.MIGRATE]:
+            self.cpu_executor = ProcessPoolExecutor(
+                max_workers=self.cpu_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+
     async def exit_async(self):
+        self.logger.info(str(self.source_client.concurrency))
+        self.logger.info(str(self.destination_client.concurrency))
+        self.logger.info(str(self.source_client.rate_limiter))
+        self.logger.info(str(self.destination_client.rate_limiter))
+        self.logger.info(str(self.source_client.retry_policy))
+        self.logger.info(str(self.destination_client.retry_policy))
+        self.logger.info(str(self.source_client.request_cache))
+        self.logger.info(str(self.destination_client.request_cache))
+        if self.source_client.http_cache is not None:
+            self.logger.info(str(self.source_client.http_cache))
+        for client in (self.source_client, self.destination_client):
+            for line in client.stats.summary():
+                self.logger.info(line)
+        if self.http_stats_file:
+            with open(self.http_stats_file, "w") as f:
+                json.dump(
+                    {
+                        "source": self.source_client.stats.to_dict(),
+                        "destination": self.destination_client.stats.to_dict(),
+                    },
+                    f,
+                    indent=2,
+                )
         await self.source_client._end_session()
         await self.destination_client._end_session()
+        self.state.close()
+        if self.cpu_executor is not None:
+            self.cpu_executor.shutdown(cancel_futures=True)
+            self.cpu_executor = None
 
 
 def build_config(cmd: Command, **kwargs: Optional[Any]) -> Configuration:
@@ -136,25 +189,48 @@ def build_config(cmd: Command, **kwargs: Optional[Any]) -> Configuration:
     retry_timeout = kwargs.get("http_client_retry_timeout")
     timeout = kwargs.get("http_client_timeout")
     send_metrics = kwargs.get("send_metrics")
+    max_workers = kwargs.get("max_workers")
+    connection_config = _connection_config(kwargs)
+    client_kwargs = {
+        "max_concurrency": max_workers,
+        "adaptive_concurrency": kwargs.get("adaptive_concurrency", True),
+        "connection_config": connection_config,
+        "page_concurrency": kwargs.get("http_client_page_concurrency") or 1,
+        "request_compression": (kwargs.get("http_client_request_compression") or COMPRESSION_NONE).lower(),
+        "compression_threshold": kwargs.get("http_client_request_compression_threshold") or 0,
+        "retry_base_delay": kwargs.get("http_client_retry_base_delay", 1.0),
+        "retry_max_delay": kwargs.get("http_client_retry_max_delay", 60.0),
+        "retry_budget": kwargs.get("http_client_retry_budget", 0.1),
+        "memoize_listings": kwargs.get("http_client_memoize_listings", False),
+    }
 
     source_auth = {}
     if k := kwargs.get("source_api_key"):
         source_auth["apiKeyAuth"] = k
     if k := kwargs.get("source_app_key"):
         source_auth["appKeyAuth"] = k
-    source_client = CustomClient(source_api_url, source_auth, retry_timeout, timeout, send_metrics)
+    source_client = CustomClient(
+        source_api_url, source_auth, retry_timeout, timeout, send_metrics, name="source", **client_kwargs
+    )
 
     destination_auth = {}
     if k := kwargs.get("destination_api_key"):
         destination_auth["apiKeyAuth"] = k
     if k := kwargs.get("destination_app_key"):
         destination_auth["appKeyAuth"] = k
-    destination_client = CustomClient(destination_api_url, destination_auth, retry_timeout, timeout, send_metrics)
+    destination_client = CustomClient(
+        destination_api_url,
+        destination_auth,
+        retry_timeout,
+        timeout,
+        send_metrics,
+        name="destination",
+        **client_kwargs,
+    )
 
     # Additional settings
     force_missing_dependencies = kwargs.get("force_missing_dependencies")
     skip_failed_resource_connections = kwargs.get("skip_failed_resource_connections")
-    max_workers = kwargs.get("max_workers")
     create_global_downtime = kwargs.get("create_global_downtime")
     validate = kwargs.get("validate")
     verify_ddr_status = kwargs.get("verify_ddr_status")
@@ -187,6 +263,17 @@ def build_config(cmd: Command, **kwargs: Optional[Any]) -> Configuration:
         storage_type = StorageType.LOCAL_FILE
         source_resources_path = kwargs.get(SOURCE_PATH_PARAM, SOURCE_PATH_DEFAULT)
         destination_resources_path = kwargs.get(DESTINATION_PATH_PARAM, DESTINATION_PATH_DEFAULT)
+    elif storage_type == LOCAL_SHARDED_STORAGE_TYPE:
+        logger.info("Using local filesystem to store sharded state files")
+        storage_type = StorageType.LOCAL_SHARDED
+        source_resources_path = kwargs.get(SOURCE_PATH_PARAM, SOURCE_PATH_DEFAULT)
+        destination_resources_path = kwargs.get(DESTINATION_PATH_PARAM, DESTINATION_PATH_DEFAULT)
+    elif storage_type == SQLITE_STORAGE_TYPE:
+        logger.info("Using SQLite to store state")
+        storage_type = StorageType.SQLITE
+        # Label the rows of each origin in the database
+        source_resources_path = Origin.SOURCE.value
+        destination_resources_path = Origin.DESTINATION.value
     else:
         raise ValueError("Unsupported storage type")
 
@@ -195,15 +282,36 @@ def build_config(cmd: Command, **kwargs: Optional[Any]) -> Configuration:
     # is just an import, the source of that import is the destination of the reset.
     if cmd == Command.RESET:
         cleanup = TRUE
-        source_client = CustomClient(destination_api_url, destination_auth, retry_timeout, timeout, send_metrics)
+        source_client = CustomClient(
+            destination_api_url, destination_auth, retry_timeout, timeout, send_metrics, name="source", **client_kwargs
+        )
         source_resources_path = f"{destination_resources_path}/.backup/{str(time.time())}"
 
+    if kwargs.get("http_cache") and cmd in [Command.IMPORT, Command.MIGRATE]:
+        http_cache_path = kwargs.get("http_cache_path")
+        if not http_cache_path:
+            cache_parent = source_resources_path
+            if storage_type == StorageType.AWS_S3_BUCKET:
+                cache_parent = SOURCE_PATH_DEFAULT
+            elif storage_type == StorageType.SQLITE:
+                cache_parent = os.path.dirname(kwargs.get("sqlite_path") or SQLITE_PATH_DEFAULT)
+            http_cache_path = os.path.join(cache_parent, HTTP_CACHE_DIR)
+        source_client.http_cache = HttpCache(http_cache_path, name="source")
+
+    # The journal is a local file, it isn't kept with the state in S3. SQLite writes destination changes right away.
+    journal_path = None
+    if kwargs.get("state_journal", True) and storage_type in [StorageType.LOCAL_FILE, StorageType.LOCAL_SHARDED]:
+        journal_path = os.path.join(destination_resources_path, STATE_JOURNAL_FILE)
+
     # Initialize state
     state = State(
         type_=storage_type,
         source_resources_path=source_resources_path,
         destination_resources_path=destination_resources_path,
         config=config,
+        sqlite_path=kwargs.get("sqlite_path") or SQLITE_PATH_DEFAULT,
+        journal_path=journal_path,
+        journal_compact_interval=kwargs.get("state_journal_compact_interval", STATE_JOURNAL_COMPACT_INTERVAL_DEFAULT),
     )
 
     # Initialize Configuration
@@ -223,6 +331,10 @@ def build_config(cmd: Command, **kwargs: Optional[Any]) -> Configuration:
         state=state,
         verify_ddr_status=verify_ddr_status,
         backup_before_reset=backup_before_reset,
+        pipelined_migrate=kwargs.get("pipelined", False),
+        progress=kwargs.get("progress", PROGRESS_AUTO),
+        cpu_workers=kwargs.get("cpu_workers") or 0,
+        http_stats_file=kwargs.get("http_stats_file"),
     )
 
     # Initialize resource classes
@@ -255,6 +367,7 @@ def build_config(cmd: Command, **kwargs: Optional[Any]) -> Configuration:
 
     config.resources = resources
     config.resources_arg = resources_arg
+    config.resource_concurrency = _parse_resource_concurrency(config, kwargs.get("resource_concurrency"))
 
     _handle_deprecated(config, resources_arg_str is not None)
 
@@ -273,6 +386,43 @@ def init_resources(cfg: Configuration) -> Dict[str, BaseResource]:
     return resources
 
 
+def _connection_config(kwargs: Dict[str, Any]) -> ConnectionConfig:
+    """Builds the HTTP connection settings, 0 is a valid keep-alive timeout and DNS cache TTL."""
+    keepalive_timeout = kwargs.get("http_client_keepalive_timeout")
+    ttl_dns_cache = kwargs.get("http_client_dns_cache_ttl")
+    return ConnectionConfig(
+        limit=kwargs.get("http_client_connection_limit") or kwargs.get("max_workers") or ConnectionConfig.limit,
+        limit_per_host=kwargs.get("http_client_connection_limit_per_host") or 0,
+        keepalive_timeout=ConnectionConfig.keepalive_timeout if keepalive_timeout is None else keepalive_timeout,
+        ttl_dns_cache=ConnectionConfig.ttl_dns_cache if ttl_dns_cache is None else ttl_dns_cache,
+        proxy=kwargs.get("http_client_proxy"),
+    )
+
+
+def _parse_resource_concurrency(config: Configuration, value: Optional[str]) -> Dict[str, int]:
+    """Parses `resource_type=limit` pairs passed to `--resource-concurrency`."""
+    resource_concurrency = {}
+    if not value:
+        return resource_concurrency
+
+    for pair in value.split(","):
+        resource_type, _, limit = pair.partition("=")
+        resource_type = resource_type.strip().lower()
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError(f"Invalid resource concurrency `{pair}`. Expected `resource_type=limit`")
+        if limit < 1:
+            raise ValueError(f"Invalid resource concurrency `{pair}`. Limit must be at least 1")
+
+        if resource_type not in config.resources:
+            config.logger.warning("invalid resource concurrency resource type. Discarding: %s", resource_type)
+            continue
+        resource_concurrency[resource_type] = limit
+
+    return resource_concurrency
+
+
 async def _verify_ddr_status(client: CustomClient) -> None:
     ddr_state = await client.get_ddr_status()
     if not ddr_state:
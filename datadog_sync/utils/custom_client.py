@@ -4,68 +4,151 @@
 # Copyright 2019 Datadog, Inc.
 import asyncio
 from datetime import datetime
+import gzip
+import re
 import ssl
 import time
 import logging
 import platform
+import zlib
+from collections import deque
 from dataclasses import dataclass
-from typing import Awaitable, Dict, List, Optional, Callable
+from typing import Any, AsyncIterator, Awaitable, Deque, Dict, List, Optional, Callable, Tuple
 from urllib.parse import urlparse
 
 import aiohttp
 import certifi
 
-from datadog_sync.constants import DDR_Status, LOGGER_NAME, Metrics
+from datadog_sync.constants import (
+    COMPRESSION_DEFLATE,
+    COMPRESSION_GZIP,
+    COMPRESSION_NONE,
+    DDR_Status,
+    LOGGER_NAME,
+    Metrics,
+)
+from datadog_sync.utils.adaptive_concurrency import AdaptiveConcurrency
+from datadog_sync.utils.http_cache import HttpCache
+from datadog_sync.utils.http_stats import HttpStats, RequestEvent
+from datadog_sync.utils.json_codec import JsonCodec, default_codec
+from datadog_sync.utils.rate_limiter import RateLimiter, request_route
+from datadog_sync.utils.retry_policy import RetryBudget, RetryPolicy
+from datadog_sync.utils.request_cache import MEMO_MAX_ENTRIES, RequestCache, freeze
 from datadog_sync.utils.resource_utils import CustomClientHTTPError
 
 log = logging.getLogger(LOGGER_NAME)
 
+_COMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {
+    COMPRESSION_GZIP: lambda data: gzip.compress(data, compresslevel=6),
+    COMPRESSION_DEFLATE: lambda data: zlib.compress(data, 6),
+}
+
+# Same content types as accepted by aiohttp's ClientResponse.json()
+_JSON_CONTENT_TYPE_RE = re.compile(r"^application/(?:[\w.+-]+?\+)?json")
+
 
 def request_with_retry(func: Awaitable) -> Awaitable:
     async def wrapper(*args, **kwargs):
+        client = args[0]
+        method = func.__name__
+        path = kwargs["path"] if "path" in kwargs else args[1]
+        if method == "get":
+            key = (freeze(args[1:]), freeze(kwargs))
+            return await client.request_cache.get(key, path, lambda: send(client, method, path, *args, **kwargs))
+
+        # Drop cached responses of the API both before and after it is modified
+        client.request_cache.invalidate(path)
+        try:
+            return await send(client, method, path, *args, **kwargs)
+        finally:
+            client.request_cache.invalidate(path)
+
+    async def send(client, method, path, *args, **kwargs):
         retry = True
-        default_backoff = 5
         retry_count = 0
-        timeout = time.time() + args[0].retry_timeout
+        timeout = time.time() + client.retry_timeout
         err_text = None
+        client.retry_policy.on_request()
+
+        cache_key = cached = None
+        if method == "get" and client.http_cache is not None:
+            cache_key = client.http_cache.key(
+                (client.url_object.build_url(""), freeze(client.auth), freeze(args[1:]), freeze(kwargs))
+            )
+            cached = await client.http_cache.get(cache_key)
+            if cached is not None:
+                kwargs = {**kwargs, "headers": {**kwargs.get("headers", {}), **cached.conditional_headers()}}
 
+        route = request_route(method, path)[1]
         while retry and timeout > time.time():
-            async with await func(*args, **kwargs) as resp:
-                err_text = await resp.text()
-                try:
-                    resp.raise_for_status()
+            wait_start = time.monotonic()
+            # Wait for the rate limit before taking a concurrency slot
+            await client.rate_limiter.acquire(method, path)
+            await client.concurrency.acquire()
+            start = time.monotonic()
+            event = RequestEvent(client.stats.name, method.upper(), route, attempt=retry_count, wait=start - wait_start)
+            try:
+                # The event collects the bytes sent through the session trace config
+                async with await func(*args, trace_request_ctx=event, **kwargs) as resp:
+                    event.status = resp.status
+                    client.rate_limiter.update(method, path, resp.headers)
+                    # Read the body once, it is only decoded to text for errors and non JSON responses
+                    body = await resp.read()
+                    event.latency = time.monotonic() - start
+                    event.bytes_in = len(body)
                     try:
-                        return await resp.json()
-                    except aiohttp.ContentTypeError:
+                        resp.raise_for_status()
+                        client.concurrency.on_success(time.monotonic() - start)
+                        content_type = resp.content_type
+                        if resp.status == 304 and cached is not None:
+                            body, content_type = client.http_cache.hit(cached), cached.content_type
+                        elif cache_key is not None:
+                            await client.http_cache.put(cache_key, resp.headers, content_type, body)
+                        if _JSON_CONTENT_TYPE_RE.match(content_type):
+                            return client.json_codec.loads(body) if body.strip() else None
+                        if resp.status == 304 and cached is not None:
+                            return body.decode("utf-8")
                         return await resp.text()
-                except aiohttp.ClientResponseError as e:
-                    if e.status == 429 and "x-ratelimit-reset" in e.headers:
-                        try:
-                            sleep_duration = int(e.headers["x-ratelimit-reset"])
-                        except ValueError:
-                            sleep_duration = retry_count * default_backoff
+                    except aiohttp.ClientResponseError as e:
+                        err_text = await resp.text()
+                        if not client.retry_policy.is_retryable(e.status):
+                            raise CustomClientHTTPError(e, message=err_text)
+                        client.concurrency.on_congestion()
+                        sleep_duration = client.retry_policy.delay(retry_count, e.status, e.headers)
                         if (sleep_duration + time.time()) > timeout:
                             log.debug(f"{e}. retry timeout has or will exceed timeout duration")
                             raise CustomClientHTTPError(e, message=err_text)
-                        log.debug(f"{e}. retrying request after {sleep_duration}s")
-                        await asyncio.sleep(sleep_duration)
-                        retry_count += 1
-                        continue
-                    elif e.status >= 500 or e.status == 429:
-                        sleep_duration = retry_count * default_backoff
-                        if (sleep_duration + time.time()) > timeout:
-                            log.debug("retry timeout has or will exceed timeout duration")
+                        if not client.retry_policy.try_retry(e.status):
                             raise CustomClientHTTPError(e, message=err_text)
+                        event.sleep = sleep_duration
                         log.debug(f"{e}. retrying request after {sleep_duration}s")
-                        await asyncio.sleep(retry_count * default_backoff)
-                        retry_count += 1
-                        continue
-                    raise CustomClientHTTPError(e, message=err_text)
+            finally:
+                if not event.latency:
+                    event.latency = time.monotonic() - start
+                client.stats.record(event)
+                await client.concurrency.release()
+
+            # Back off without holding a concurrency slot
+            await asyncio.sleep(sleep_duration)
+            retry_count += 1
         raise Exception("retry timeout has reached. Last error: " + err_text)
 
     return wrapper
 
 
+@dataclass
+class ConnectionConfig(object):
+    # Max number of open connections, 0 for no limit
+    limit: int = 100
+    # Max number of open connections to a single host, 0 for no limit
+    limit_per_host: int = 0
+    # Seconds an idle connection is kept open for reuse
+    keepalive_timeout: float = 30
+    # Seconds resolved host names are cached, None to cache them forever
+    ttl_dns_cache: Optional[int] = 300
+    proxy: Optional[str] = None
+
+
 class CustomClient:
     def __init__(
         self,
@@ -74,18 +157,61 @@ class CustomClient:
         retry_timeout: int,
         timeout: int,
         send_metrics: bool,
+        name: str = "",
+        max_concurrency: Optional[int] = None,
+        adaptive_concurrency: bool = True,
+        json_codec: Optional[JsonCodec] = None,
+        connection_config: Optional[ConnectionConfig] = None,
+        page_concurrency: int = 1,
+        request_compression: str = COMPRESSION_NONE,
+        compression_threshold: int = 0,
+        retry_base_delay: float = 1.0,
+        retry_max_delay: float = 60.0,
+        retry_budget: float = 0.1,
+        memoize_listings: bool = False,
     ) -> None:
         self.url_object = UrlObject.from_str(host)
-        self.timeout = timeout
+        # Built once and shared by every request
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.connection_config = connection_config or ConnectionConfig()
         self.session = None
         self.retry_timeout = retry_timeout
         self.default_pagination = PaginationConfig()
+        # Max number of pages of a listing fetched at once
+        self.page_concurrency = page_concurrency
+        # Request bodies of at least compression_threshold bytes are sent with this Content-Encoding
+        self.request_compression = request_compression
+        self.compression_threshold = compression_threshold
         self.auth = auth
         self.send_metrics = send_metrics
+        # Without adaptive concurrency the limit is pinned to max_concurrency
+        max_concurrency = max_concurrency or 100
+        self.concurrency = AdaptiveConcurrency(
+            name, max_concurrency, min_limit=1 if adaptive_concurrency else max_concurrency
+        )
+        self.rate_limiter = RateLimiter(name)
+        self.stats = HttpStats(name)
+        self.retry_policy = RetryPolicy(
+            base_delay=retry_base_delay, max_delay=retry_max_delay, budget=RetryBudget(ratio=retry_budget), name=name
+        )
+        self.request_cache = RequestCache(name, max_entries=MEMO_MAX_ENTRIES if memoize_listings else 0)
+        self.json_codec = json_codec or default_codec()
+        # Set for the source client of imports run with --http-cache
+        self.http_cache: Optional[HttpCache] = None
 
     async def _init_session(self):
         ssl_context = ssl.create_default_context(cafile=certifi.where())
-        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context))
+        connector = aiohttp.TCPConnector(
+            ssl=ssl_context,
+            limit=self.connection_config.limit,
+            limit_per_host=self.connection_config.limit_per_host,
+            keepalive_timeout=self.connection_config.keepalive_timeout,
+            ttl_dns_cache=self.connection_config.ttl_dns_cache,
+            force_close=False,
+        )
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_chunk_sent.append(_on_request_chunk_sent)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout, trace_configs=[trace_config])
         self.session.headers.update(build_default_headers(self.auth))
 
     async def _end_session(self):
@@ -97,68 +223,113 @@ class CustomClient:
     @request_with_retry
     async def get(self, path, domain=None, subdomain=None, **kwargs):
         url = self.url_object.build_url(path, domain=domain, subdomain=subdomain)
-        return self.session.get(url, timeout=self.timeout, **kwargs)
+        return self.session.get(url, proxy=self.connection_config.proxy, **kwargs)
 
     @request_with_retry
     async def post(self, path, body, domain=None, subdomain=None, **kwargs):
         url = self.url_object.build_url(path, domain=domain, subdomain=subdomain)
-        return self.session.post(url, json=body, timeout=self.timeout, **kwargs)
+        return self.session.post(url, proxy=self.connection_config.proxy, **self._with_body(body, kwargs))
 
     @request_with_retry
     async def put(self, path, body, domain=None, subdomain=None, **kwargs):
         url = self.url_object.build_url(path, domain=domain, subdomain=subdomain)
-        return self.session.put(url, json=body, timeout=self.timeout, **kwargs)
+        return self.session.put(url, proxy=self.connection_config.proxy, **self._with_body(body, kwargs))
 
     @request_with_retry
     async def patch(self, path, body, domain=None, subdomain=None, **kwargs):
         url = self.url_object.build_url(path, domain=domain, subdomain=subdomain)
-        return self.session.patch(url, json=body, timeout=self.timeout, **kwargs)
+        return self.session.patch(url, proxy=self.connection_config.proxy, **self._with_body(body, kwargs))
 
     @request_with_retry
     async def delete(self, path, domain=None, subdomain=None, body=None, **kwargs):
         url = self.url_object.build_url(path, domain=domain, subdomain=subdomain)
-        return self.session.delete(url, json=body, timeout=self.timeout, **kwargs)
+        return self.session.delete(url, proxy=self.connection_config.proxy, **self._with_body(body, kwargs))
+
+    def _with_body(self, body: Any, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """Request kwargs with the encoded body, compressed when it reaches the compression threshold."""
+        data = None if body is None else self.json_codec.dumps(body)
+        if (
+            data is not None
+            and self.request_compression != COMPRESSION_NONE
+            and len(data) >= self.compression_threshold
+        ):
+            data = _COMPRESSORS[self.request_compression](data)
+            kwargs = {**kwargs, "headers": {**kwargs.get("headers", {}), "Content-Encoding": self.request_compression}}
+        return {**kwargs, "data": data}
 
     def paginated_request(self, func: Awaitable) -> Awaitable:
+        pages = self.paginated_pages(func)
+
         async def wrapper(*args, **kwargs):
-            pagination_config = kwargs.pop("pagination_config", self.default_pagination)
+            resources = []
+            async for page in pages(*args, **kwargs):
+                resources.extend(page)
+            return resources
+
+        return wrapper
+
+    def paginated_pages(self, func: Awaitable) -> Callable[..., AsyncIterator[List]]:
+        """Same as `paginated_request` but yields the resources page by page, in order, as they are fetched."""
 
+        async def wrapper(*args, **kwargs):
+            pagination_config = kwargs.pop("pagination_config", self.default_pagination)
             page_size = pagination_config.page_size
-            page_number = pagination_config.page_number
-            remaining = 1
-            resources = []
-            kwargs["params"] = kwargs.get("params", {}) or {}
-            idx = 0
-            while remaining > 0:
+            fan_out = max(self.page_concurrency, 1)
+            semaphore = asyncio.Semaphore(fan_out)
+            params = kwargs.pop("params", None) or {}
+
+            async def fetch_page(page_number):
                 log.debug(
                     f"fetching {args[0]} "
                     f"{pagination_config.page_number_param}: {page_number} "
-                    f"{pagination_config.page_size_param}: {page_size} "
-                    f"remaining: {remaining}"
+                    f"{pagination_config.page_size_param}: {page_size}"
                 )
-                params = {
+                page_params = {
+                    **params,
                     pagination_config.page_size_param: page_size,
                     pagination_config.page_number_param: page_number,
                 }
-                kwargs["params"].update(params)
-
-                resp = await func(*args, **kwargs)
-
-                resp_len = 0
+                async with semaphore:
+                    resp = await func(*args, params=page_params, **kwargs)
                 if pagination_config.response_list_accessor:
-                    resources.extend(resp[pagination_config.response_list_accessor])
-                    resp_len = len(resp[pagination_config.response_list_accessor])
-                else:
-                    resources.extend(resp)
-                    resp_len = len(resp)
-
-                if resp_len < page_size:
-                    break
-
-                remaining = pagination_config.remaining_func(idx, resp, page_size, page_number)
-                page_number = pagination_config.page_number_func(idx, page_size, page_number)
-                idx += 1
-            return resources
+                    return resp, resp[pagination_config.response_list_accessor]
+                return resp, resp
+
+            idx = 0
+            page_number = pagination_config.page_number
+            resp, page = await fetch_page(page_number)
+            yield page
+            if len(page) < page_size or pagination_config.remaining_func(idx, resp, page_size, page_number) <= 0:
+                return
+
+            def last_page(i, resp, number) -> Optional[int]:
+                """Index of the last page when the response has a total for `remaining_func`, None otherwise."""
+                if _total_count(resp) is None:
+                    return None
+                return i + max(-(-pagination_config.remaining_func(i, resp, page_size, number) // page_size), 0)
+
+            # Pages are read up to `fan_out` ahead of the page being consumed, and not past the last page when known
+            last_idx = last_page(idx, resp, page_number)
+            window: Deque[Tuple[int, Any, asyncio.Future]] = deque()
+            try:
+                while True:
+                    while len(window) < fan_out and (last_idx is None or idx < last_idx):
+                        page_number = pagination_config.page_number_func(idx, page_size, page_number)
+                        idx += 1
+                        window.append((idx, page_number, asyncio.ensure_future(fetch_page(page_number))))
+
+                    i, number, task = window.popleft()
+                    resp, page = await task
+                    yield page
+                    # Pages fetched past the end are empty, stop at the first page that isn't full
+                    if len(page) < page_size or pagination_config.remaining_func(i, resp, page_size, number) <= 0:
+                        return
+                    last_idx = last_page(i, resp, number)
+            finally:
+                # Read ahead pages are dropped when the listing ends early or the caller stops iterating
+                for _, _, task in window:
+                    task.cancel()
+                    task.add_done_callback(_retrieve_exception)
 
         return wrapper
 
@@ -211,6 +382,8 @@ def build_default_headers(auth_obj: Dict[str, str]) -> Dict[str, str]:
         "DD-API-KEY": auth_obj.get("apiKeyAuth", ""),
         "DD-APPLICATION-KEY": auth_obj.get("appKeyAuth", ""),
         "Content-Type": "application/json",
+        # aiohttp decompresses responses as they are streamed in
+        "Accept-Encoding": "gzip, deflate",
         "User-Agent": _get_user_agent(),
     }
     return headers
@@ -230,6 +403,24 @@ def _get_user_agent() -> str:
     )
 
 
+async def _on_request_chunk_sent(session, trace_config_ctx, params: aiohttp.TraceRequestChunkSentParams) -> None:
+    event = trace_config_ctx.trace_request_ctx
+    if isinstance(event, RequestEvent):
+        event.bytes_out += len(params.chunk)
+
+
+def _retrieve_exception(task: asyncio.Future) -> None:
+    if not task.cancelled():
+        task.exception()
+
+
+def _total_count(resp) -> Optional[int]:
+    try:
+        return int(resp["meta"]["page"]["total_count"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
 def remaining_func(idx, resp, page_size, page_number):
     return resp["meta"]["page"]["total_count"] - page_size * (page_number + 1)
 
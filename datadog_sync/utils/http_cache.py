@@ -0,0 +1,108 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from dataclasses import asdict, dataclass
+from typing import Dict, Hashable, Mapping, Optional
+
+from datadog_sync.constants import LOGGER_NAME
+
+
+log = logging.getLogger(LOGGER_NAME)
+
+
+@dataclass
+class HttpCacheEntry:
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_type: str
+    body: str
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """On-disk cache of GET responses, revalidated with `If-None-Match` / `If-Modified-Since`.
+
+    Only responses carrying an `ETag` or `Last-Modified` header are stored. A `304 Not Modified` answer is served
+    from the stored body, so unchanged resources are not transferred again. Entries live in one file per request
+    under `path` and are kept across runs.
+    """
+
+    def __init__(self, path: str, name: str = "") -> None:
+        self.path = path
+        self.name = name
+        self.revalidated = 0
+        self.stored = 0
+        self.bytes_saved = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name} client revalidated {self.revalidated} cached responses "
+            f"({self.bytes_saved / 1024 / 1024:.1f} MiB not transferred), stored {self.stored}"
+        )
+
+    def key(self, request: Hashable) -> str:
+        return hashlib.sha256(repr(request).encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[HttpCacheEntry]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def put(self, key: str, headers: Mapping[str, str], content_type: str, body: bytes) -> None:
+        etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        try:
+            text = body.decode("utf-8")
+        except UnicodeDecodeError:
+            return
+        entry = HttpCacheEntry(etag, last_modified, content_type, text)
+        await asyncio.to_thread(self._write, key, entry)
+        self.stored += 1
+
+    def hit(self, entry: HttpCacheEntry) -> bytes:
+        """Body of a revalidated entry."""
+        body = entry.body.encode("utf-8")
+        self.revalidated += 1
+        self.bytes_saved += len(body)
+        return body
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], f"{key}.json")
+
+    def _read(self, key: str) -> Optional[HttpCacheEntry]:
+        try:
+            with open(self._file(key)) as f:
+                return HttpCacheEntry(**json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError) as e:
+            log.debug(f"ignoring unreadable HTTP cache entry {key}: {e}")
+            return None
+
+    def _write(self, key: str, entry: HttpCacheEntry) -> None:
+        file = self._file(key)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        # Written next to the entry and renamed so concurrent runs never read half an entry
+        fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(file), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(asdict(entry), f)
+            os.replace(tmp_file, file)
+        except BaseException:
+            os.unlink(tmp_file)
+            raise
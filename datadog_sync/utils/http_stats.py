@@ -0,0 +1,170 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+from __future__ import annotations
+import logging
+import math
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from datadog_sync.constants import LOGGER_NAME
+
+
+log = logging.getLogger(LOGGER_NAME)
+
+# Upper bounds in seconds of the latency buckets, from 1ms to about 10 minutes in 25% steps
+_LATENCY_BOUNDS = [0.001 * 1.25**i for i in range(60)]
+
+
+@dataclass
+class RequestEvent:
+    """One attempt of a request, passed to the hooks of `HttpStats` once it completes."""
+
+    client: str
+    method: str
+    # Path with ids replaced, e.g. `/api/v1/dashboard/{id}`
+    route: str
+    attempt: int = 0
+    # None when no response was received
+    status: Optional[int] = None
+    # Seconds from sending the request to reading the whole response
+    latency: float = 0.0
+    # Seconds spent waiting for the rate limiter and a concurrency slot before sending
+    wait: float = 0.0
+    # Seconds slept before retrying, 0 when the attempt is not retried
+    sleep: float = 0.0
+    bytes_in: int = 0
+    bytes_out: int = 0
+
+
+class LatencyHistogram:
+    """Fixed bucket histogram, percentiles are accurate to the 25% width of a bucket."""
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(_LATENCY_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        self.counts[bisect_left(_LATENCY_BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = max(math.ceil(q * self.count), 1)
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(_LATENCY_BOUNDS[i], self.max) if i < len(_LATENCY_BOUNDS) else self.max
+        return self.max
+
+
+@dataclass
+class RouteStats:
+    requests: int = 0
+    retries: int = 0
+    throttled: int = 0
+    throttle_sleep: float = 0.0
+    backoff_sleep: float = 0.0
+    wait: float = 0.0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    statuses: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "throttle_sleep": self.throttle_sleep,
+            "backoff_sleep": self.backoff_sleep,
+            "wait": self.wait,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "statuses": dict(self.statuses),
+            "latency": {
+                "total": self.latency.total,
+                "p50": self.latency.percentile(0.5),
+                "p90": self.latency.percentile(0.9),
+                "p99": self.latency.percentile(0.99),
+                "max": self.latency.max,
+            },
+        }
+
+
+class HttpStats:
+    """Per route request statistics of a client.
+
+    Every attempt of a request is recorded, then passed to the hooks registered with `add_hook()`. A hook raising
+    an exception doesn't fail the request, it is logged the first time.
+    """
+
+    def __init__(self, name: str = "") -> None:
+        self.name = name
+        self.routes: Dict[str, RouteStats] = defaultdict(RouteStats)
+        self.hooks: List[Callable[[RequestEvent], None]] = []
+        self._failed_hooks: Set[int] = set()
+
+    def add_hook(self, hook: Callable[[RequestEvent], None]) -> None:
+        self.hooks.append(hook)
+
+    def record(self, event: RequestEvent) -> None:
+        stats = self.routes[f"{event.method} {event.route}"]
+        stats.requests += 1
+        stats.latency.add(event.latency)
+        stats.wait += event.wait
+        stats.bytes_in += event.bytes_in
+        stats.bytes_out += event.bytes_out
+        stats.statuses[str(event.status) if event.status is not None else "error"] += 1
+        if event.attempt:
+            stats.retries += 1
+        if event.status == 429:
+            stats.throttled += 1
+            stats.throttle_sleep += event.sleep
+        else:
+            stats.backoff_sleep += event.sleep
+
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                if id(hook) not in self._failed_hooks:
+                    self._failed_hooks.add(id(hook))
+                    log.warning(f"HTTP stats hook {hook!r} failed: {e}")
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {route: stats.to_dict() for route, stats in self.routes.items()}
+
+    def summary(self, limit: Optional[int] = None) -> List[str]:
+        """One line per route, the routes that took the longest first."""
+        routes = sorted(self.routes.items(), key=lambda i: -(i[1].latency.total + i[1].throttle_sleep))
+        lines = []
+        for route, s in routes[:limit]:
+            statuses = ", ".join(f"{status}: {n}" for status, n in sorted(s.statuses.items()))
+            lines.append(
+                f"{self.name} {route}: {s.requests} requests, "
+                f"p50 {_ms(s.latency.percentile(0.5))}, p90 {_ms(s.latency.percentile(0.9))}, "
+                f"p99 {_ms(s.latency.percentile(0.99))}, max {_ms(s.latency.max)}, "
+                f"{s.retries} retries, {s.throttled} throttled ({s.throttle_sleep:.1f}s), "
+                f"backoff {s.backoff_sleep:.1f}s, queued {s.wait:.1f}s, "
+                f"{_mib(s.bytes_in)} in, {_mib(s.bytes_out)} out, statuses {statuses}"
+            )
+        return lines
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.0f}ms"
+
+
+def _mib(n: int) -> str:
+    return f"{n / 1024 / 1024:.2f}MiB"
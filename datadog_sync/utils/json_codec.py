@@ -0,0 +1,50 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+from __future__ import annotations
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+@dataclass(frozen=True)
+class JsonCodec:
+    """Pair of functions used to parse response bodies and serialize request bodies."""
+
+    name: str
+    loads: Callable[[Union[bytes, str]], Any]
+    dumps: Callable[[Any], bytes]
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(obj).encode("utf-8")
+
+
+def _orjson_dumps(obj: Any) -> bytes:
+    try:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+        # e.g. integers above 64 bits
+        return _stdlib_dumps(obj)
+
+
+STDLIB_CODEC = JsonCodec("json", json.loads, _stdlib_dumps)
+ORJSON_CODEC = JsonCodec("orjson", orjson.loads, _orjson_dumps) if orjson is not None else None
+
+
+def default_codec(name: Optional[str] = None) -> JsonCodec:
+    """Returns the codec called `name`, orjson when installed if no name is given."""
+    if name == STDLIB_CODEC.name or (name is None and ORJSON_CODEC is None):
+        return STDLIB_CODEC
+    if ORJSON_CODEC is None:
+        raise ValueError(f"JSON codec '{name}' is not installed")
+    if name not in (None, ORJSON_CODEC.name):
+        raise ValueError(f"unknown JSON codec '{name}'")
+    return ORJSON_CODEC
@@ -0,0 +1,97 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+from __future__ import annotations
+import asyncio
+import logging
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+from tqdm import tqdm
+
+from datadog_sync.constants import LOGGER_NAME, PROGRESS_AUTO, PROGRESS_BAR, PROGRESS_LOG
+
+
+log = logging.getLogger(LOGGER_NAME)
+
+
+class ProgressReporter:
+    """Progress of a worker run, refreshed on a timer instead of once per completed item.
+
+    `update()` only counts. `run()` redraws a tqdm bar at `refresh_interval` when attached to a terminal, or logs a
+    throughput line every `log_interval` seconds otherwise.
+    """
+
+    def __init__(
+        self,
+        total: Optional[int],
+        mode: str = PROGRESS_AUTO,
+        refresh_interval: float = 0.1,
+        log_interval: float = 10.0,
+    ) -> None:
+        if mode == PROGRESS_AUTO:
+            mode = PROGRESS_BAR if sys.stderr.isatty() else PROGRESS_LOG
+        self.mode = mode
+        self.total = total
+        self.completed = 0
+        self.per_type: Dict[str, int] = defaultdict(int)
+        self.refresh_interval = refresh_interval
+        self.log_interval = log_interval
+        self._start = time.monotonic()
+        self._last_log = self._start
+        self._reported = 0
+        self._closed = False
+        self._pbar: Optional[tqdm] = tqdm(total=total) if mode == PROGRESS_BAR else None
+
+    def update(self, resource_type: Optional[str] = None, n: int = 1) -> None:
+        self.completed += n
+        if resource_type is not None:
+            self.per_type[resource_type] += n
+
+    async def run(self) -> None:
+        while not self._closed:
+            await asyncio.sleep(self.refresh_interval)
+            self.refresh()
+
+    def refresh(self) -> None:
+        if self._closed:
+            return
+
+        if self._pbar is not None:
+            if self._pbar.total != self.total:
+                self._pbar.total = self.total
+            if self.completed != self._reported:
+                self._pbar.update(self.completed - self._reported)
+                self._reported = self.completed
+        elif self.mode == PROGRESS_LOG:
+            now = time.monotonic()
+            if now - self._last_log >= self.log_interval:
+                self._last_log = now
+                log.info(self.summary())
+
+    def summary(self) -> str:
+        elapsed = time.monotonic() - self._start
+        rate = self.completed / elapsed if elapsed > 0 else 0.0
+
+        done = f"{self.completed}/{self.total}" if self.total is not None else str(self.completed)
+        line = f"progress: {done} items, {rate:.1f} items/s"
+        if self.total and rate > 0:
+            line += f", ETA {max(self.total - self.completed, 0) / rate:.0f}s"
+        if self.per_type:
+            line += " (" + ", ".join(f"{t}: {n}" for t, n in sorted(self.per_type.items())) + ")"
+        return line
+
+    def close(self) -> None:
+        if self._closed:
+            return
+
+        if self._pbar is not None:
+            self.refresh()
+            self._pbar.close()
+        elif self.mode == PROGRESS_LOG:
+            log.info(self.summary())
+        self._closed = True
@@ -0,0 +1,129 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+from __future__ import annotations
+import asyncio
+import logging
+import re
+import time
+from typing import Dict, Mapping, Optional, Tuple
+
+from datadog_sync.constants import LOGGER_NAME
+
+
+log = logging.getLogger(LOGGER_NAME)
+
+# Path segments that are part of the route, e.g. `v1` or `index-order`. Anything else is an id.
+_ROUTE_SEGMENT_RE = re.compile(r"^(v\d+|[a-z_]+(-[a-z_]+)*)$")
+# Public ids of dashboards and synthetic tests, e.g. `abc-def-ghi`
+_PUBLIC_ID_RE = re.compile(r"^[a-z0-9]{3}-[a-z0-9]{3}-[a-z0-9]{3}$")
+
+
+def request_route(method: str, path: str) -> Tuple[str, str]:
+    """Returns the method and path with ids replaced, e.g. `PUT /api/v1/dashboard/{id}`."""
+    path = path.split("?", 1)[0]
+    segments = [
+        s if not s or (_ROUTE_SEGMENT_RE.match(s) and not _PUBLIC_ID_RE.match(s)) else "{id}" for s in path.split("/")
+    ]
+    return method.upper(), "/".join(segments)
+
+
+class RateLimitBucket:
+    """Token bucket mirroring one Datadog rate limit.
+
+    Tokens refill at `limit / period` per second and are capped by the `remaining` count of the latest response.
+    Once the API reports no requests left, requests wait until the window resets.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.limit: Optional[int] = None
+        self.period: Optional[float] = None
+        self.tokens = 0.0
+        self.blocked_until = 0.0
+        self.waited = 0.0
+        self._updated = time.monotonic()
+        # Created lazily so it binds to the running event loop
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Waiters queue up on the lock so tokens are handed out in order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                else:
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    delay = (1 - self.tokens) * self.period / self.limit
+
+                log.debug(f"rate limit {self.name} exhausted, waiting {delay:.2f}s")
+                self.waited += delay
+                await asyncio.sleep(delay)
+
+    def update(self, limit: int, period: float, remaining: int, reset: float) -> None:
+        now = time.monotonic()
+        first_update = self.limit is None
+        self._refill(now)
+        self.limit = limit
+        self.period = period
+        # Requests still in flight already spent their tokens, only ever lower the local count
+        self.tokens = float(remaining) if first_update else min(self.tokens, float(remaining))
+        if remaining <= 0:
+            self.blocked_until = max(self.blocked_until, now + reset)
+
+    def _refill(self, now: float) -> None:
+        if self.blocked_until and now >= self.blocked_until:
+            # A new window started, the whole limit is available again
+            self.blocked_until = 0.0
+            self.tokens = float(self.limit)
+        elif self.limit and self.period:
+            self.tokens = min(float(self.limit), self.tokens + (now - self._updated) * self.limit / self.period)
+        self._updated = now
+
+
+class RateLimiter:
+    """Delays requests that would exceed a rate limit learned from the `x-ratelimit-*` response headers."""
+
+    def __init__(self, name: str = "") -> None:
+        self.name = name
+        self.buckets: Dict[str, RateLimitBucket] = {}
+        self._routes: Dict[Tuple[str, str], str] = {}
+
+    def __str__(self) -> str:
+        waits = {n: b.waited for n, b in self.buckets.items() if b.waited}
+        if not waits:
+            return f"{self.name} client did not wait for rate limits"
+        details = ", ".join(f"{n}: {w:.1f}s" for n, w in sorted(waits.items(), key=lambda i: -i[1]))
+        return f"{self.name} client waited {sum(waits.values()):.1f}s for rate limits ({details})"
+
+    async def acquire(self, method: str, path: str) -> None:
+        name = self._routes.get(request_route(method, path))
+        if name is not None:
+            await self.buckets[name].acquire()
+
+    def update(self, method: str, path: str, headers: Mapping[str, str]) -> None:
+        name = headers.get("x-ratelimit-name")
+        if not name:
+            return
+        try:
+            limit = int(headers["x-ratelimit-limit"])
+            period = float(headers["x-ratelimit-period"])
+            remaining = int(headers["x-ratelimit-remaining"])
+            reset = float(headers["x-ratelimit-reset"])
+        except (KeyError, ValueError):
+            return
+        if limit <= 0 or period <= 0:
+            return
+
+        self._routes[request_route(method, path)] = name
+        if name not in self.buckets:
+            self.buckets[name] = RateLimitBucket(name)
+        self.buckets[name].update(limit, period, remaining, reset)
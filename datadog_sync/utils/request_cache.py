@@ -0,0 +1,109 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+from __future__ import annotations
+import asyncio
+from collections import OrderedDict, defaultdict
+from copy import deepcopy
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from datadog_sync.utils.rate_limiter import request_route
+
+
+def request_scope(path: str) -> str:
+    """Returns the API a path belongs to, e.g. `/api/v1/dashboard` for `/api/v1/dashboard/abc-def-ghi`."""
+    return "/".join(path.split("?", 1)[0].split("/")[:4])
+
+
+# Leader result telling waiters to send the request themselves
+_RETRY = object()
+
+# Listing responses kept when memoizing
+MEMO_MAX_ENTRIES = 256
+
+
+def freeze(value: Any) -> Hashable:
+    """Hashable snapshot of request arguments."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class RequestCache:
+    """Single-flight and per run memo cache for the GET requests of one client.
+
+    Identical requests in flight at the same time share one HTTP call. When `max_entries` is set, responses of
+    collection requests (no id in the path) are also kept for the rest of the run. Any other request to the same
+    API, e.g. a PUT to `/api/v1/dashboard/{id}`, drops the memoized responses of that API. Every caller gets its own
+    copy.
+    """
+
+    def __init__(self, name: str = "", max_entries: int = 0) -> None:
+        self.name = name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.coalesced = 0
+        self._memo: OrderedDict[Tuple, Tuple[str, Any]] = OrderedDict()
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self._waiters: Dict[Tuple, int] = defaultdict(int)
+        # Bumped whenever an API is modified, responses fetched across a bump are not memoized
+        self._generations: Dict[str, int] = defaultdict(int)
+
+    def __str__(self) -> str:
+        return f"{self.name} client reused {self.hits} cached and {self.coalesced} in-flight responses"
+
+    async def get(self, key: Tuple, path: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        if key in self._memo:
+            self._memo.move_to_end(key)
+            self.hits += 1
+            return deepcopy(self._memo[key][1])
+
+        if key in self._inflight:
+            self.coalesced += 1
+            self._waiters[key] += 1
+            # Shielded so a cancelled waiter doesn't cancel the request of the others
+            result = await asyncio.shield(self._inflight[key])
+            if result is _RETRY:
+                self.coalesced -= 1
+                return await self.get(key, path, fetch)
+            return deepcopy(result)
+
+        scope = request_scope(path)
+        memoize = self.max_entries > 0 and "{id}" not in request_route("GET", path)[1]
+        generation = self._generations[scope]
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await fetch()
+        except asyncio.CancelledError:
+            # Only the leader was cancelled, the waiters still want the response
+            future.set_result(_RETRY)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Waiters re-raise it, don't warn about an unretrieved exception when there are none
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            waiters = self._waiters.pop(key, 0)
+
+        memoize = memoize and self._generations[scope] == generation
+        # The caller may modify the result, keep a pristine copy for the others
+        shared = deepcopy(result) if waiters or memoize else result
+        future.set_result(shared)
+        if memoize:
+            self._memo[key] = (scope, shared)
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+        return result
+
+    def invalidate(self, path: str) -> None:
+        scope = request_scope(path)
+        self._generations[scope] += 1
+        for key in [k for k, (s, _) in self._memo.items() if s == scope]:
+            del self._memo[key]
@@ -6,8 +6,10 @@
 from __future__ import annotations
 import re
 import logging
+from collections import defaultdict
 from copy import deepcopy
 from graphlib import TopologicalSorter
+from pprint import pformat
 from dateutil.parser import parse
 
 from deepdiff import DeepDiff
@@ -17,6 +19,7 @@ from datadog_sync.constants import LOGGER_NAME
 from typing import Callable, List, Optional, Set, TYPE_CHECKING, Any, Dict, Tuple
 
 if TYPE_CHECKING:
+    from datadog_sync.utils.base_resource import ResourceConfig
     from datadog_sync.utils.configuration import Configuration
 
 
@@ -217,7 +220,152 @@ def check_diff(resource_config, resource, state):
     )
 
 
+def prep_and_check_diff(
+    resource_config: ResourceConfig, resource: Dict, destination_resource: Optional[Dict]
+) -> Tuple[Dict, bool]:
+    """Prepares a resource for sync and checks whether it differs from its destination counterpart.
+
+    Only takes and returns picklable values so that it can run in the `--cpu-workers` process pool.
+
+    Returns:
+        Tuple[Dict, bool]: the prepared resource, and False if it matches the destination resource.
+    """
+    prep_resource(resource_config, resource)
+    if destination_resource is None:
+        return resource, True
+    return resource, bool(check_diff(resource_config, resource, destination_resource))
+
+
+def format_diff(resource_config: ResourceConfig, resource: Dict, destination_resource: Dict) -> Optional[str]:
+    """Returns the formatted diff between the prepared resource and destination resource, None if they match."""
+    # We have to compare the prepared versions to deal w/ non-nullable attributes
+    destination_copy = deepcopy(destination_resource)
+    resource_copy = deepcopy(resource)
+    prep_resource(resource_config, destination_copy)
+    prep_resource(resource_config, resource_copy)
+    diff = check_diff(resource_config, destination_copy, resource_copy)
+    return pformat(diff) if diff else None
+
+
 def init_topological_sorter(graph: Dict[Tuple[str, str], Set[Tuple[str, str]]]) -> TopologicalSorter:
     sorter = TopologicalSorter(graph)
     sorter.prepare()
     return sorter
+
+
+def compute_node_weights(graph: Dict[Tuple[str, str], Set[Tuple[str, str]]]) -> Dict[Tuple[str, str], Tuple[int, int]]:
+    """Weights ready nodes so the ones blocking the most work are synced first.
+
+    Args:
+        graph (Dict[Tuple[str, str], Set[Tuple[str, str]]]): Mapping of each node to its dependencies.
+
+    Returns:
+        Dict[Tuple[str, str], Tuple[int, int]]: Mapping of each node to the length of the longest chain of
+        dependents starting at the node, and its number of direct dependents.
+    """
+    dependents = defaultdict(list)
+    for node, deps in graph.items():
+        for dep in deps:
+            dependents[dep].append(node)
+
+    weights = {}
+    # static_order yields dependencies before their dependents, walk it backwards
+    for node in reversed(list(TopologicalSorter(graph).static_order())):
+        longest_path = 1 + max((weights[d][0] for d in dependents[node]), default=0)
+        weights[node] = (longest_path, len(dependents[node]))
+
+    return weights
+
+
+def group_resource_types(type_dependencies: Dict[str, Set[str]]) -> List[Set[str]]:
+    """Groups resource types that depend on each other, directly or transitively.
+
+    Types in a dependency cycle (e.g. dashboards -> monitors -> restriction_policies -> dashboards) can only be
+    synced once all of them are imported, so they are released together.
+
+    Args:
+        type_dependencies (Dict[str, Set[str]]): Mapping of each resource type to the types it connects to.
+
+    Returns:
+        List[Set[str]]: Groups of mutually dependent resource types.
+    """
+    reachable = {}
+    for resource_type in type_dependencies:
+        seen = set()
+        stack = list(type_dependencies[resource_type])
+        while stack:
+            dep = stack.pop()
+            if dep in seen or dep not in type_dependencies:
+                continue
+            seen.add(dep)
+            stack.extend(type_dependencies[dep])
+        reachable[resource_type] = seen
+
+    groups = []
+    grouped = set()
+    for resource_type in type_dependencies:
+        if resource_type in grouped:
+            continue
+        group = {resource_type} | {t for t in reachable[resource_type] if resource_type in reachable[t]}
+        grouped.update(group)
+        groups.append(group)
+
+    return groups
+
+
+class IncrementalTopologicalSorter:
+    """Topological sorter that accepts new nodes while it is being consumed.
+
+    Mirrors the `get_ready`/`done`/`is_active` interface of `graphlib.TopologicalSorter`. A node only becomes ready
+    once all of its predecessors were added and marked done, so predecessors must eventually be added. The sorter
+    stays active until `close()` is called and every node handed out is done.
+    """
+
+    def __init__(self) -> None:
+        self._npredecessors: Dict[Any, int] = {}
+        self._dependents: Dict[Any, List[Any]] = defaultdict(list)
+        self._done: Set[Any] = set()
+        self._ready: List[Any] = []
+        self._npassedout = 0
+        self._nfinalized = 0
+        self._closed = False
+
+    def add(self, node: Any, *predecessors: Any) -> None:
+        if self._closed:
+            raise ValueError("nodes cannot be added after close() is called")
+        if node in self._npredecessors:
+            raise ValueError(f"node {node!r} was already added")
+
+        pending = [p for p in set(predecessors) if p not in self._done]
+        self._npredecessors[node] = len(pending)
+        for p in pending:
+            self._dependents[p].append(node)
+        if not pending:
+            self._ready.append(node)
+
+    def get_ready(self) -> Tuple[Any, ...]:
+        ready = tuple(self._ready)
+        self._ready.clear()
+        self._npassedout += len(ready)
+        return ready
+
+    def done(self, *nodes: Any) -> None:
+        for node in nodes:
+            if node in self._done:
+                continue
+            self._done.add(node)
+            self._nfinalized += 1
+            for dependent in self._dependents.pop(node, []):
+                self._npredecessors[dependent] -= 1
+                if self._npredecessors[dependent] == 0:
+                    self._ready.append(dependent)
+
+    def close(self) -> None:
+        self._closed = True
+
+    def is_active(self) -> bool:
+        return not self._closed or self._nfinalized < self._npassedout or bool(self._ready)
+
+    def blocked_nodes(self) -> List[Any]:
+        """Returns the nodes that never became ready, e.g. because they are part of a cycle."""
+        return [n for n, count in self._npredecessors.items() if count > 0]
@@ -5,10 +5,9 @@
 
 from __future__ import annotations
 import asyncio
-from collections import defaultdict
 from copy import deepcopy
 from time import sleep
-from typing import Dict, TYPE_CHECKING, List, Optional, Set, Tuple
+from typing import Any, Callable, Dict, Iterator, TYPE_CHECKING, List, Optional, Set, Tuple
 
 from click import confirm
 from pprint import pformat
@@ -17,14 +16,17 @@ from datadog_sync.constants import TRUE, FALSE, FORCE, Command, Origin, Status
 from datadog_sync.utils.resource_utils import (
     CustomClientHTTPError,
     ResourceConnectionError,
+    IncrementalTopologicalSorter,
     SkipResource,
-    check_diff,
+    compute_node_weights,
     create_global_downtime,
     find_attr,
-    prep_resource,
+    format_diff,
+    group_resource_types,
+    prep_and_check_diff,
     init_topological_sorter,
 )
-from datadog_sync.utils.workers import Workers
+from datadog_sync.utils.workers import Counter, Workers
 
 
 if TYPE_CHECKING:
@@ -35,9 +37,17 @@ if TYPE_CHECKING:
 class ResourcesHandler:
     def __init__(self, config: Configuration) -> None:
         self.config = config
-        self.sorter: Optional[TopologicalSorter] = None
+        self.sorter: Optional[TopologicalSorter | IncrementalTopologicalSorter] = None
         self.worker: Optional[Workers] = None
+        self._sorter_done: Optional[asyncio.Event] = None
         self._dependency_graph = Optional[Dict[Tuple[str, str], List[Tuple[str, str]]]]
+        # Pipelined migrate state
+        self.import_worker: Optional[Workers] = None
+        self._type_groups: List[Set[str]] = []
+        self._type_dependencies: Dict[str, Set[str]] = {}
+        self._imported_types: Set[str] = set()
+        self._released_types: Set[str] = set()
+        self._import_pending: Dict[str, int] = {}
 
     async def init_async(self) -> None:
         self.worker: Workers = Workers(self.config)
@@ -52,7 +62,7 @@ class ResourcesHandler:
             await self.import_resources_without_saving()
 
         # move the import data from source to destination
-        self.config.state._data.destination = self.config.state._data.source
+        self.config.state.use_source_as_destination()
 
         for resource_type in self.config.resources_arg:
             resources = {}
@@ -85,24 +95,10 @@ class ResourcesHandler:
             self.config.logger.info("did not import missing dependencies...")
 
         # handle resource cleanups
-        if self.config.cleanup != FALSE:
-            cleanup_resources = self.config.state.get_resources_to_cleanup(self.config.resources_arg)
-            if cleanup_resources:
-                cleanup = _cleanup_prompt(self.config, cleanup_resources)
-                if cleanup:
-                    self.config.logger.info("cleaning up resources...")
-                    await self.worker.init_workers(self._cleanup_worker, None, None)
-                    for i in cleanup_resources:
-                        self.worker.work_queue.put_nowait(i)
-                    await self.worker.schedule_workers()
-                    self.config.logger.info("finished cleaning up resources")
+        await self._cleanup_resources()
 
         # Run pre-apply hooks
-        resource_types = set(i[0] for i in self._dependency_graph)
-        await self.worker.init_workers(self._pre_apply_hook_cb, None, len(resource_types))
-        for resource_type in resource_types:
-            self.worker.work_queue.put_nowait(resource_type)
-        await self.worker.schedule_workers()
+        await self._run_pre_apply_hooks(set(i[0] for i in self._dependency_graph))
 
         # Additional pre-apply actions
         if self.config.create_global_downtime:
@@ -110,14 +106,140 @@ class ResourcesHandler:
 
         # initalize topological sorters
         self.sorter = init_topological_sorter(self._dependency_graph)
-        await self.worker.init_workers(self._apply_resource_cb, lambda: not self.sorter.is_active(), None)
-        await self.worker.schedule_workers_with_pbar(
-            total=len(self._dependency_graph), additional_coros=[self.run_sorter()]
+        self._sorter_done = asyncio.Event()
+        await self.worker.init_workers(
+            self._apply_resource_cb,
+            self._sorter_done,
+            None,
+            item_weights=compute_node_weights(self._dependency_graph),
         )
+        self._dispatch_ready_nodes()
+        await self.worker.schedule_workers_with_pbar(total=len(self._dependency_graph))
         self.config.logger.info(f"finished syncing resource items: {self.worker.counter}.")
 
         self.config.state.dump_state()
 
+    async def migrate_resources(self) -> None:
+        """Import and sync resources in a single pass.
+
+        A resource type starts syncing as soon as it and the types it connects to are imported, while slower
+        types are still being fetched from the source.
+        """
+        if self.config.force_missing_dependencies:
+            # Missing dependencies are only known once every type is imported
+            self.config.logger.info("--force-missing-dependencies is set, importing before syncing")
+            await self.import_resources()
+            await self.apply_resources()
+            return
+
+        resource_types = set(self.config.resources_arg)
+        self._type_dependencies = {
+            resource_type: set(self.config.resources[resource_type].resource_config.resource_connections or {})
+            & resource_types
+            for resource_type in resource_types
+        }
+        self._type_groups = group_resource_types(self._type_dependencies)
+        self._imported_types = set()
+        self._released_types = set()
+        self._import_pending = {}
+        self._dependency_graph = {}
+        self.sorter = None
+
+        # Fetch from the source on a separate pool so that the destination is synced concurrently
+        self.import_worker = Workers(self.config)
+        await self.import_worker.init_workers(self._migrate_import_cb, None, None)
+        for resource_type in resource_types:
+            self.import_worker.work_queue.put_nowait(resource_type)
+        import_task = asyncio.ensure_future(self.import_worker.schedule_workers())
+
+        await self._run_pre_apply_hooks(resource_types)
+        if self.config.create_global_downtime:
+            await create_global_downtime(self.config)
+
+        self.sorter = IncrementalTopologicalSorter()
+        self._sorter_done = asyncio.Event()
+        await self.worker.init_workers(self._apply_resource_cb, self._sorter_done, None)
+        self._release_imported_types()
+        await self.worker.schedule_workers_with_pbar(total=len(self._dependency_graph))
+
+        await import_task
+        self.config.logger.info(f"finished importing individual resource items: {self.import_worker.counter}.")
+        self.config.logger.info(f"finished syncing resource items: {self.worker.counter}.")
+        blocked = self.sorter.blocked_nodes()
+        if blocked:
+            self.config.logger.error(f"resources with circular dependencies were not synced: {blocked}")
+        self.config.state.dump_state(Origin.SOURCE)
+
+        # Cleanup needs the complete source state
+        await self._cleanup_resources()
+
+        self.config.state.dump_state()
+
+    async def _migrate_import_cb(self, q_item: str | Tuple[str, Dict]) -> None:
+        if isinstance(q_item, str):
+            resources = []
+            try:
+                resources = await self._get_resources(q_item, self.import_worker.counter) or []
+            finally:
+                # The type must always complete, its dependents would never be synced otherwise
+                self._import_pending[q_item] = len(resources)
+                for resource in resources:
+                    self.import_worker.work_queue.put_nowait((q_item, resource))
+                if not resources:
+                    self._on_type_imported(q_item)
+            return
+
+        resource_type = q_item[0]
+        try:
+            await self._import_resource_item(q_item, self.import_worker.counter)
+        finally:
+            self._import_pending[resource_type] -= 1
+            if self._import_pending[resource_type] == 0:
+                self._on_type_imported(resource_type)
+
+    def _on_type_imported(self, resource_type: str) -> None:
+        self.config.logger.info("finished importing resources", resource_type=resource_type)
+        self._imported_types.add(resource_type)
+        # Types imported before the sync workers start are released once they do
+        if self.sorter is not None:
+            self._release_imported_types()
+
+    def _release_imported_types(self) -> None:
+        """Add the nodes of every imported type group whose dependency types were already added to the sorter."""
+        released = True
+        while released:
+            released = False
+            for group in self._type_groups:
+                if group <= self._released_types or not group <= self._imported_types:
+                    continue
+                dependencies = set().union(*(self._type_dependencies[t] for t in group)) - group
+                if not dependencies <= self._released_types:
+                    continue
+                self._release_type_group(group)
+                released = True
+
+        if self._released_types == set(self._type_dependencies):
+            self.sorter.close()
+        if self.worker.progress is not None:
+            self.worker.progress.total = len(self._dependency_graph)
+        self._dispatch_ready_nodes()
+
+    def _release_type_group(self, group: Set[str]) -> None:
+        self.config.logger.info(f"syncing resource types: {', '.join(sorted(group))}")
+        self._released_types.update(group)
+        for resource_type in group:
+            for _id in self.config.state.source[resource_type]:
+                deps, _ = self._resource_connections(resource_type, _id)
+                # Dependencies missing from source are never added, _dispatch_ready_nodes would skip them anyway
+                deps = {d for d in deps if d[1] in self.config.state.source[d[0]]}
+                for dep in deps:
+                    # Dependencies of types outside of the run are synced from the existing source state
+                    if dep[0] not in self._type_dependencies and dep not in self._dependency_graph:
+                        self._dependency_graph[dep] = set()
+                        self.sorter.add(dep)
+                self._dependency_graph[(resource_type, _id)] = deps
+                self.sorter.add((resource_type, _id), *deps)
+
     async def _apply_resource_cb(self, q_item: List) -> None:
         resource_type, _id = q_item
 
@@ -125,9 +247,6 @@ class ResourcesHandler:
             r_class = self.config.resources[resource_type]
             resource = deepcopy(self.config.state.source[resource_type][_id])
 
-            if not r_class.resource_config.concurrent:
-                await r_class.resource_config.async_lock.acquire()
-
             if not r_class.filter(resource):
                 self.worker.counter.increment_filtered()
                 return
@@ -136,10 +255,14 @@ class ResourcesHandler:
             await r_class._pre_resource_action_hook(_id, resource)
             r_class.connect_resources(_id, resource)
 
-            prep_resource(r_class.resource_config, resource)
+            resource, changed = await self._run_cpu_bound(
+                prep_and_check_diff,
+                r_class.resource_config,
+                resource,
+                self.config.state.destination[resource_type].get(_id),
+            )
             if _id in self.config.state.destination[resource_type]:
-                diff = check_diff(r_class.resource_config, resource, self.config.state.destination[resource_type][_id])
-                if not diff:
+                if not changed:
                     raise SkipResource(_id, resource_type, "No differences detected.")
 
                 self.config.logger.debug(f"Running update for {resource_type} with {_id}")
@@ -174,27 +297,25 @@ class ResourcesHandler:
         finally:
             # always place in done queue regardless of exception thrown
             self.sorter.done(q_item)
-            if not r_class.resource_config.concurrent:
-                r_class.resource_config.async_lock.release()
+            self._dispatch_ready_nodes()
 
     async def diffs(self) -> None:
         self._dependency_graph, _ = self.get_dependency_graph()
 
         # Run pre-apply hooks
-        resource_types = set(i[0] for i in self._dependency_graph.keys())
-        await self.worker.init_workers(self._pre_apply_hook_cb, None, len(resource_types))
-        for resource_type in resource_types:
-            self.worker.work_queue.put_nowait(resource_type)
-        await self.worker.schedule_workers()
+        await self._run_pre_apply_hooks(set(i[0] for i in self._dependency_graph.keys()))
 
         # Check diffs for individual resource items
-        await self.worker.init_workers(self._diffs_worker_cb, None, None)
+        producer_done = asyncio.Event()
+        await self.worker.init_workers(self._diffs_worker_cb, producer_done, None, bounded=True)
+        await self.worker.schedule_workers(additional_coros=[self.worker.produce(self._diff_items(), producer_done)])
+
+    def _diff_items(self) -> Iterator[Tuple[str, str, bool]]:
         for resource_type, _id in self._dependency_graph.keys():
-            self.worker.work_queue.put_nowait((resource_type, _id, False))
+            yield resource_type, _id, False
         if self.config.cleanup != FALSE:
             for resource_type, _id in self.config.state.get_resources_to_cleanup(self.config.resources_arg).keys():
-                self.worker.work_queue.put_nowait((resource_type, _id, True))
-        await self.worker.schedule_workers()
+                yield resource_type, _id, True
 
     async def _diffs_worker_cb(self, q_item: List) -> None:
         resource_type, _id, delete = q_item
@@ -227,14 +348,11 @@ class ResourcesHandler:
                 return
 
             if _id in self.config.state.destination[resource_type]:
-                # We have to compare the prepared versions to deal w/ non-nullable attributes
-                destination_copy = deepcopy(self.config.state.destination[resource_type][_id])
-                resource_copy = deepcopy(resource)
-                prep_resource(r_class.resource_config, destination_copy)
-                prep_resource(r_class.resource_config, resource_copy)
-                diff = check_diff(r_class.resource_config, destination_copy, resource_copy)
+                diff = await self._run_cpu_bound(
+                    format_diff, r_class.resource_config, resource, self.config.state.destination[resource_type][_id]
+                )
                 if diff:
-                    self.config.logger.info("diff: \n {}".format(pformat(diff)), resource_type=resource_type, _id=_id)
+                    self.config.logger.info("diff: \n {}".format(diff), resource_type=resource_type, _id=_id)
             else:
                 self.config.logger.info(f"to be created: {resource_type} {_id}")
 
@@ -243,26 +361,45 @@ class ResourcesHandler:
         self.config.state.dump_state(Origin.SOURCE)
 
     async def import_resources_without_saving(self) -> None:
-        # Get all resources for each resource type
-        tmp_storage = defaultdict(list)
-        await self.worker.init_workers(self._import_get_resources_cb, None, len(self.config.resources_arg), tmp_storage)
-        for resource_type in self.config.resources_arg:
-            self.worker.work_queue.put_nowait(resource_type)
-        await self.worker.schedule_workers_with_pbar(total=len(self.config.resources_arg))
-        self.config.logger.info(f"Finished getting resources. {self.worker.counter}")
-
-        # Begin importing individual resource items
-        self.config.logger.info("importing individual resource items")
-        await self.worker.init_workers(self._import_resource, None, None)
-        total = 0
-        for k, v in tmp_storage.items():
-            total += len(v)
-            for resource in v:
-                self.worker.work_queue.put_nowait((k, resource))
-        await self.worker.schedule_workers_with_pbar(total=total)
+        # Resources are imported as the pages of their listing come in, the listings run alongside the workers
+        listing_counter = Counter()
+        producer_done = asyncio.Event()
+        await self.worker.init_workers(self._import_resource, producer_done, None, bounded=True)
+        await self.worker.schedule_workers_with_pbar(
+            total=None, additional_coros=[self._list_import_items(listing_counter, producer_done)]
+        )
+        self.config.logger.info(f"Finished getting resources. {listing_counter}")
         self.config.logger.info(f"finished importing individual resource items: {self.worker.counter}.")
 
-    async def _import_get_resources_cb(self, resource_type: str, tmp_storage) -> None:
+    async def _list_import_items(self, counter: Counter, producer_done: asyncio.Event) -> None:
+        try:
+            await asyncio.gather(
+                *(self._list_resource_type(resource_type, counter) for resource_type in self.config.resources_arg)
+            )
+        finally:
+            producer_done.set()
+
+    async def _list_resource_type(self, resource_type: str, counter: Counter) -> None:
+        self.config.logger.info("getting resources", resource_type=resource_type)
+
+        r_class = self.config.resources[resource_type]
+        self.config.state.source[resource_type].clear()
+
+        try:
+            async for page in r_class._get_resources_pages(self.config.source_client):
+                if self.worker.progress is not None:
+                    self.worker.progress.total = (self.worker.progress.total or 0) + len(page)
+                for resource in page:
+                    await self.worker.work_queue.put((resource_type, resource))
+            counter.increment_success()
+        except TimeoutError:
+            counter.increment_failure()
+            self.config.logger.error(f"TimeoutError while getting resources {resource_type}")
+        except Exception as e:
+            counter.increment_failure()
+            self.config.logger.error(f"Error while getting resources {resource_type}: {str(e)}")
+
+    async def _get_resources(self, resource_type: str, counter: Counter) -> Optional[List[Dict]]:
         self.config.logger.info("getting resources", resource_type=resource_type)
 
         r_class = self.config.resources[resource_type]
@@ -270,35 +407,39 @@ class ResourcesHandler:
 
         try:
             get_resp = await r_class._get_resources(self.config.source_client)
-            self.worker.counter.increment_success()
-            tmp_storage[resource_type] = get_resp
+            counter.increment_success()
+            return get_resp
         except TimeoutError:
-            self.worker.counter.increment_failure()
+            counter.increment_failure()
             self.config.logger.error(f"TimeoutError while getting resources {resource_type}")
         except Exception as e:
-            self.worker.counter.increment_failure()
+            counter.increment_failure()
             self.config.logger.error(f"Error while getting resources {resource_type}: {str(e)}")
+        return None
 
     async def _import_resource(self, q_item: List) -> None:
+        await self._import_resource_item(q_item, self.worker.counter)
+
+    async def _import_resource_item(self, q_item: List, counter: Counter) -> None:
         resource_type, resource = q_item
         _id = resource.get("id")
         r_class = self.config.resources[resource_type]
 
         if not r_class.filter(resource):
-            self.worker.counter.increment_filtered()
+            counter.increment_filtered()
             return
 
         try:
             await r_class._import_resource(resource=resource)
-            self.worker.counter.increment_success()
+            counter.increment_success()
             await r_class._send_action_metrics(Command.IMPORT.value, _id, Status.SUCCESS.value)
         except SkipResource as e:
-            self.worker.counter.increment_skipped()
+            counter.increment_skipped()
             await r_class._send_action_metrics(Command.IMPORT.value, _id, Status.SKIPPED.value)
             self.config.logger.info(f"skipping resource: {str(e)}", resource_type=resource_type, _id=_id)
             self.config.logger.debug(str(e))
         except Exception as e:
-            self.worker.counter.increment_failure()
+            counter.increment_failure()
             await r_class._send_action_metrics(Command.IMPORT.value, _id, Status.FAILURE.value)
             self.config.logger.error(f"error while importing resource: resource_type:{resource_type} id:{_id}")
             self.config.logger.debug(f"error detail: {str(e)}", resource_type=resource_type)
@@ -322,9 +463,6 @@ class ResourcesHandler:
 
         r_class = self.config.resources[resource_type]
         try:
-            if not r_class.resource_config.concurrent:
-                await r_class.resource_config.async_lock.acquire()
-
             await r_class._delete_resource(_id)
             self.worker.counter.increment_success()
             await r_class._send_action_metrics("delete", _id, Status.SUCCESS.value)
@@ -337,9 +475,27 @@ class ResourcesHandler:
             self.worker.counter.increment_failure()
             await r_class._send_action_metrics("delete", _id, Status.FAILURE.value)
             self.config.logger.error(f"error deleting resource {resource_type} with id {_id}: {str(e)}")
-        finally:
-            if not r_class.resource_config.concurrent:
-                r_class.resource_config.async_lock.release()
+
+    async def _cleanup_resources(self) -> None:
+        if self.config.cleanup == FALSE:
+            return
+
+        cleanup_resources = self.config.state.get_resources_to_cleanup(self.config.resources_arg)
+        if cleanup_resources:
+            cleanup = _cleanup_prompt(self.config, cleanup_resources)
+            if cleanup:
+                self.config.logger.info("cleaning up resources...")
+                await self.worker.init_workers(self._cleanup_worker, None, None)
+                for i in cleanup_resources:
+                    self.worker.work_queue.put_nowait(i)
+                await self.worker.schedule_workers()
+                self.config.logger.info("finished cleaning up resources")
+
+    async def _run_pre_apply_hooks(self, resource_types: Set[str]) -> None:
+        await self.worker.init_workers(self._pre_apply_hook_cb, None, len(resource_types))
+        for resource_type in resource_types:
+            self.worker.work_queue.put_nowait(resource_type)
+        await self.worker.schedule_workers()
 
     async def _pre_apply_hook_cb(self, resource_type: str) -> None:
         try:
@@ -347,17 +503,28 @@ class ResourcesHandler:
         except Exception as e:
             self.config.logger.warning(f"error while running pre-apply hook: {str(e)}", resource_type=resource_type)
 
-    async def run_sorter(self):
-        loop = asyncio.get_event_loop()
-        while await loop.run_in_executor(None, self.sorter.is_active):
-            for node in self.sorter.get_ready():
+    async def _run_cpu_bound(self, func: Callable, *args: Any) -> Any:
+        """Runs `func` in the `--cpu-workers` process pool if there is one, inline otherwise."""
+        if self.config.cpu_executor is None:
+            return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(self.config.cpu_executor, func, *args)
+
+    def _dispatch_ready_nodes(self) -> None:
+        """Queue every node whose dependencies are done. Called again each time a node is marked done."""
+        ready = self.sorter.get_ready()
+        while ready:
+            for node in ready:
                 if node[1] not in self.config.state.source[node[0]]:
                     # at this point, we already attempted to import missing resources
                     # so mark the node as complete and continue
                     self.sorter.done(node)
                     continue
-                await self.worker.work_queue.put(node)
-            await asyncio.sleep(0)
+                self.worker.work_queue.put_nowait(node)
+            # marking missing nodes as done can release their dependents
+            ready = self.sorter.get_ready()
+
+        if not self.sorter.is_active():
+            self._sorter_done.set()
 
     def get_dependency_graph(self) -> Tuple[Dict[Tuple[str, str], List[Tuple[str, str]]], Set[Tuple[str, str]]]:
         """Build the dependency graph for all resources.
@@ -0,0 +1,125 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+from __future__ import annotations
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, FrozenSet, Mapping, Optional
+
+from datadog_sync.constants import LOGGER_NAME
+
+
+log = logging.getLogger(LOGGER_NAME)
+
+
+class RetryBudget:
+    """Caps retries to a share of the requests sent.
+
+    Every request deposits `ratio` tokens and every retry withdraws one, with `min_retries` available from the start.
+    Deposits are capped at `max_tokens` so a long healthy run doesn't bank retries for a later outage. Once the
+    budget is spent, failed requests are not retried until enough new requests are sent.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_retries: int = 10, max_tokens: Optional[float] = None) -> None:
+        self.ratio = ratio
+        self.max_tokens = max_tokens if max_tokens is not None else max(float(min_retries), 100.0)
+        self.tokens = float(min_retries)
+        self.retries = 0
+        self.exhausted = 0
+
+    def on_request(self) -> None:
+        self.tokens = min(self.tokens + self.ratio, self.max_tokens)
+
+    def try_retry(self) -> bool:
+        if self.tokens < 1:
+            if not self.exhausted:
+                log.warning("retry budget exhausted, failing requests without retrying until the API recovers")
+            self.exhausted += 1
+            return False
+        self.tokens -= 1
+        self.retries += 1
+        return True
+
+
+class RetryPolicy:
+    """Decides which failed requests are retried and how long to wait before each attempt.
+
+    429 and 5xx responses are retried, except the statuses in `no_retry_statuses`. Only 5xx retries are taken from
+    the retry budget, rate limited requests are retried until the retry timeout since the API tells when to. The
+    delay is taken from the `x-ratelimit-reset` header of rate limited responses, then from `Retry-After`, and
+    otherwise grows exponentially from `base_delay` up to `max_delay` with full jitter so clients that failed
+    together don't retry together.
+    """
+
+    def __init__(
+        self,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        budget: Optional[RetryBudget] = None,
+        retry_statuses: FrozenSet[int] = frozenset({429}),
+        no_retry_statuses: FrozenSet[int] = frozenset({501, 505}),
+        name: str = "",
+        rand: Callable[[float, float], float] = random.uniform,
+    ) -> None:
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+        self.retry_statuses = retry_statuses
+        self.no_retry_statuses = no_retry_statuses
+        self.name = name
+        self._rand = rand
+        self.rate_limited = 0
+
+    def __str__(self) -> str:
+        line = f"{self.name} client retried {self.budget.retries} requests"
+        if self.rate_limited:
+            line += f" and {self.rate_limited} rate limited requests"
+        if self.budget.exhausted:
+            line += f", {self.budget.exhausted} failed without retry once the retry budget was spent"
+        return line
+
+    def on_request(self) -> None:
+        self.budget.on_request()
+
+    def is_retryable(self, status: int) -> bool:
+        if status in self.no_retry_statuses:
+            return False
+        return status >= 500 or status in self.retry_statuses
+
+    def delay(self, attempt: int, status: int, headers: Mapping[str, str]) -> float:
+        """Seconds to wait before retry number `attempt` (starting at 0) of a request that failed with `status`."""
+        if status == 429 and "x-ratelimit-reset" in headers:
+            try:
+                return max(float(headers["x-ratelimit-reset"]), 0.0)
+            except ValueError:
+                pass
+
+        retry_after = _parse_retry_after(headers.get("Retry-After"))
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+
+        return self._rand(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def try_retry(self, status: int) -> bool:
+        if status == 429:
+            self.rate_limited += 1
+            return True
+        return self.budget.try_retry()
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """`Retry-After` is either a number of seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError, IndexError):
+        return None
@@ -2,7 +2,8 @@
 # under the 3-clause BSD style license (see LICENSE).
 # This product includes software developed at Datadog (https://www.datadoghq.com/).
 # Copyright 2019 Datadog, Inc.
-from typing import Any, Dict, List, Tuple
+import logging
+from typing import Any, Dict, List, Optional, Tuple
 
 from datadog_sync.constants import (
     Origin,
@@ -10,13 +11,23 @@ from datadog_sync.constants import (
     AWS_BUCKET_KEY_PREFIX_SOURCE,
     DESTINATION_PATH_DEFAULT,
     DESTINATION_PATH_PARAM,
+    LOGGER_NAME,
     SOURCE_PATH_DEFAULT,
     SOURCE_PATH_PARAM,
+    SQLITE_PATH_DEFAULT,
+    SQLITE_PATH_PARAM,
+    STATE_JOURNAL_COMPACT_INTERVAL_DEFAULT,
 )
 from datadog_sync.utils.storage._base_storage import BaseStorage, StorageData
 from datadog_sync.utils.storage.aws_s3_bucket import AWSS3Bucket
 from datadog_sync.utils.storage.local_file import LocalFile
+from datadog_sync.utils.storage.local_sharded_file import LocalShardedFile
+from datadog_sync.utils.storage.sqlite_database import SQLiteDatabase
 from datadog_sync.utils.storage.storage_types import StorageType
+from datadog_sync.utils.state_journal import StateJournal
+
+
+log = logging.getLogger(LOGGER_NAME)
 
 
 class State:
@@ -28,6 +39,20 @@ class State:
                 source_resources_path=source_resources_path,
                 destination_resources_path=destination_resources_path,
             )
+        elif type_ == StorageType.LOCAL_SHARDED:
+            source_resources_path = kwargs.get(SOURCE_PATH_PARAM, SOURCE_PATH_DEFAULT)
+            destination_resources_path = kwargs.get(DESTINATION_PATH_PARAM, DESTINATION_PATH_DEFAULT)
+            self._storage: BaseStorage = LocalShardedFile(
+                source_resources_path=source_resources_path,
+                destination_resources_path=destination_resources_path,
+            )
+        elif type_ == StorageType.SQLITE:
+            # The resources paths label the rows of each origin
+            self._storage: BaseStorage = SQLiteDatabase(
+                path=kwargs.get(SQLITE_PATH_PARAM, SQLITE_PATH_DEFAULT),
+                source_origin=kwargs.get(SOURCE_PATH_PARAM, Origin.SOURCE.value),
+                destination_origin=kwargs.get(DESTINATION_PATH_PARAM, Origin.DESTINATION.value),
+            )
         elif type_ == StorageType.AWS_S3_BUCKET:
             source_resources_path = kwargs.get(AWS_BUCKET_KEY_PREFIX_SOURCE, SOURCE_PATH_DEFAULT)
             destination_resources_path = kwargs.get(AWS_BUCKET_KEY_PREFIX_DESTINATION, DESTINATION_PATH_DEFAULT)
@@ -42,6 +67,12 @@ class State:
         else:
             raise NotImplementedError(f"Storage type {type_} not implemented")
 
+        # Destination changes are journaled between two dumps so an interrupted run can resume
+        journal_path = kwargs.get("journal_path")
+        self._journal: Optional[StateJournal] = StateJournal(journal_path) if journal_path else None
+        self._journal_compact_interval = kwargs.get("journal_compact_interval", STATE_JOURNAL_COMPACT_INTERVAL_DEFAULT)
+        self._journal_compact_at = self._journal_compact_interval
+
         self._data: StorageData = StorageData()
         self.load_state()
 
@@ -55,9 +86,61 @@ class State:
 
     def load_state(self, origin: Origin = Origin.ALL) -> None:
         self._data = self._storage.get(origin)
+        if self._journal and origin in [Origin.DESTINATION, Origin.ALL]:
+            replayed = self._journal.replay(self._data.destination)
+            if replayed:
+                log.info(f"recovered {replayed} destination changes from the interrupted run in {self._journal.path}")
 
     def dump_state(self, origin: Origin = Origin.ALL) -> None:
         self._storage.put(origin, self._data)
+        if self._journal and origin in [Origin.DESTINATION, Origin.ALL]:
+            self._journal.truncate()
+
+    def use_source_as_destination(self) -> None:
+        """Makes the imported source resources the destination resources, e.g. to delete them on reset.
+
+        They are keyed by the ids of the destination organization, not by the source ids of the destination state.
+        The journal is closed so that their changes never reach the destination state files.
+        """
+        self._data.destination = self._data.source
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+
+    def close(self) -> None:
+        """Releases the storage and journal, the state can't be dumped afterwards."""
+        if self._journal:
+            self._journal.close()
+        self._storage.close()
+
+    def set_destination(self, resource_type: str, _id: str, resource: Dict) -> None:
+        """Store a resource created or updated in the destination."""
+        self._data.destination[resource_type][_id] = resource
+        self._journal_change(resource_type, _id, resource)
+
+    def remove_destination(self, resource_type: str, _id: str) -> None:
+        """Forget a resource deleted from the destination."""
+        self._data.destination[resource_type].pop(_id, None)
+        self._journal_change(resource_type, _id, None)
+
+    def _journal_change(self, resource_type: str, _id: str, resource: Optional[Dict]) -> None:
+        """Journals a destination change, folding the journal into the state files every compaction interval.
+
+        Compacting runs on the event loop and stalls the other resources while the destination resource types
+        changed since the last write are serialized and written. Keep the interval high for large organizations.
+        """
+        if not self._journal:
+            return
+        self._journal.append(resource_type, _id, resource)
+        if self._journal_compact_interval and self._journal.entries >= self._journal_compact_at:
+            try:
+                self.dump_state(Origin.DESTINATION)
+            except Exception as e:
+                # The journal is only removed once the state files are written, it still holds every change
+                log.warning(f"failed to compact the state journal {self._journal.path}: {e}")
+                self._journal_compact_at = self._journal.entries + self._journal_compact_interval
+            else:
+                self._journal_compact_at = self._journal_compact_interval
 
     def get_all_resources(self, resources_types: List[str]) -> Dict[Tuple[str, str], Any]:
         """Returns all resources of the given types.
@@ -90,10 +173,7 @@ class State:
         cleanup_resources = {}
 
         for resource_type in resources_types:
-            source_resources = set(self.source[resource_type].keys())
-            destination_resources = set(self.destination[resource_type].keys())
-
-            for _id in destination_resources.difference(source_resources):
+            for _id in self._storage.ids_not_in(self.destination[resource_type], self.source[resource_type]):
                 cleanup_resources[(resource_type, _id)] = None
 
         return cleanup_resources
@@ -0,0 +1,83 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+from __future__ import annotations
+import json
+import logging
+import os
+from typing import Any, Dict, IO, Optional
+
+from datadog_sync.constants import LOGGER_NAME
+
+
+log = logging.getLogger(LOGGER_NAME)
+
+JOURNAL_PUT = "put"
+JOURNAL_DELETE = "delete"
+
+
+class StateJournal:
+    """Append-only log of the changes made to the destination state.
+
+    Every create, update and delete appends one JSON line, flushed to the OS right away so that it survives the
+    process being killed. On the next run the lines are replayed on top of the state files, and once the state
+    files are written again the journal is removed.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.entries = 0
+        self._file: Optional[IO[str]] = None
+
+    def append(self, resource_type: str, _id: str, resource: Optional[Dict[str, Any]]) -> None:
+        """Record the new value of a destination resource, `None` when it was deleted."""
+        if resource is None:
+            entry = {"op": JOURNAL_DELETE, "type": resource_type, "id": _id}
+        else:
+            entry = {"op": JOURNAL_PUT, "type": resource_type, "id": _id, "resource": resource}
+        line = json.dumps(entry) + "\n"
+
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a")
+        self._file.write(line)
+        self._file.flush()
+        self.entries += 1
+
+    def replay(self, destination: Dict[str, Dict[str, Any]]) -> int:
+        """Apply the recorded changes to `destination`, returns the number of changes applied."""
+        if not os.path.exists(self.path):
+            return 0
+
+        replayed = 0
+        with open(self.path) as f:
+            for n, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                    if entry["op"] == JOURNAL_PUT:
+                        destination[entry["type"]][entry["id"]] = entry["resource"]
+                    else:
+                        destination[entry["type"]].pop(entry["id"], None)
+                except (ValueError, KeyError, TypeError):
+                    # Only the last line can be cut short by a crash
+                    log.warning(f"ignoring invalid entry on line {n} of the state journal {self.path}")
+                    continue
+                replayed += 1
+        self.entries = replayed
+        return replayed
+
+    def truncate(self) -> None:
+        """Drop the recorded changes once they are part of the state files."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self.entries = 0
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -3,21 +3,70 @@
 # This product includes software developed at Datadog (https://www.datadoghq.com/).
 # Copyright 2019 Datadog, Inc.
 
+import hashlib
+import json
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
 from collections import defaultdict
 
+from datadog_sync.constants import Origin
+
+
+class ResourcesData(defaultdict):
+    """Resources of one origin by resource type, then id.
+
+    Remembers the resource types accessed since it was loaded. Types that were never accessed can't have changed
+    and are not written back to storage. Missing types are created by `resource_factory` when given, with an empty
+    dict otherwise.
+    """
+
+    def __init__(self, *args: Any, resource_factory: Optional[Callable[[str], Any]] = None) -> None:
+        # copy and pickle pass the default factory, the items are set afterwards
+        super().__init__(dict)
+        self.resource_factory = resource_factory
+        self.touched: Set[str] = set()
+
+    def __missing__(self, resource_type: str) -> Any:
+        if self.resource_factory is None:
+            return super().__missing__(resource_type)
+        value = self[resource_type] = self.resource_factory(resource_type)
+        return value
+
+    def __getitem__(self, resource_type: str) -> Any:
+        self.touched.add(resource_type)
+        return super().__getitem__(resource_type)
+
+    def __setitem__(self, resource_type: str, value: Any) -> None:
+        self.touched.add(resource_type)
+        super().__setitem__(resource_type, value)
+
+    def __delitem__(self, resource_type: str) -> None:
+        self.touched.add(resource_type)
+        super().__delitem__(resource_type)
+
+    def pop(self, resource_type: str, *args: Any) -> Any:
+        self.touched.add(resource_type)
+        return super().pop(resource_type, *args)
+
+    def setdefault(self, resource_type: str, default: Any = None) -> Any:
+        self.touched.add(resource_type)
+        return super().setdefault(resource_type, default)
+
 
 @dataclass
 class StorageData:
-    source: Dict[str, Any] = field(default_factory=lambda: defaultdict(dict))
-    destination: Dict[str, Any] = field(default_factory=lambda: defaultdict(dict))
+    source: Dict[str, Any] = field(default_factory=ResourcesData)
+    destination: Dict[str, Any] = field(default_factory=ResourcesData)
 
 
 class BaseStorage(ABC):
     """Base class for storage"""
 
+    def __init__(self) -> None:
+        # Digest of each resource type file as last read or written
+        self._digests: Dict[Tuple[Origin, str], bytes] = {}
+
     @abstractmethod
     def get(self, origin) -> StorageData:
         """Get resouces state from storage"""
@@ -27,3 +76,44 @@ class BaseStorage(ABC):
     def put(self, origin, data: StorageData) -> None:
         """Write resources into storage"""
         pass
+
+    def ids_not_in(self, resources: Dict[str, Any], other: Dict[str, Any]) -> Set[str]:
+        """Ids of `resources` missing from `other`, both resources of one type."""
+        return set(resources.keys()).difference(other.keys())
+
+    def close(self) -> None:
+        """Releases the storage once the state is no longer used."""
+        pass
+
+    def loaded(self, origin: Origin, resource_type: str, content: bytes) -> None:
+        """Records the content of a resource type file read from storage."""
+        self._digests[(origin, resource_type)] = hashlib.sha256(content).digest()
+
+    @staticmethod
+    def pending(resources: Dict[str, Any]) -> List[str]:
+        """Resource types to write back, the ones accessed since they were last written.
+
+        Taken for both origins before writing either, the source and destination may be the same mapping.
+        """
+        return sorted(resources.touched if isinstance(resources, ResourcesData) else resources.keys())
+
+    @staticmethod
+    def written(resources: Dict[str, Any], resource_type: str) -> None:
+        """Marks a resource type as written back, it is skipped until accessed again."""
+        if isinstance(resources, ResourcesData):
+            resources.touched.discard(resource_type)
+
+    def changed_resources(
+        self, origin: Origin, resources: Dict[str, Any], resource_types: List[str]
+    ) -> Iterator[Tuple[str, bytes]]:
+        """Yields the resource types whose content differs from storage, with their serialized content.
+
+        A type is considered written once the caller asks for the next one.
+        """
+        for resource_type in resource_types:
+            content = json.dumps(dict.get(resources, resource_type, {})).encode("utf-8")
+            digest = hashlib.sha256(content).digest()
+            if self._digests.get((origin, resource_type)) != digest:
+                yield resource_type, content
+                self._digests[(origin, resource_type)] = digest
+            self.written(resources, resource_type)
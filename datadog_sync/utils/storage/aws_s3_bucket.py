@@ -58,11 +58,13 @@ class AWSS3Bucket(BaseStorage):
                         Bucket=self.bucket_name,
                         Key=key,
                     )
-                    content_body = response.get("Body")
+                    content = response.get("Body").read()
                     try:
-                        data.source[resource_type] = json.load(content_body)
+                        data.source[resource_type] = json.loads(content)
                     except json.decoder.JSONDecodeError:
                         log.warning(f"invalid json in aws source resource file: {resource_type}")
+                        continue
+                    self.loaded(Origin.SOURCE, resource_type, content)
 
         prefix_contents = self.client.list_objects_v2(Bucket=self.bucket_name, Prefix=self.destination_resources_path)
         destination_prefix_exists = "Contents" in prefix_contents
@@ -75,19 +77,23 @@ class AWSS3Bucket(BaseStorage):
                         Bucket=self.bucket_name,
                         Key=key,
                     )
-                    content_body = response.get("Body")
+                    content = response.get("Body").read()
                     try:
-                        data.destination[resource_type] = json.load(content_body)
+                        data.destination[resource_type] = json.loads(content)
                     except json.decoder.JSONDecodeError:
                         log.warning(f"invalid json in aws destination resource file: {resource_type}")
+                        continue
+                    self.loaded(Origin.DESTINATION, resource_type, content)
 
+        data.source.touched.clear()
+        data.destination.touched.clear()
         return data
 
     def put(self, origin: Origin, data: StorageData) -> None:
         log.info("AWS S3 put called")
+        source_types, destination_types = self.pending(data.source), self.pending(data.destination)
         if origin in [Origin.SOURCE, Origin.ALL]:
-            for resource_type, resource_data in data.source.items():
-                binary_data = bytes(json.dumps(resource_data), "UTF-8")
+            for resource_type, binary_data in self.changed_resources(Origin.SOURCE, data.source, source_types):
                 self.client.put_object(
                     Body=binary_data,
                     Bucket=self.bucket_name,
@@ -95,8 +101,9 @@ class AWSS3Bucket(BaseStorage):
                 )
 
         if origin in [Origin.DESTINATION, Origin.ALL]:
-            for resource_type, resource_data in data.destination.items():
-                binary_data = bytes(json.dumps(resource_data), "UTF-8")
+            for resource_type, binary_data in self.changed_resources(
+                Origin.DESTINATION, data.destination, destination_types
+            ):
                 self.client.put_object(
                     Body=binary_data,
                     Bucket=self.bucket_name,
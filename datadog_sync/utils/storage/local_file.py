@@ -6,6 +6,8 @@
 import json
 import logging
 import os
+import tempfile
+from typing import Any, Dict, List
 
 from datadog_sync.constants import (
     Origin,
@@ -13,7 +15,7 @@ from datadog_sync.constants import (
     LOGGER_NAME,
     SOURCE_PATH_DEFAULT,
 )
-from datadog_sync.utils.storage._base_storage import BaseStorage, StorageData
+from datadog_sync.utils.storage._base_storage import BaseStorage, ResourcesData, StorageData
 
 
 log = logging.getLogger(LOGGER_NAME)
@@ -32,43 +34,52 @@ class LocalFile(BaseStorage):
         data = StorageData()
 
         if origin in [Origin.SOURCE, Origin.ALL] and os.path.exists(self.source_resources_path):
-            for file in os.listdir(self.source_resources_path):
-                if file.endswith(".json"):
-                    resource_type = file.split(".")[0]
-                    with open(self.source_resources_path + f"/{file}") as f:
-                        try:
-                            data.source[resource_type] = json.load(f)
-                        except json.decoder.JSONDecodeError:
-                            log.warning(f"invalid json in source resource file: {resource_type}")
+            self.read_resources_files(Origin.SOURCE, self.source_resources_path, data.source)
 
         if origin in [Origin.DESTINATION, Origin.ALL] and os.path.exists(self.destination_resources_path):
-            for file in os.listdir(self.destination_resources_path):
-                if file.endswith(".json"):
-                    resource_type = file.split(".")[0]
-                    with open(self.destination_resources_path + f"/{file}") as f:
-                        try:
-                            data.destination[resource_type] = json.load(f)
-                        except json.decoder.JSONDecodeError:
-                            log.warning(f"invalid json in destination resource file: {resource_type}")
+            self.read_resources_files(Origin.DESTINATION, self.destination_resources_path, data.destination)
 
         return data
 
+    def read_resources_files(self, origin: Origin, path: str, resources: ResourcesData) -> None:
+        for file in os.listdir(path):
+            if file.endswith(".json"):
+                resource_type = file.split(".")[0]
+                with open(path + f"/{file}", "rb") as f:
+                    content = f.read()
+                try:
+                    resources[resource_type] = json.loads(content)
+                except json.decoder.JSONDecodeError:
+                    log.warning(f"invalid json in {origin.value} resource file: {resource_type}")
+                    continue
+                self.loaded(origin, resource_type, content)
+        resources.touched.clear()
+
     def put(self, origin: Origin, data: StorageData) -> None:
+        source_types, destination_types = self.pending(data.source), self.pending(data.destination)
         if origin in [Origin.SOURCE, Origin.ALL]:
             os.makedirs(self.source_resources_path, exist_ok=True)
-            self.write_resources_file(Origin.SOURCE, data)
+            self.write_resources_file(Origin.SOURCE, data.source, source_types)
 
         if origin in [Origin.DESTINATION, Origin.ALL]:
             os.makedirs(self.destination_resources_path, exist_ok=True)
-            self.write_resources_file(origin, data)
+            self.write_resources_file(Origin.DESTINATION, data.destination, destination_types)
 
-    def write_resources_file(self, origin: Origin, data: StorageData) -> None:
-        if origin in [Origin.SOURCE, Origin.ALL]:
-            for resource_type, v in data.source.items():
-                with open(self.source_resources_path + f"/{resource_type}.json", "w+") as f:
-                    json.dump(v, f)
+    def write_resources_file(self, origin: Origin, resources: Dict[str, Any], resource_types: List[str]) -> None:
+        path = self.source_resources_path if origin == Origin.SOURCE else self.destination_resources_path
+        for resource_type, content in self.changed_resources(origin, resources, resource_types):
+            write_file(f"{path}/{resource_type}.json", content)
 
-        if origin in [Origin.DESTINATION, Origin.ALL]:
-            for resource_type, v in data.destination.items():
-                with open(self.destination_resources_path + f"/{resource_type}.json", "w+") as f:
-                    json.dump(v, f)
+
+def write_file(file: str, content: bytes) -> None:
+    """Replaces `file` atomically, an interrupted write leaves the previous content intact."""
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(file), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, file)
+    except BaseException:
+        os.unlink(tmp_file)
+        raise
@@ -0,0 +1,201 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+import hashlib
+import json
+import logging
+import os
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Tuple
+
+from datadog_sync.constants import (
+    Origin,
+    DESTINATION_PATH_DEFAULT,
+    LOGGER_NAME,
+    SOURCE_PATH_DEFAULT,
+)
+from datadog_sync.utils.storage._base_storage import BaseStorage, ResourcesData, StorageData
+from datadog_sync.utils.storage.local_file import write_file
+
+
+log = logging.getLogger(LOGGER_NAME)
+
+# Resources are spread over 256 shards per resource type, by the first two hex digits of the hash of their id
+SHARD_PREFIX_LENGTH = 2
+_EMPTY_DIGEST = hashlib.sha256(b"").digest()
+
+
+class ShardedResources(MutableMapping):
+    """Resources of one type stored as shard files in the `path` directory.
+
+    A shard is read the first time one of its ids is accessed, iterating reads them all. Only the shards whose
+    content changed are written back. When the directory doesn't exist yet, the resources are read from the single
+    `<path>.json` file of the `local` storage type and written back sharded.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._shards: Dict[str, Dict[str, Any]] = {}
+        # Digest of each shard file as last read or written
+        self._digests: Dict[str, bytes] = {}
+        self._all_loaded = False
+        if not os.path.isdir(path) and os.path.isfile(f"{path}.json"):
+            self._load_single_file(f"{path}.json")
+
+    @staticmethod
+    def shard(_id: str) -> str:
+        return hashlib.sha1(str(_id).encode("utf-8")).hexdigest()[:SHARD_PREFIX_LENGTH]
+
+    def __getitem__(self, _id: str) -> Any:
+        return self._load(self.shard(_id))[_id]
+
+    def __setitem__(self, _id: str, resource: Any) -> None:
+        self._load(self.shard(_id))[_id] = resource
+
+    def __delitem__(self, _id: str) -> None:
+        del self._load(self.shard(_id))[_id]
+
+    def __contains__(self, _id: object) -> bool:
+        return isinstance(_id, str) and _id in self._load(self.shard(_id))
+
+    def __iter__(self) -> Iterator[str]:
+        self._load_all()
+        for resources in list(self._shards.values()):
+            yield from resources
+
+    def __len__(self) -> int:
+        self._load_all()
+        return sum(len(resources) for resources in self._shards.values())
+
+    def __repr__(self) -> str:
+        return f"ShardedResources({self.path!r})"
+
+    def clear(self) -> None:
+        # Stored shards are removed on write without being read, an unknown digest never matches
+        for shard in self.stored_shards(self.path):
+            self._digests.setdefault(shard, b"")
+        self._shards = {shard: {} for shard in self._digests}
+        self._all_loaded = True
+
+    def changed_shards(self, path: str) -> Iterator[Tuple[str, bytes]]:
+        """Yields the shards to write in the `path` directory with their content, empty for shards to remove.
+
+        A shard is considered written once the caller asks for the next one.
+        """
+        if path != self.path:
+            # Copied to another directory, e.g. the source state becoming the destination state of a reset
+            self._load_all()
+            for shard in self.stored_shards(path):
+                if shard not in self._shards:
+                    yield shard, b""
+            for shard, resources in sorted(self._shards.items()):
+                yield shard, json.dumps(resources).encode("utf-8") if resources else b""
+            return
+
+        for shard, resources in sorted(self._shards.items()):
+            content = json.dumps(resources).encode("utf-8") if resources else b""
+            digest = hashlib.sha256(content).digest()
+            if self._digests.get(shard, _EMPTY_DIGEST) == digest:
+                continue
+            yield shard, content
+            self._digests[shard] = digest
+
+    @staticmethod
+    def stored_shards(path: str) -> List[str]:
+        try:
+            return [file[: -len(".json")] for file in os.listdir(path) if file.endswith(".json")]
+        except FileNotFoundError:
+            return []
+
+    def _load(self, shard: str) -> Dict[str, Any]:
+        resources = self._shards.get(shard)
+        if resources is None:
+            resources = {}
+            content = b""
+            try:
+                with open(f"{self.path}/{shard}.json", "rb") as f:
+                    content = f.read()
+                resources = json.loads(content)
+            except FileNotFoundError:
+                pass
+            except json.decoder.JSONDecodeError:
+                log.warning(f"invalid json in resource shard file: {self.path}/{shard}.json")
+            self._digests[shard] = hashlib.sha256(content).digest()
+            self._shards[shard] = resources
+        return resources
+
+    def _load_all(self) -> None:
+        if self._all_loaded:
+            return
+        for shard in self.stored_shards(self.path):
+            self._load(shard)
+        self._all_loaded = True
+
+    def _load_single_file(self, file: str) -> None:
+        with open(file, "rb") as f:
+            try:
+                resources = json.load(f)
+            except json.decoder.JSONDecodeError:
+                log.warning(f"invalid json in resource file: {file}")
+                return
+        for _id, resource in resources.items():
+            self._shards.setdefault(self.shard(_id), {})[_id] = resource
+        self._all_loaded = True
+
+
+class LocalShardedFile(BaseStorage):
+    """Local storage with one directory per resource type, read lazily shard by shard."""
+
+    def __init__(
+        self, source_resources_path=SOURCE_PATH_DEFAULT, destination_resources_path=DESTINATION_PATH_DEFAULT
+    ) -> None:
+        super().__init__()
+        self.source_resources_path = source_resources_path
+        self.destination_resources_path = destination_resources_path
+
+    def get(self, origin: Origin) -> StorageData:
+        data = StorageData()
+
+        if origin in [Origin.SOURCE, Origin.ALL]:
+            data.source = self._resources(self.source_resources_path)
+
+        if origin in [Origin.DESTINATION, Origin.ALL]:
+            data.destination = self._resources(self.destination_resources_path)
+
+        return data
+
+    def put(self, origin: Origin, data: StorageData) -> None:
+        source_types, destination_types = self.pending(data.source), self.pending(data.destination)
+        if origin in [Origin.SOURCE, Origin.ALL]:
+            self.write_resources(self.source_resources_path, data.source, source_types)
+
+        if origin in [Origin.DESTINATION, Origin.ALL]:
+            self.write_resources(self.destination_resources_path, data.destination, destination_types)
+
+    def write_resources(self, path: str, resources: Dict[str, Any], resource_types: List[str]) -> None:
+        for resource_type in resource_types:
+            type_resources = dict.get(resources, resource_type)
+            if type_resources is None:
+                self.written(resources, resource_type)
+                continue
+            if not isinstance(type_resources, ShardedResources):
+                sharded = ShardedResources(os.path.join(path, resource_type))
+                sharded.clear()
+                sharded.update(type_resources)
+                type_resources = sharded
+
+            type_path = os.path.join(path, resource_type)
+            os.makedirs(type_path, exist_ok=True)
+            for shard, content in type_resources.changed_shards(type_path):
+                file = f"{type_path}/{shard}.json"
+                if content:
+                    write_file(file, content)
+                elif os.path.exists(file):
+                    os.remove(file)
+            self.written(resources, resource_type)
+
+    @staticmethod
+    def _resources(path: str) -> ResourcesData:
+        return ResourcesData(resource_factory=lambda resource_type: ShardedResources(os.path.join(path, resource_type)))
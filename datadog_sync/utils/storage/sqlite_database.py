@@ -0,0 +1,266 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Set
+
+from datadog_sync.constants import (
+    Origin,
+    LOGGER_NAME,
+    SQLITE_PATH_DEFAULT,
+)
+from datadog_sync.utils.storage._base_storage import BaseStorage, ResourcesData, StorageData
+
+
+log = logging.getLogger(LOGGER_NAME)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    origin TEXT NOT NULL,
+    resource_type TEXT NOT NULL,
+    id TEXT NOT NULL,
+    json TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (origin, resource_type, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS resources_by_id ON resources (resource_type, id);
+"""
+
+
+class SQLiteResources(MutableMapping):
+    """Resources of one type and origin stored as rows, read one id at a time.
+
+    With `write_through`, every resource set or deleted is written to the database right away. Otherwise changes
+    are kept in memory until `write()`. Resources read and then modified in place are written when their content
+    hash differs from the stored one.
+    """
+
+    def __init__(
+        self, connection: sqlite3.Connection, origin: str, resource_type: str, write_through: bool = False
+    ) -> None:
+        self.connection = connection
+        self.origin = origin
+        self.resource_type = resource_type
+        self.write_through = write_through
+        self._loaded: Dict[str, Any] = {}
+        # Content hash of the stored row of each loaded id, missing for ids not stored yet
+        self._hashes: Dict[str, str] = {}
+        self._deleted: Set[str] = set()
+        self._cleared = False
+
+    def __getitem__(self, _id: str) -> Any:
+        if _id in self._loaded:
+            return self._loaded[_id]
+        if self._cleared or _id in self._deleted:
+            raise KeyError(_id)
+        row = self.connection.execute(
+            "SELECT json, content_hash FROM resources WHERE origin = ? AND resource_type = ? AND id = ?",
+            (self.origin, self.resource_type, _id),
+        ).fetchone()
+        if row is None:
+            raise KeyError(_id)
+        resource = self._loaded[_id] = json.loads(row[0])
+        self._hashes[_id] = row[1]
+        return resource
+
+    def __setitem__(self, _id: str, resource: Any) -> None:
+        self._loaded[_id] = resource
+        self._deleted.discard(_id)
+        if self.write_through:
+            with self.connection:
+                self._upsert(self.origin, _id, resource)
+
+    def __delitem__(self, _id: str) -> None:
+        if _id not in self:
+            raise KeyError(_id)
+        self._loaded.pop(_id, None)
+        self._hashes.pop(_id, None)
+        if self.write_through:
+            with self.connection:
+                self._delete(_id)
+        else:
+            self._deleted.add(_id)
+
+    def __contains__(self, _id: object) -> bool:
+        if _id in self._loaded:
+            return True
+        if self._cleared or _id in self._deleted:
+            return False
+        row = self.connection.execute(
+            "SELECT 1 FROM resources WHERE origin = ? AND resource_type = ? AND id = ?",
+            (self.origin, self.resource_type, _id),
+        ).fetchone()
+        return row is not None
+
+    def __iter__(self) -> Iterator[str]:
+        stored = self._stored_ids()
+        yield from stored
+        stored_ids = set(stored)
+        yield from [_id for _id in list(self._loaded) if _id not in stored_ids]
+
+    def __len__(self) -> int:
+        return len(set(self._stored_ids()).union(self._loaded))
+
+    def __repr__(self) -> str:
+        return f"SQLiteResources({self.origin!r}, {self.resource_type!r})"
+
+    def clear(self) -> None:
+        self._loaded.clear()
+        self._hashes.clear()
+        self._deleted.clear()
+        if self.write_through:
+            with self.connection:
+                self._delete_all(self.origin)
+        else:
+            self._cleared = True
+
+    def ids_not_in(self, other: Any) -> Set[str]:
+        """Ids of this mapping missing from `other`, queried from the database when neither has pending changes."""
+        if isinstance(other, SQLiteResources) and other.connection is self.connection and self.synced and other.synced:
+            rows = self.connection.execute(
+                "SELECT r.id FROM resources AS r WHERE r.origin = ? AND r.resource_type = ? AND NOT EXISTS "
+                "(SELECT 1 FROM resources AS o WHERE o.origin = ? AND o.resource_type = ? AND o.id = r.id)",
+                (self.origin, self.resource_type, other.origin, other.resource_type),
+            )
+            return {row[0] for row in rows}
+        return set(self).difference(other)
+
+    @property
+    def synced(self) -> bool:
+        """Whether the stored ids are the ids of the mapping."""
+        return not self._cleared and not self._deleted and all(_id in self._hashes for _id in self._loaded)
+
+    def write(self, origin: str) -> None:
+        """Writes the changes to the rows of `origin`, replaces them all when it isn't the origin of the mapping."""
+        if origin != self.origin:
+            self._delete_all(origin)
+            for _id in self:
+                self._upsert(origin, _id, self[_id], copy=True)
+            return
+
+        if self._cleared:
+            self._delete_all(origin)
+            self._cleared = False
+        for _id in self._deleted:
+            self._delete(_id)
+        self._deleted.clear()
+        for _id, resource in self._loaded.items():
+            self._upsert(origin, _id, resource)
+
+    def _stored_ids(self) -> List[str]:
+        if self._cleared:
+            return []
+        rows = self.connection.execute(
+            "SELECT id FROM resources WHERE origin = ? AND resource_type = ? ORDER BY id",
+            (self.origin, self.resource_type),
+        )
+        return [row[0] for row in rows if row[0] not in self._deleted]
+
+    def _upsert(self, origin: str, _id: str, resource: Any, copy: bool = False) -> None:
+        content = json.dumps(resource)
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        if not copy and self._hashes.get(_id) == content_hash:
+            return
+        self.connection.execute(
+            "INSERT OR REPLACE INTO resources (origin, resource_type, id, json, content_hash, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (origin, self.resource_type, _id, content, content_hash, time.time()),
+        )
+        if not copy:
+            self._hashes[_id] = content_hash
+
+    def _delete(self, _id: str) -> None:
+        self.connection.execute(
+            "DELETE FROM resources WHERE origin = ? AND resource_type = ? AND id = ?",
+            (self.origin, self.resource_type, _id),
+        )
+
+    def _delete_all(self, origin: str) -> None:
+        self.connection.execute(
+            "DELETE FROM resources WHERE origin = ? AND resource_type = ?", (origin, self.resource_type)
+        )
+
+
+class SQLiteDatabase(BaseStorage):
+    """Storage of every resource as a row of a SQLite database.
+
+    The source and destination resources are stored under the `source_origin` and `destination_origin` labels.
+    Destination changes are written as they happen, source changes when the state is dumped.
+    """
+
+    def __init__(
+        self,
+        path: str = SQLITE_PATH_DEFAULT,
+        source_origin: str = Origin.SOURCE.value,
+        destination_origin: str = Origin.DESTINATION.value,
+    ) -> None:
+        super().__init__()
+        self.path = path
+        self.source_origin = source_origin
+        self.destination_origin = destination_origin
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        # Committed rows survive the process being killed without an fsync per row
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        with self.connection:
+            self.connection.executescript(_SCHEMA)
+
+    def get(self, origin: Origin) -> StorageData:
+        data = StorageData()
+
+        if origin in [Origin.SOURCE, Origin.ALL]:
+            data.source = ResourcesData(
+                resource_factory=lambda resource_type: SQLiteResources(
+                    self.connection, self.source_origin, resource_type
+                )
+            )
+
+        if origin in [Origin.DESTINATION, Origin.ALL]:
+            data.destination = ResourcesData(
+                resource_factory=lambda resource_type: SQLiteResources(
+                    self.connection, self.destination_origin, resource_type, write_through=True
+                )
+            )
+
+        return data
+
+    def ids_not_in(self, resources: Dict[str, Any], other: Dict[str, Any]) -> Set[str]:
+        if isinstance(resources, SQLiteResources):
+            return resources.ids_not_in(other)
+        return super().ids_not_in(resources, other)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def put(self, origin: Origin, data: StorageData) -> None:
+        source_types, destination_types = self.pending(data.source), self.pending(data.destination)
+        with self.connection:
+            if origin in [Origin.SOURCE, Origin.ALL]:
+                self.write_resources(self.source_origin, data.source, source_types)
+
+            if origin in [Origin.DESTINATION, Origin.ALL]:
+                self.write_resources(self.destination_origin, data.destination, destination_types)
+
+    def write_resources(self, origin: str, resources: Dict[str, Any], resource_types: List[str]) -> None:
+        for resource_type in resource_types:
+            type_resources = dict.get(resources, resource_type)
+            if type_resources is None:
+                self.written(resources, resource_type)
+                continue
+            if not isinstance(type_resources, SQLiteResources):
+                rows = SQLiteResources(self.connection, origin, resource_type)
+                rows.clear()
+                rows.update(type_resources)
+                type_resources = rows
+            type_resources.write(origin)
+            self.written(resources, resource_type)
@@ -9,3 +9,5 @@ from enum import Enum
 class StorageType(Enum):
     LOCAL_FILE = 1
     AWS_S3_BUCKET = 2
+    LOCAL_SHARDED = 3
+    SQLITE = 4
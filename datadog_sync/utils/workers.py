@@ -4,43 +4,104 @@
 # Copyright 2019 Datadog, Inc.
 
 from __future__ import annotations
-from asyncio import AbstractEventLoop, Future, Queue, QueueEmpty, Task, gather, get_event_loop, sleep
-
+from asyncio import AbstractEventLoop, CancelledError, Event, Future, Queue, Task, ensure_future, gather, get_event_loop
+from collections import defaultdict, deque
+from contextlib import nullcontext, suppress
 from dataclasses import dataclass
+from heapq import heappop, heappush
+from itertools import count
 from traceback import format_exc
-from typing import Awaitable, Callable, List, Optional
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Tuple
 
-from tqdm.asyncio import tqdm
 from tqdm.contrib.logging import logging_redirect_tqdm
 
+from datadog_sync.constants import PROGRESS_BAR, PROGRESS_OFF
 from datadog_sync.utils.configuration import Configuration
+from datadog_sync.utils.progress import ProgressReporter
+
+
+# Placed on the work queue once per worker to signal that no more work will arrive.
+_STOP = object()
+# Items a bounded queue holds per worker, enough to keep every worker busy while the producer waits.
+QUEUE_SIZE_PER_WORKER = 2
+
+
+class WorkQueue(Queue):
+    """Queue handing out items by ascending `priority_key`, in insertion order for equal keys.
+
+    Items parked by the workers until their resource type frees a slot count against `maxsize`.
+    """
+
+    def __init__(self, priority_key: Callable[[Any], Any], maxsize: int = 0) -> None:
+        self._priority_key = priority_key
+        self._seq = count()
+        self.parked = 0
+        super().__init__(maxsize)
+
+    def full(self) -> bool:
+        return self.maxsize > 0 and self.qsize() + self.parked >= self.maxsize
+
+    def park(self) -> None:
+        self.parked += 1
+
+    def unpark(self) -> None:
+        self.parked -= 1
+        # Room freed up for a producer waiting in put()
+        self._wakeup_next(self._putters)
+
+    def _init(self, maxsize: int) -> None:
+        self._queue = []
+
+    def _put(self, item: Any) -> None:
+        heappush(self._queue, (self._priority_key(item), next(self._seq), item))
+
+    def _get(self) -> Any:
+        return heappop(self._queue)[2]
 
 
 class Workers:
     def __init__(self, config: Configuration) -> None:
         self.config: Configuration = config
         self.workers: List[Task] = []
-        self.work_queue: Queue = Queue()
+        self.work_queue: WorkQueue = WorkQueue(self._priority_key)
         self.counter: Counter = Counter()
-        self.pbar: Optional[tqdm] = None
+        self.progress: Optional[ProgressReporter] = None
         self._running_workers_count: int = 0
         self._loop: AbstractEventLoop = get_event_loop()
-        self._shutdown_workers: bool = False
         self._cb: Optional[Awaitable] = None
-        self._cancel_cb: Callable = self.work_queue.empty
+        self._done_event: Optional[Event] = None
+        # Items of a resource type that is already running at its concurrency limit. They are
+        # picked up by the worker that frees the next slot for that type.
+        self._pending: Dict[str, Deque] = defaultdict(deque)
+        self._running_per_type: Dict[str, int] = defaultdict(int)
+        # Optional per item weights, heavier items are handed out first within a resource priority
+        self._item_weights: Dict[Any, Tuple[int, int]] = {}
 
     async def init_workers(
-        self, cb: Awaitable, cancel_cb: Optional[Callable], worker_count: Optional[int], *args, **kwargs
+        self,
+        cb: Awaitable,
+        done_event: Optional[Event],
+        worker_count: Optional[int],
+        *args,
+        item_weights: Optional[Dict[Any, Tuple[int, int]]] = None,
+        bounded: bool = False,
+        **kwargs,
     ) -> Awaitable[None]:
+        """Workers stop once the queue is fully processed and, if given, `done_event` is set.
+
+        A `bounded` queue makes `produce()` wait for room. Callbacks must not `put_nowait` on it.
+        """
         await self._reset()
+        self._item_weights = item_weights or {}
 
         max_workers = self.config.max_workers
         if worker_count:
             max_workers = min(worker_count, max_workers)
+        if bounded:
+            self.work_queue = WorkQueue(self._priority_key, max_workers * QUEUE_SIZE_PER_WORKER)
 
         self._cb = cb
-        if cancel_cb:
-            self._cancel_cb = cancel_cb
+        self._done_event = done_event
         await self._create_workers(max_workers, *args, **kwargs)
 
     async def _create_workers(self, max_workers: int, *args, **kwargs) -> Awaitable[None]:
@@ -50,58 +111,133 @@ class Workers:
         self.workers.append(self._cancel_worker())
 
     async def _worker(self, *args, **kwargs) -> Awaitable[None]:
-        while not self._shutdown_workers or (self._shutdown_workers and not self.work_queue.empty()):
-            try:
-                t = self.work_queue.get_nowait()
-                try:
-                    await self._cb(t, *args, **kwargs)
-                except Exception as e:
-                    self.config.logger.debug(format_exc())
-                    self.config.logger.error(f"Error processing task: {e}")
-                finally:
-                    self.work_queue.task_done()
-                    if self.pbar:
-                        await self._loop.run_in_executor(None, self.pbar.update)
-            except QueueEmpty:
-                pass
-            except Exception as e:
-                self.config.logger.debug(format_exc())
-                self.config.logger.error(f"Error processing task: {e}")
-            await sleep(0)
+        while True:
+            t = await self.work_queue.get()
+            if t is _STOP:
+                self.work_queue.task_done()
+                break
+
+            resource_type = _resource_type(t)
+            if not self._acquire_slot(resource_type):
+                # Don't hold a worker while the resource type is at capacity
+                self._pending[resource_type].append(t)
+                self.work_queue.park()
+                continue
+
+            while t is not None:
+                await self._process(t, *args, **kwargs)
+                t = self._release_slot(resource_type)
         self._running_workers_count -= 1
 
+    async def _process(self, t: Any, *args, **kwargs) -> Awaitable[None]:
+        try:
+            await self._cb(t, *args, **kwargs)
+        except Exception as e:
+            self.config.logger.debug(format_exc())
+            self.config.logger.error(f"Error processing task: {e}")
+        finally:
+            self.work_queue.task_done()
+            if self.progress:
+                self.progress.update(_resource_type(t))
+
+    def _acquire_slot(self, resource_type: Optional[str]) -> bool:
+        limit = self._concurrency_limit(resource_type)
+        if limit is not None and self._running_per_type[resource_type] >= limit:
+            return False
+        self._running_per_type[resource_type] += 1
+        return True
+
+    def _release_slot(self, resource_type: Optional[str]) -> Any:
+        """Release a slot for the resource type. Returns the next pending item of that type, which reuses the slot."""
+        if self._pending[resource_type]:
+            self.work_queue.unpark()
+            return self._pending[resource_type].popleft()
+        self._running_per_type[resource_type] -= 1
+        return None
+
+    def _concurrency_limit(self, resource_type: Optional[str]) -> Optional[int]:
+        if resource_type in self.config.resource_concurrency:
+            return self.config.resource_concurrency[resource_type]
+        if resource_type in self.config.resources:
+            return self.config.resources[resource_type].resource_config.max_concurrency
+        return None
+
+    def _priority_key(self, t: Any) -> Tuple[int, int, int]:
+        priority = 0
+        resource_type = _resource_type(t)
+        if resource_type in self.config.resources:
+            priority = self.config.resources[resource_type].resource_config.priority
+
+        longest_path = fan_out = 0
+        # Import items carry the raw resource dict and can't be hashed, only look up weighted runs
+        if self._item_weights:
+            longest_path, fan_out = self._item_weights.get(t, (0, 0))
+        return -priority, -longest_path, -fan_out
+
     async def _cancel_worker(self) -> None:
-        while True:
-            if await self._loop.run_in_executor(None, self._cancel_cb):
-                self._shutdown_workers = True
-                break
+        if self._done_event is not None:
+            await self._done_event.wait()
+        # task_done() is called once an item has been fully processed, including any items it enqueued
+        await self.work_queue.join()
+        self.close()
+
+    async def produce(self, items: Iterable[Any], done_event: Event) -> None:
+        """Put `items` on the queue as room frees up, then set `done_event` so the workers can stop."""
+        try:
+            for item in items:
+                await self.work_queue.put(item)
+        finally:
+            done_event.set()
+
+    def close(self) -> None:
+        """Stop the workers once the items already queued are processed."""
+        for _ in range(self._running_workers_count):
+            self.work_queue.put_nowait(_STOP)
 
     async def _reset(self) -> Awaitable[None]:
         self.workers.clear()
-        self.work_queue = Queue()
+        self.work_queue = WorkQueue(self._priority_key)
+        self._pending.clear()
+        self._running_per_type.clear()
+        self._item_weights = {}
         self.counter.reset_counter()
-        self._shutdown_workers = False
-        self.pbar = None
+        self._done_event = None
+        self.progress = None
         self._running_workers_count = 0
 
-    async def _refresh_pbar(self) -> Awaitable[None]:
-        while self._running_workers_count > 0 and self.pbar:
-            await self._loop.run_in_executor(None, self.pbar.display)
-
     async def schedule_workers(self, additional_coros: List = []) -> Future:
-        self._shutdown_workers = False
-        return await gather(*self.workers, *additional_coros, return_exceptions=True)
+        """Run the workers along with `additional_coros`, re-raising the first error of the latter."""
+        results = await gather(*self.workers, *additional_coros, return_exceptions=True)
+        for result in results[len(self.workers) :]:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    async def schedule_workers_with_pbar(self, total: Optional[int], additional_coros: List = []) -> Future:
+        mode = self.config.progress
+        if mode == PROGRESS_OFF:
+            return await self.schedule_workers(additional_coros)
 
-    async def schedule_workers_with_pbar(self, total, additional_coros: List = []) -> Future:
-        self.pbar = tqdm(total=total)
+        self.progress = ProgressReporter(total, mode)
+        progress_task = ensure_future(self.progress.run())
+        try:
+            with logging_redirect_tqdm() if self.progress.mode == PROGRESS_BAR else nullcontext():
+                return await self.schedule_workers(additional_coros)
+        finally:
+            self.progress.close()
+            progress_task.cancel()
+            with suppress(CancelledError):
+                await progress_task
+            self.progress = None
 
-        self._shutdown_workers = False
-        with logging_redirect_tqdm():
-            additional_coros.append(self._refresh_pbar())
-            await self.schedule_workers(additional_coros)
 
-        self.pbar.close()
-        self.pbar = None
+def _resource_type(t: Any) -> Optional[str]:
+    """Work items are either a resource type or a tuple starting with the resource type."""
+    if isinstance(t, str):
+        return t
+    if isinstance(t, tuple) and t and isinstance(t[0], str):
+        return t[0]
+    return None
 
 
 @dataclass
@@ -0,0 +1,65 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+import asyncio
+
+from datadog_sync.utils.adaptive_concurrency import AdaptiveConcurrency
+
+
+def test_congestion_halves_limit_once_per_burst():
+    controller = AdaptiveConcurrency("destination", 100)
+
+    controller.on_congestion()
+    controller.on_congestion()
+    assert controller.limit == 50
+    assert controller.congestion_count == 2
+
+    controller._last_decrease = 0.0
+    controller.on_congestion()
+    assert controller.limit == 25
+    assert controller.min_seen_limit == 25
+
+
+def test_congestion_respects_min_limit():
+    controller = AdaptiveConcurrency("destination", 100, min_limit=100)
+
+    controller.on_congestion()
+    assert controller.limit == 100
+
+
+def test_healthy_latency_increases_limit_additively():
+    controller = AdaptiveConcurrency("source", 10, decrease_cooldown=0)
+    controller.on_congestion()
+    assert controller.limit == 5
+
+    for _ in range(5):
+        controller.on_success(0.1)
+    assert controller.limit == 6
+
+    # responses much slower than the baseline do not grow the limit
+    for _ in range(3):
+        controller.on_success(10)
+    assert controller.limit == 6
+
+
+def test_acquire_waits_for_a_free_slot():
+    async def run():
+        controller = AdaptiveConcurrency("source", 2)
+        running = 0
+        max_running = 0
+
+        async def request():
+            nonlocal running, max_running
+            await controller.acquire()
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.001)
+            running -= 1
+            await controller.release()
+
+        await asyncio.gather(*[request() for _ in range(10)])
+        return max_running, controller.in_flight
+
+    assert asyncio.run(run()) == (2, 0)
@@ -0,0 +1,68 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+import asyncio
+
+import pytest
+
+from datadog_sync.utils.base_resource import BaseResource, ResourceConfig
+
+
+class _Paginated(BaseResource):
+    resource_type = "paginated"
+    resource_config = ResourceConfig(base_path="/api/v2/paginated")
+
+    def paginated_resources(self, client):
+        async def pages():
+            yield [{"id": "1"}, {"id": "2"}]
+            yield [{"id": "3"}]
+
+        return pages()
+
+    async def import_resource(self, _id=None, resource=None):
+        pass
+
+    async def pre_resource_action_hook(self, _id, resource):
+        pass
+
+    async def pre_apply_hook(self):
+        pass
+
+    async def create_resource(self, _id, resource):
+        pass
+
+    async def update_resource(self, _id, resource):
+        pass
+
+    async def delete_resource(self, _id):
+        pass
+
+    def connect_id(self, key, r_obj, resource_to_connect):
+        pass
+
+
+class _Unlisted(_Paginated):
+    def paginated_resources(self, client):
+        return None
+
+
+def _collect(resource):
+    async def run():
+        pages = [page async for page in resource.get_resources_pages(None)]
+        return pages, await resource.get_resources(None)
+
+    return asyncio.run(run())
+
+
+def test_paginated_resources_are_streamed_and_collected():
+    pages, resources = _collect(_Paginated(None))
+
+    assert pages == [[{"id": "1"}, {"id": "2"}], [{"id": "3"}]]
+    assert resources == [{"id": "1"}, {"id": "2"}, {"id": "3"}]
+
+
+def test_get_resources_is_required_without_paginated_resources():
+    with pytest.raises(NotImplementedError):
+        _collect(_Unlisted(None))
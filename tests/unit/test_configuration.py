@@ -0,0 +1,51 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from datadog_sync.utils.configuration import _connection_config, _parse_resource_concurrency
+from datadog_sync.utils.custom_client import ConnectionConfig
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (None, {}),
+        ("", {}),
+        ("users=5", {"users": 5}),
+        ("users=5, Roles=2", {"users": 5, "roles": 2}),
+        ("users=5,unknown=2", {"users": 5}),
+    ],
+)
+def test_parse_resource_concurrency(value, expected):
+    config = SimpleNamespace(resources={"users": None, "roles": None}, logger=logging.getLogger(__name__))
+
+    assert _parse_resource_concurrency(config, value) == expected
+
+
+@pytest.mark.parametrize("value", ["users", "users=abc", "users=0"])
+def test_parse_resource_concurrency_invalid(value):
+    config = SimpleNamespace(resources={"users": None}, logger=logging.getLogger(__name__))
+
+    with pytest.raises(ValueError):
+        _parse_resource_concurrency(config, value)
+
+
+def test_connection_config_defaults():
+    connection_config = _connection_config({"max_workers": 50})
+
+    assert connection_config.limit == 50
+    assert connection_config.keepalive_timeout == ConnectionConfig.keepalive_timeout
+    assert connection_config.ttl_dns_cache == ConnectionConfig.ttl_dns_cache
+
+
+def test_connection_config_keeps_explicit_zeros():
+    connection_config = _connection_config({"http_client_keepalive_timeout": 0, "http_client_dns_cache_ttl": 0})
+
+    assert connection_config.keepalive_timeout == 0
+    assert connection_config.ttl_dns_cache == 0
@@ -0,0 +1,200 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+import asyncio
+import gzip
+import json
+import zlib
+
+from datadog_sync.utils.custom_client import ConnectionConfig, CustomClient, PaginationConfig, build_default_headers
+
+
+def test_custom_client_session_uses_connection_config():
+    async def run():
+        connection_config = ConnectionConfig(limit=250, limit_per_host=200, keepalive_timeout=45, ttl_dns_cache=600)
+        client = CustomClient("https://api.datadoghq.com", {}, 60, 30, False, connection_config=connection_config)
+        await client._init_session()
+        try:
+            connector = client.session.connector
+            assert connector.limit == 250
+            assert connector.limit_per_host == 200
+            assert connector._keepalive_timeout == 45
+            assert connector.use_dns_cache and connector._cached_hosts._ttl == 600
+            assert not connector.force_close
+            assert client.session.timeout.total == 30
+        finally:
+            await client._end_session()
+
+    asyncio.run(run())
+
+
+def test_custom_client_default_connection_config():
+    client = CustomClient("https://api.datadoghq.com", {}, 60, 30, False)
+
+    assert client.connection_config == ConnectionConfig()
+    assert client.connection_config.proxy is None
+
+
+def _fake_listing(total, page_size, with_total=True, offset=False):
+    calls = []
+    in_flight = {"current": 0, "max": 0}
+
+    async def func(path, params=None):
+        calls.append(dict(params))
+        in_flight["current"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["current"])
+        await asyncio.sleep(0.01)
+        in_flight["current"] -= 1
+        start = params["offset"] if offset else params["page[number]"] * page_size
+        resp = {"data": list(range(start, min(start + page_size, total)))}
+        if with_total:
+            resp["meta"] = {"page": {"total_count": total}}
+        return resp
+
+    return func, calls, in_flight
+
+
+def test_paginated_request_fetches_remaining_pages_concurrently():
+    client = CustomClient("https://api.datadoghq.com", {}, 60, 30, False, page_concurrency=4)
+    func, calls, in_flight = _fake_listing(total=950, page_size=100)
+    params = {"filter": "x"}
+
+    resources = asyncio.run(client.paginated_request(func)("/api/v2/users", params=params))
+
+    assert resources == list(range(950))
+    assert sorted(c["page[number]"] for c in calls) == list(range(10))
+    assert all(c["filter"] == "x" for c in calls)
+    assert in_flight["max"] == 4
+    # The caller's params are left untouched
+    assert params == {"filter": "x"}
+
+
+def test_paginated_request_reads_ahead_without_total_count():
+    client = CustomClient("https://api.datadoghq.com", {}, 60, 30, False, page_concurrency=3)
+    func, calls, _ = _fake_listing(total=250, page_size=50, with_total=False, offset=True)
+    pagination_config = PaginationConfig(
+        page_size=50,
+        page_number_param="offset",
+        page_number_func=lambda idx, page_size, page_number: page_number + page_size,
+        remaining_func=lambda *args: 1,
+    )
+
+    resources = asyncio.run(client.paginated_request(func)("/api/v2/downtime", pagination_config=pagination_config))
+
+    assert resources == list(range(250))
+    # First page, then read ahead three pages at a time until a page comes back short
+    assert [c["offset"] for c in calls] == [0, 50, 100, 150, 200, 250, 300]
+
+
+def test_paginated_request_sequential_with_single_page_concurrency():
+    client = CustomClient("https://api.datadoghq.com", {}, 60, 30, False, page_concurrency=1)
+    func, calls, in_flight = _fake_listing(total=300, page_size=100, with_total=False)
+    pagination_config = PaginationConfig(remaining_func=lambda *args: 1)
+
+    resources = asyncio.run(client.paginated_request(func)("/api/v1/monitor", pagination_config=pagination_config))
+
+    assert resources == list(range(300))
+    assert [c["page[number]"] for c in calls] == [0, 1, 2, 3]
+    assert in_flight["max"] == 1
+
+
+def test_paginated_pages_yields_pages_in_order_and_drops_read_ahead():
+    client = CustomClient("https://api.datadoghq.com", {}, 60, 30, False, page_concurrency=4)
+    func, calls, _ = _fake_listing(total=1000, page_size=100)
+
+    async def run():
+        pages = []
+        async for page in client.paginated_pages(func)("/api/v2/users"):
+            pages.append(page)
+            if len(pages) == 3:
+                break
+        # Let the cancelled read ahead requests settle
+        await asyncio.sleep(0.05)
+        return pages
+
+    pages = asyncio.run(run())
+
+    assert pages == [list(range(i * 100, (i + 1) * 100)) for i in range(3)]
+    assert len(calls) < 10
+
+
+def test_paginated_pages_reads_ahead_at_most_page_concurrency_pages():
+    client = CustomClient("https://api.datadoghq.com", {}, 60, 30, False, page_concurrency=3)
+    func, calls, _ = _fake_listing(total=1000, page_size=100)
+
+    async def run():
+        pages, ahead = [], []
+        async for page in client.paginated_pages(func)("/api/v2/users"):
+            # Fetched or being fetched but not consumed yet, this page included
+            ahead.append(len(calls) - len(pages))
+            pages.append(page)
+            await asyncio.sleep(0.03)
+        return pages, ahead
+
+    pages, ahead = asyncio.run(run())
+
+    assert len(pages) == 10
+    assert max(ahead) == 3
+    assert len(calls) == 10
+
+
+def test_paginated_pages_stop_reading_ahead_once_the_total_is_reached():
+    client = CustomClient("https://api.datadoghq.com", {}, 60, 30, False, page_concurrency=4)
+    calls = []
+
+    async def func(path, params=None):
+        calls.append(params["page[number]"])
+        await asyncio.sleep(0.01)
+        # Resources were deleted after the first page was listed
+        total = 1000 if params["page[number]"] == 0 else 300
+        start = params["page[number]"] * 100
+        return {"data": list(range(start, min(start + 100, total))), "meta": {"page": {"total_count": total}}}
+
+    async def run():
+        resources = []
+        async for page in client.paginated_pages(func)("/api/v2/users"):
+            resources.extend(page)
+            await asyncio.sleep(0.03)
+        return resources
+
+    resources = asyncio.run(run())
+
+    assert resources == list(range(300))
+    # Pages 1 to 4 were read ahead from the first total, later pages only up to the new one
+    assert calls == [0, 1, 2, 3, 4]
+
+
+def test_custom_client_compresses_large_request_bodies():
+    client = CustomClient(
+        "https://api.datadoghq.com", {}, 60, 30, False, request_compression="gzip", compression_threshold=1024
+    )
+    large = {"widgets": [{"definition": {"title": "t" * 64}}] * 32}
+
+    kwargs = client._with_body(large, {"params": {"a": 1}})
+    assert kwargs["headers"] == {"Content-Encoding": "gzip"}
+    assert kwargs["params"] == {"a": 1}
+    assert json.loads(gzip.decompress(kwargs["data"])) == large
+
+    kwargs = client._with_body({"title": "small"}, {})
+    assert "headers" not in kwargs
+    assert json.loads(kwargs["data"]) == {"title": "small"}
+
+    assert client._with_body(None, {}) == {"data": None}
+
+
+def test_custom_client_deflate_and_disabled_compression():
+    body = {"cells": ["x" * 100] * 10}
+
+    client = CustomClient("https://api.datadoghq.com", {}, 60, 30, False, request_compression="deflate")
+    kwargs = client._with_body(body, {"headers": {"X-Test": "1"}})
+    assert kwargs["headers"] == {"X-Test": "1", "Content-Encoding": "deflate"}
+    assert json.loads(zlib.decompress(kwargs["data"])) == body
+
+    client = CustomClient("https://api.datadoghq.com", {}, 60, 30, False)
+    assert json.loads(client._with_body(body, {})["data"]) == body
+
+
+def test_default_headers_accept_compressed_responses():
+    assert build_default_headers({})["Accept-Encoding"] == "gzip, deflate"
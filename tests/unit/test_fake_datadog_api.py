@@ -0,0 +1,119 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+import asyncio
+import json
+
+from click.testing import CliRunner
+
+from datadog_sync.cli import cli
+from datadog_sync.constants import STATE_JOURNAL_FILE
+from datadog_sync.utils.custom_client import CustomClient
+from tests.utils.fake_datadog_api import FakeDatadogAPI, run_in_thread
+
+
+COUNTS = {
+    "roles": 3,
+    "users": 1200,
+    "teams": 150,
+    "monitors": 40,
+    "dashboards": 12,
+    "notebooks": 230,
+    "synthetics_tests": 5,
+    "downtime_schedules": 260,
+    "powerpacks": 2,
+}
+
+
+def test_fake_api_rate_limit_and_pagination():
+    api = FakeDatadogAPI({"notebooks": 250}, rate_limit=3, rate_limit_period=60)
+
+    async def run(url):
+        client = CustomClient(url, {}, 60, 30, False)
+        await client._init_session()
+        try:
+            first = await client.get("/api/v1/notebooks", params={"start": 200, "count": 100})
+            await client.get("/api/v1/notebooks/1")
+            await client.get("/api/v1/notebooks/2")
+            async with client.session.get(url + "/api/v1/notebooks/3") as resp:
+                return first, resp.status, dict(resp.headers)
+        finally:
+            await client._end_session()
+
+    with run_in_thread(api) as url:
+        first, status, headers = asyncio.run(run(url))
+
+    assert [n["id"] for n in first["data"]] == list(range(201, 251))
+    assert first["meta"]["page"]["total_count"] == 250
+    assert status == 429
+    assert headers["x-ratelimit-remaining"] == "0"
+    assert headers["x-ratelimit-name"] == "get_v1_notebooks"
+
+
+def test_import_against_fake_api(tmp_path):
+    api = FakeDatadogAPI(COUNTS, error_rate=0.02, throttle_rate=0.02, seed=1)
+
+    with run_in_thread(api) as url:
+        ret = CliRunner(mix_stderr=False).invoke(
+            cli,
+            [
+                "import",
+                f"--source-api-url={url}",
+                "--source-api-key=fake",
+                "--source-app-key=fake",
+                "--validate=false",
+                "--verify-ddr-status=false",
+                "--send-metrics=false",
+                "--progress=off",
+                "--http-client-retry-base-delay=0.01",
+                "--http-client-retry-budget=1",
+                f"--resources={','.join(COUNTS)}",
+                f"--source-resources-path={tmp_path}",
+                f"--http-stats-file={tmp_path / 'http_stats.txt'}",
+            ],
+        )
+
+    assert ret.exit_code == 0, ret.stderr
+    for resource_type, count in COUNTS.items():
+        with open(tmp_path / f"{resource_type}.json") as f:
+            assert len(json.load(f)) == count, resource_type
+    assert api.requests_per_route["GET /api/v2/users"] >= 3
+    with open(tmp_path / "http_stats.txt") as f:
+        stats = json.load(f)["source"]
+    assert stats["GET /api/v2/users"]["requests"] >= 3
+    assert sum(s["statuses"].get("503", 0) for s in stats.values()) > 0
+
+
+def test_reset_leaves_the_destination_state_untouched(tmp_path):
+    api = FakeDatadogAPI({"monitors": 30})
+    destination = tmp_path / "destination"
+    destination.mkdir()
+    with open(destination / "monitors.json", "w") as f:
+        json.dump({"source-1": {"id": 1}}, f)
+
+    with run_in_thread(api) as url:
+        ret = CliRunner(mix_stderr=False).invoke(
+            cli,
+            [
+                "reset",
+                f"--destination-api-url={url}",
+                "--destination-api-key=fake",
+                "--destination-app-key=fake",
+                "--validate=false",
+                "--verify-ddr-status=false",
+                "--send-metrics=false",
+                "--progress=off",
+                "--resources=monitors",
+                f"--destination-resources-path={destination}",
+                "--state-journal-compact-interval=5",
+            ],
+            input="y\n",
+        )
+
+    assert ret.exit_code == 0, ret.stderr
+    assert not api.store["monitors"]
+    with open(destination / "monitors.json") as f:
+        assert json.load(f) == {"source-1": {"id": 1}}
+    assert not (destination / STATE_JOURNAL_FILE).exists()
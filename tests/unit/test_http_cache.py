@@ -0,0 +1,80 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+import asyncio
+
+from aiohttp import web
+
+from datadog_sync.utils.custom_client import CustomClient
+from datadog_sync.utils.http_cache import HttpCache
+
+
+def test_http_cache_stores_only_responses_with_validators(tmp_path):
+    async def run():
+        cache = HttpCache(str(tmp_path))
+        await cache.put("a", {"ETag": '"v1"'}, "application/json", b'{"id": "a"}')
+        await cache.put("b", {}, "application/json", b'{"id": "b"}')
+
+        entry = await cache.get("a")
+        assert entry.conditional_headers() == {"If-None-Match": '"v1"'}
+        assert cache.hit(entry) == b'{"id": "a"}'
+        assert await cache.get("b") is None
+        assert (cache.stored, cache.revalidated, cache.bytes_saved) == (1, 1, 11)
+
+    asyncio.run(run())
+
+
+def test_http_cache_ignores_corrupted_entries(tmp_path):
+    async def run():
+        cache = HttpCache(str(tmp_path))
+        key = cache.key(("GET", "/api/v1/dashboard/abc"))
+        await cache.put(key, {"Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}, "application/json", b"{}")
+        with open(cache._file(key), "w") as f:
+            f.write("{not json")
+
+        assert await cache.get(key) is None
+
+    asyncio.run(run())
+
+
+def test_custom_client_revalidates_cached_responses(tmp_path):
+    requests = []
+
+    async def dashboard(request):
+        requests.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304, headers={"ETag": '"v1"'})
+        return web.json_response({"id": "abc", "title": "t"}, headers={"ETag": '"v1"'})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/api/v1/dashboard/abc", dashboard)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        results = []
+        try:
+            # A new client per run, as with separate imports
+            for _ in range(2):
+                client = CustomClient(f"http://127.0.0.1:{port}", {"apiKeyAuth": "k"}, 60, 30, False)
+                client.http_cache = HttpCache(str(tmp_path), name="source")
+                await client._init_session()
+                try:
+                    results.append(await client.get("/api/v1/dashboard/abc"))
+                finally:
+                    await client._end_session()
+        finally:
+            await runner.cleanup()
+        return results, client.http_cache
+
+    results, cache = asyncio.run(run())
+
+    assert results == [{"id": "abc", "title": "t"}] * 2
+    assert requests == [None, '"v1"']
+    assert cache.revalidated == 1
+    assert len(list(tmp_path.rglob("*.json"))) == 1
@@ -0,0 +1,70 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+import asyncio
+
+from datadog_sync.utils.custom_client import CustomClient
+from datadog_sync.utils.http_stats import HttpStats, LatencyHistogram, RequestEvent
+from tests.utils.fake_datadog_api import FakeDatadogAPI, run_in_thread
+
+
+def test_latency_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for ms in range(1, 101):
+        histogram.add(ms / 1000)
+
+    assert histogram.count == 100
+    assert 0.040 <= histogram.percentile(0.5) <= 0.0625
+    assert 0.080 <= histogram.percentile(0.9) <= 0.1
+    assert histogram.percentile(1) == histogram.max == 0.1
+    assert LatencyHistogram().percentile(0.5) == 0
+
+
+def test_http_stats_aggregates_per_route_and_calls_hooks():
+    stats = HttpStats("source")
+    events = []
+    stats.add_hook(events.append)
+    stats.add_hook(lambda event: 1 / 0)
+
+    route = "/api/v1/dashboard/{id}"
+    stats.record(RequestEvent("source", "GET", route, status=429, latency=0.1, sleep=2, bytes_in=10))
+    stats.record(RequestEvent("source", "GET", route, attempt=1, status=200, latency=0.2, bytes_in=100, wait=0.5))
+    stats.record(RequestEvent("source", "POST", "/api/v1/dashboard", status=None, latency=1, bytes_out=50))
+
+    get = stats.routes[f"GET {route}"]
+    assert (get.requests, get.retries, get.throttled, get.throttle_sleep) == (2, 1, 1, 2)
+    assert (get.bytes_in, get.wait, dict(get.statuses)) == (110, 0.5, {"200": 1, "429": 1})
+    assert dict(stats.routes["POST /api/v1/dashboard"].statuses) == {"error": 1}
+    assert len(events) == 3
+
+    summary = stats.summary()
+    # Sleeping on the rate limit counts towards the time of a route
+    assert summary[0].startswith("source GET /api/v1/dashboard/{id}: 2 requests")
+    assert "1 throttled (2.0s)" in summary[0]
+    assert summary[1].startswith("source POST /api/v1/dashboard: 1 requests")
+    assert stats.to_dict()[f"GET {route}"]["latency"]["max"] == 0.2
+
+
+def test_custom_client_records_requests():
+    api = FakeDatadogAPI({"dashboards": 2})
+
+    async def run(url):
+        client = CustomClient(url, {}, 60, 30, False, name="destination")
+        await client._init_session()
+        try:
+            await client.get("/api/v1/dashboard/000-000-000")
+            await client.post("/api/v1/dashboard", {"title": "t" * 1000, "widgets": []})
+        finally:
+            await client._end_session()
+        return client.stats
+
+    with run_in_thread(api) as url:
+        stats = asyncio.run(run(url))
+
+    get = stats.routes["GET /api/v1/dashboard/{id}"]
+    post = stats.routes["POST /api/v1/dashboard"]
+    assert dict(get.statuses) == {"200": 1} and get.bytes_in > 0 and get.bytes_out == 0
+    assert dict(post.statuses) == {"200": 1} and post.bytes_out > 1000
+    assert get.latency.count == 1 and get.latency.total > 0
@@ -0,0 +1,41 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+import json
+
+import pytest
+
+from datadog_sync.utils import json_codec
+from datadog_sync.utils.json_codec import STDLIB_CODEC, default_codec
+
+
+@pytest.mark.parametrize("codec", [c for c in (json_codec.STDLIB_CODEC, json_codec.ORJSON_CODEC) if c is not None])
+def test_codec_round_trip(codec):
+    obj = {"title": "dashboard ✓", "widgets": [{"id": 1, "definition": None}], "ratio": 0.5, "big": 2**70}
+
+    encoded = codec.dumps(obj)
+
+    assert isinstance(encoded, bytes)
+    assert json.loads(encoded) == obj
+    assert codec.loads(encoded) == obj
+
+
+def test_default_codec_prefers_orjson():
+    if json_codec.ORJSON_CODEC is None:
+        assert default_codec() is STDLIB_CODEC
+    else:
+        assert default_codec().name == "orjson"
+    assert default_codec("json") is STDLIB_CODEC
+
+    with pytest.raises(ValueError):
+        default_codec("yaml")
+
+
+def test_default_codec_without_orjson(monkeypatch):
+    monkeypatch.setattr(json_codec, "ORJSON_CODEC", None)
+
+    assert default_codec() is STDLIB_CODEC
+    with pytest.raises(ValueError):
+        default_codec("orjson")
@@ -0,0 +1,56 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+import asyncio
+import logging
+
+from datadog_sync.constants import LOGGER_NAME, PROGRESS_BAR, PROGRESS_LOG
+from datadog_sync.utils.progress import ProgressReporter
+
+
+def test_progress_reporter_coalesces_bar_updates():
+    progress = ProgressReporter(total=10, mode=PROGRESS_BAR)
+    for _ in range(4):
+        progress.update("users")
+    progress.update("roles")
+
+    # the bar is only touched on refresh
+    assert progress._pbar.n == 0
+    progress.refresh()
+    assert progress._pbar.n == 5
+
+    progress.total = 20
+    progress.refresh()
+    assert progress._pbar.total == 20
+    progress.close()
+
+
+def test_progress_reporter_logs_throughput(caplog):
+    async def run():
+        progress = ProgressReporter(total=4, mode=PROGRESS_LOG, refresh_interval=0.01, log_interval=0.02)
+        task = asyncio.ensure_future(progress.run())
+        progress.update("users")
+        progress.update("users")
+        progress.update("roles")
+        await asyncio.sleep(0.05)
+        progress.close()
+        await task
+
+    with caplog.at_level(logging.INFO, logger=LOGGER_NAME):
+        asyncio.run(run())
+
+    lines = [r.getMessage() for r in caplog.records]
+    assert len(lines) >= 2
+    assert lines[-1].startswith("progress: 3/4 items, ")
+    assert "ETA" in lines[-1]
+    assert lines[-1].endswith("(roles: 1, users: 2)")
+
+
+def test_progress_reporter_without_total():
+    progress = ProgressReporter(total=None, mode=PROGRESS_LOG)
+    progress.update()
+
+    assert progress.summary().startswith("progress: 1 items, ")
+    assert "ETA" not in progress.summary()
@@ -0,0 +1,107 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+import asyncio
+import time
+
+import pytest
+
+from datadog_sync.utils.rate_limiter import RateLimiter, request_route
+
+
+def _headers(limit, period, remaining, reset, name="dashboards"):
+    return {
+        "x-ratelimit-name": name,
+        "x-ratelimit-limit": str(limit),
+        "x-ratelimit-period": str(period),
+        "x-ratelimit-remaining": str(remaining),
+        "x-ratelimit-reset": str(reset),
+    }
+
+
+@pytest.mark.parametrize(
+    "method, path, expected",
+    [
+        ("get", "/api/v1/dashboard", ("GET", "/api/v1/dashboard")),
+        ("put", "/api/v1/dashboard/abc-def-123", ("PUT", "/api/v1/dashboard/{id}")),
+        ("get", "/api/v1/monitor/12345?with_downtimes=true", ("GET", "/api/v1/monitor/{id}")),
+        (
+            "patch",
+            "/api/v2/roles/8a3f5c10-2d4b-11ee-9c3e-da7ad0900002/permissions",
+            ("PATCH", "/api/v2/roles/{id}/permissions"),
+        ),
+        ("get", "/api/v1/logs/config/index-order", ("GET", "/api/v1/logs/config/index-order")),
+    ],
+)
+def test_request_route(method, path, expected):
+    assert request_route(method, path) == expected
+
+
+def test_rate_limiter_ignores_unknown_routes_and_headers():
+    async def run():
+        limiter = RateLimiter("destination")
+        limiter.update("get", "/api/v1/dashboard", {})
+        limiter.update("get", "/api/v1/dashboard", {"x-ratelimit-name": "dashboards", "x-ratelimit-limit": "x"})
+        assert limiter.buckets == {}
+
+        start = time.monotonic()
+        await limiter.acquire("get", "/api/v1/dashboard")
+        assert time.monotonic() - start < 0.05
+
+    asyncio.run(run())
+
+
+def test_rate_limiter_waits_for_window_reset():
+    async def run():
+        limiter = RateLimiter("destination")
+        limiter.update("put", "/api/v1/dashboard/abc-def-ghi", _headers(limit=100, period=10, remaining=0, reset=0.2))
+
+        start = time.monotonic()
+        # same route, other id
+        await limiter.acquire("put", "/api/v1/dashboard/jkl-mno-pqr")
+        return time.monotonic() - start, limiter
+
+    waited, limiter = asyncio.run(run())
+
+    assert waited >= 0.15
+    assert limiter.buckets["dashboards"].waited > 0
+    assert str(limiter).startswith("destination client waited")
+
+
+def test_rate_limiter_spreads_requests_over_the_period():
+    async def run():
+        limiter = RateLimiter("source")
+        # 2 requests left, refilling at 20 per second
+        limiter.update("get", "/api/v1/monitor", _headers(limit=2, period=0.1, remaining=2, reset=0.1, name="monitors"))
+
+        start = time.monotonic()
+        for _ in range(4):
+            await limiter.acquire("get", "/api/v1/monitor")
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(run())
+
+    assert 0.08 <= elapsed < 0.5
+
+
+def test_rate_limiter_only_lowers_tokens_on_later_responses():
+    limiter = RateLimiter()
+    limiter.update("get", "/api/v1/dashboard", _headers(limit=100, period=60, remaining=10, reset=30))
+    limiter.update("get", "/api/v1/dashboard", _headers(limit=100, period=60, remaining=50, reset=29))
+
+    assert limiter.buckets["dashboards"].tokens < 11
+
+
+def test_rate_limiter_refills_the_whole_limit_after_a_reset():
+    async def run():
+        limiter = RateLimiter()
+        limiter.update("get", "/api/v1/dashboard", _headers(limit=50, period=60, remaining=0, reset=0.05))
+        await limiter.acquire("get", "/api/v1/dashboard")
+        return limiter.buckets["dashboards"]
+
+    bucket = asyncio.run(run())
+
+    assert bucket.blocked_until == 0.0
+    assert bucket.tokens >= 48
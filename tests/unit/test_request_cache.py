@@ -0,0 +1,153 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+import asyncio
+
+from datadog_sync.utils.request_cache import RequestCache, freeze, request_scope
+
+
+class _Fetcher:
+    def __init__(self, result=None, delay=0.01, error=None):
+        self.calls = 0
+        self.result = result if result is not None else {"data": [{"id": "1"}]}
+        self.delay = delay
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def test_request_scope():
+    assert request_scope("/api/v1/dashboard/abc-def-ghi") == "/api/v1/dashboard"
+    assert request_scope("/api/v2/sensitive-data-scanner/config?x=1") == "/api/v2/sensitive-data-scanner"
+
+
+def test_freeze_is_hashable_and_order_independent():
+    assert freeze({"b": [1, {"c": 2}], "a": 1}) == freeze({"a": 1, "b": [1, {"c": 2}]})
+    hash(freeze({"params": {"page[size]": 100}}))
+
+
+def test_request_cache_coalesces_concurrent_requests():
+    async def run():
+        cache = RequestCache()
+        fetch = _Fetcher()
+        path = "/api/v1/dashboard/abc-def-ghi"
+        results = await asyncio.gather(*(cache.get(("key",), path, fetch) for _ in range(5)))
+        return cache, fetch, results
+
+    cache, fetch, results = asyncio.run(run())
+
+    assert fetch.calls == 1
+    assert cache.coalesced == 4
+    assert all(r == {"data": [{"id": "1"}]} for r in results)
+    # every caller gets its own copy
+    assert len({id(r) for r in results}) == 5
+
+
+def test_request_cache_memoizes_collections_only():
+    async def run():
+        cache = RequestCache(max_entries=10)
+        collection, item = _Fetcher(), _Fetcher()
+
+        first = await cache.get(("list",), "/api/v1/dashboard", collection)
+        first["data"].clear()
+        second = await cache.get(("list",), "/api/v1/dashboard", collection)
+
+        await cache.get(("item",), "/api/v1/dashboard/abc-def-ghi", item)
+        await cache.get(("item",), "/api/v1/dashboard/abc-def-ghi", item)
+        return cache, collection, item, second
+
+    cache, collection, item, second = asyncio.run(run())
+
+    assert collection.calls == 1
+    assert cache.hits == 1
+    assert second == {"data": [{"id": "1"}]}
+    assert item.calls == 2
+
+
+def test_request_cache_does_not_memoize_by_default():
+    async def run():
+        cache = RequestCache()
+        collection = _Fetcher()
+        await cache.get(("list",), "/api/v1/dashboard", collection)
+        await cache.get(("list",), "/api/v1/dashboard", collection)
+        return cache, collection
+
+    cache, collection = asyncio.run(run())
+
+    assert collection.calls == 2
+    assert cache.hits == 0
+
+
+def test_request_cache_waiters_retry_when_the_leader_is_cancelled():
+    async def run():
+        cache = RequestCache()
+        fetch = _Fetcher(delay=0.02)
+        leader = asyncio.ensure_future(cache.get(("k",), "/api/v1/monitor", fetch))
+        await asyncio.sleep(0)
+        waiters = [asyncio.ensure_future(cache.get(("k",), "/api/v1/monitor", fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(*waiters)
+        return fetch, leader, results
+
+    fetch, leader, results = asyncio.run(run())
+
+    assert leader.cancelled()
+    assert results == [{"data": [{"id": "1"}]}] * 2
+    # One waiter takes over, the other shares its request
+    assert fetch.calls == 2
+
+
+def test_request_cache_invalidates_modified_apis():
+    async def run():
+        cache = RequestCache(max_entries=10)
+        dashboards, monitors = _Fetcher(), _Fetcher()
+
+        await cache.get(("dashboards",), "/api/v1/dashboard", dashboards)
+        await cache.get(("monitors",), "/api/v1/monitor", monitors)
+        cache.invalidate("/api/v1/dashboard/abc-def-ghi")
+        await cache.get(("dashboards",), "/api/v1/dashboard", dashboards)
+        await cache.get(("monitors",), "/api/v1/monitor", monitors)
+
+        # a response fetched while the API is modified is not kept
+        slow = _Fetcher(delay=0.05)
+        pending = asyncio.ensure_future(cache.get(("slow",), "/api/v1/monitor", slow))
+        await asyncio.sleep(0.01)
+        cache.invalidate("/api/v1/monitor/1")
+        await pending
+        await cache.get(("slow",), "/api/v1/monitor", slow)
+        return dashboards, monitors, slow
+
+    dashboards, monitors, slow = asyncio.run(run())
+
+    assert dashboards.calls == 2
+    assert monitors.calls == 1
+    assert slow.calls == 2
+
+
+def test_request_cache_shares_errors_and_evicts():
+    async def run():
+        cache = RequestCache(max_entries=1)
+        failing = _Fetcher(error=ValueError("boom"))
+        results = await asyncio.gather(
+            *(cache.get(("k",), "/api/v1/monitor", failing) for _ in range(3)), return_exceptions=True
+        )
+        assert failing.calls == 1
+        assert all(isinstance(r, ValueError) for r in results)
+
+        first, second = _Fetcher(), _Fetcher()
+        await cache.get(("a",), "/api/v1/monitor", first)
+        await cache.get(("b",), "/api/v1/dashboard", second)
+        await cache.get(("a",), "/api/v1/monitor", first)
+        return first
+
+    first = asyncio.run(run())
+
+    assert first.calls == 2
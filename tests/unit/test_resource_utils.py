@@ -3,11 +3,21 @@
 # This product includes software developed at Datadog (https://www.datadoghq.com/).
 # Copyright 2019 Datadog, Inc.
 
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
 import pytest
 from unittest.mock import MagicMock, call
 
 from datadog_sync import models
-from datadog_sync.utils.resource_utils import find_attr
+from datadog_sync.utils.resource_utils import (
+    IncrementalTopologicalSorter,
+    compute_node_weights,
+    find_attr,
+    format_diff,
+    group_resource_types,
+    prep_and_check_diff,
+)
 
 
 @pytest.fixture(scope="class")
@@ -82,3 +92,113 @@ def validate_order_list(order_list, resources):
             return False
 
     return len(order_list) == len(set(order_list))
+
+
+def test_compute_node_weights():
+    graph = {
+        ("roles", "1"): set(),
+        ("users", "1"): {("roles", "1")},
+        ("users", "2"): {("roles", "1")},
+        ("restriction_policies", "1"): {("users", "1"), ("dashboards", "1")},
+        ("dashboards", "1"): set(),
+        ("host_tags", "1"): set(),
+    }
+
+    weights = compute_node_weights(graph)
+
+    assert weights[("roles", "1")] == (3, 2)
+    assert weights[("users", "1")] == (2, 1)
+    assert weights[("users", "2")] == (1, 0)
+    assert weights[("dashboards", "1")] == (2, 1)
+    assert weights[("restriction_policies", "1")] == (1, 0)
+    assert weights[("host_tags", "1")] == (1, 0)
+
+
+def test_group_resource_types():
+    type_dependencies = {
+        "roles": set(),
+        "users": {"roles"},
+        "monitors": {"monitors", "restriction_policies"},
+        "dashboards": {"monitors"},
+        "restriction_policies": {"dashboards", "users"},
+    }
+
+    groups = group_resource_types(type_dependencies)
+
+    assert sorted(sorted(g) for g in groups) == [
+        ["dashboards", "monitors", "restriction_policies"],
+        ["roles"],
+        ["users"],
+    ]
+
+
+def test_incremental_topological_sorter():
+    sorter = IncrementalTopologicalSorter()
+    sorter.add(("users", "1"), ("roles", "1"))
+    sorter.add(("roles", "1"))
+    assert sorter.get_ready() == (("roles", "1"),)
+
+    sorter.done(("roles", "1"))
+    # predecessors that are already done don't hold back nodes added later
+    sorter.add(("users", "2"), ("roles", "1"))
+    assert sorted(sorter.get_ready()) == [("users", "1"), ("users", "2")]
+    assert sorter.is_active()
+
+    sorter.done(("users", "1"), ("users", "2"))
+    # no more nodes are handed out but more can still be added
+    assert sorter.is_active()
+    sorter.close()
+    assert not sorter.is_active()
+    assert sorter.blocked_nodes() == []
+
+    with pytest.raises(ValueError):
+        sorter.add(("users", "3"))
+
+
+def test_incremental_topological_sorter_cycle():
+    sorter = IncrementalTopologicalSorter()
+    sorter.add(("dashboards", "1"), ("monitors", "1"))
+    sorter.add(("monitors", "1"), ("dashboards", "1"))
+    sorter.close()
+
+    assert sorter.get_ready() == ()
+    assert not sorter.is_active()
+    assert sorted(sorter.blocked_nodes()) == [("dashboards", "1"), ("monitors", "1")]
+
+
+def test_prep_and_check_diff():
+    resource_config = models.Dashboards.resource_config
+    source = {"id": "abc", "title": "dash", "author_handle": "someone", "widgets": []}
+
+    resource, changed = prep_and_check_diff(resource_config, dict(source), None)
+    assert changed
+    assert "author_handle" not in resource
+
+    _, changed = prep_and_check_diff(resource_config, dict(source), {"id": "def", "title": "dash", "widgets": []})
+    assert not changed
+
+    _, changed = prep_and_check_diff(resource_config, dict(source), {"id": "def", "title": "old", "widgets": []})
+    assert changed
+
+
+def test_prep_and_check_diff_in_process_pool():
+    resource_config = models.Dashboards.resource_config
+    source = {"id": "abc", "title": "dash", "author_handle": "someone", "widgets": []}
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        resource, changed = executor.submit(
+            prep_and_check_diff, resource_config, source, {"id": "def", "title": "old", "widgets": []}
+        ).result()
+
+    assert changed
+    assert resource == {"title": "dash", "widgets": []}
+
+
+def test_format_diff():
+    resource_config = models.Dashboards.resource_config
+    source = {"id": "abc", "title": "dash", "author_handle": "someone"}
+
+    assert format_diff(resource_config, source, {"id": "def", "title": "dash"}) is None
+    assert "'new_value': 'dash'" in format_diff(resource_config, source, {"id": "def", "title": "old"})
+    # inputs are left untouched
+    assert source["author_handle"] == "someone"
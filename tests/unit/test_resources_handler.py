@@ -0,0 +1,206 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+import asyncio
+import logging
+from collections import defaultdict
+from types import SimpleNamespace
+
+from datadog_sync.utils.resource_utils import (
+    IncrementalTopologicalSorter,
+    group_resource_types,
+    init_topological_sorter,
+)
+from datadog_sync.utils.resources_handler import ResourcesHandler
+from datadog_sync.utils.workers import Counter
+
+
+def _handler(graph, source):
+    state = SimpleNamespace(source=defaultdict(dict, source))
+    handler = ResourcesHandler(SimpleNamespace(state=state))
+    handler.worker = SimpleNamespace(work_queue=asyncio.Queue())
+    handler.sorter = init_topological_sorter(graph)
+    handler._sorter_done = asyncio.Event()
+    return handler
+
+
+def _drain(queue):
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+def test_dispatch_ready_nodes_follows_dependencies():
+    async def run():
+        graph = {
+            ("roles", "1"): set(),
+            ("users", "1"): {("roles", "1")},
+            ("restriction_policies", "1"): {("users", "1")},
+        }
+        source = {"roles": {"1": {}}, "users": {"1": {}}, "restriction_policies": {"1": {}}}
+        handler = _handler(graph, source)
+
+        handler._dispatch_ready_nodes()
+        assert _drain(handler.worker.work_queue) == [("roles", "1")]
+
+        handler.sorter.done(("roles", "1"))
+        handler._dispatch_ready_nodes()
+        assert _drain(handler.worker.work_queue) == [("users", "1")]
+        assert not handler._sorter_done.is_set()
+
+        handler.sorter.done(("users", "1"))
+        handler._dispatch_ready_nodes()
+        assert _drain(handler.worker.work_queue) == [("restriction_policies", "1")]
+
+        handler.sorter.done(("restriction_policies", "1"))
+        handler._dispatch_ready_nodes()
+        assert handler._sorter_done.is_set()
+
+    asyncio.run(run())
+
+
+def test_dispatch_ready_nodes_skips_resources_missing_from_source():
+    async def run():
+        graph = {
+            ("roles", "missing"): set(),
+            ("users", "1"): {("roles", "missing")},
+        }
+        handler = _handler(graph, {"users": {"1": {}}})
+
+        handler._dispatch_ready_nodes()
+        assert _drain(handler.worker.work_queue) == [("users", "1")]
+
+        handler.sorter.done(("users", "1"))
+        handler._dispatch_ready_nodes()
+        assert handler._sorter_done.is_set()
+
+    asyncio.run(run())
+
+
+def test_dispatch_ready_nodes_empty_graph():
+    async def run():
+        handler = _handler({}, {})
+
+        handler._dispatch_ready_nodes()
+        assert handler.worker.work_queue.empty()
+        assert handler._sorter_done.is_set()
+
+    asyncio.run(run())
+
+
+def _pipelined_handler(type_dependencies, graph, source):
+    state = SimpleNamespace(source=defaultdict(dict, source))
+    handler = ResourcesHandler(SimpleNamespace(state=state, logger=logging.getLogger(__name__)))
+    handler.worker = SimpleNamespace(work_queue=asyncio.Queue(), progress=None)
+    handler.sorter = IncrementalTopologicalSorter()
+    handler._sorter_done = asyncio.Event()
+    handler._dependency_graph = {}
+    handler._type_dependencies = type_dependencies
+    handler._type_groups = group_resource_types(type_dependencies)
+    handler._resource_connections = lambda resource_type, _id: (graph.get((resource_type, _id), set()), set())
+    return handler
+
+
+def test_pipelined_migrate_syncs_types_once_their_dependencies_are_imported():
+    async def run():
+        type_dependencies = {"roles": set(), "users": {"roles"}, "host_tags": set()}
+        graph = {("users", "1"): {("roles", "1")}}
+        source = {"roles": {"1": {}}, "users": {"1": {}}, "host_tags": {"1": {}}}
+        handler = _pipelined_handler(type_dependencies, graph, source)
+
+        # users waits for roles to be imported
+        handler._on_type_imported("users")
+        assert _drain(handler.worker.work_queue) == []
+
+        handler._on_type_imported("roles")
+        assert _drain(handler.worker.work_queue) == [("roles", "1")]
+        handler.sorter.done(("roles", "1"))
+        handler._dispatch_ready_nodes()
+        assert _drain(handler.worker.work_queue) == [("users", "1")]
+        handler.sorter.done(("users", "1"))
+        handler._dispatch_ready_nodes()
+        assert not handler._sorter_done.is_set()
+
+        handler._on_type_imported("host_tags")
+        assert _drain(handler.worker.work_queue) == [("host_tags", "1")]
+        handler.sorter.done(("host_tags", "1"))
+        handler._dispatch_ready_nodes()
+        assert handler._sorter_done.is_set()
+
+    asyncio.run(run())
+
+
+def test_pipelined_migrate_releases_dependency_cycles_together():
+    async def run():
+        type_dependencies = {
+            "dashboards": {"monitors"},
+            "monitors": {"restriction_policies"},
+            "restriction_policies": {"dashboards"},
+        }
+        graph = {("dashboards", "1"): {("monitors", "1"), ("monitors", "missing")}}
+        source = {"dashboards": {"1": {}}, "monitors": {"1": {}}, "restriction_policies": {}}
+        handler = _pipelined_handler(type_dependencies, graph, source)
+
+        handler._on_type_imported("dashboards")
+        handler._on_type_imported("monitors")
+        assert _drain(handler.worker.work_queue) == []
+
+        handler._on_type_imported("restriction_policies")
+        assert _drain(handler.worker.work_queue) == [("monitors", "1")]
+        # dependencies missing from source don't hold back their dependents
+        handler.sorter.done(("monitors", "1"))
+        handler._dispatch_ready_nodes()
+        assert _drain(handler.worker.work_queue) == [("dashboards", "1")]
+
+    asyncio.run(run())
+
+
+class _PagedResource:
+    def __init__(self, pages, events):
+        self.pages = pages
+        self.events = events
+
+    async def _get_resources_pages(self, client):
+        for i, page in enumerate(self.pages):
+            self.events.append(f"page {i}")
+            yield page
+        raise ValueError("listing failed")
+
+
+def test_list_resource_type_streams_pages_into_the_queue():
+    async def run():
+        events = []
+        pages = [[{"id": "1"}, {"id": "2"}], [{"id": "3"}]]
+        logger = SimpleNamespace(info=lambda *args, **kwargs: None, error=lambda msg: events.append(msg))
+        config = SimpleNamespace(
+            state=SimpleNamespace(source=defaultdict(dict, {"users": {"old": {}}})),
+            resources={"users": _PagedResource(pages, events)},
+            resources_arg=["users"],
+            source_client=None,
+            logger=logger,
+        )
+        handler = ResourcesHandler(config)
+        handler.worker = SimpleNamespace(work_queue=asyncio.Queue(1), progress=SimpleNamespace(total=None))
+
+        async def consume():
+            for _ in range(3):
+                _, resource = await handler.worker.work_queue.get()
+                events.append(resource["id"])
+
+        counter = Counter()
+        producer_done = asyncio.Event()
+        await asyncio.gather(handler._list_import_items(counter, producer_done), consume())
+
+        # Items of the first page are handed out before the next page is requested
+        assert events.index("1") < events.index("page 1")
+        assert "Error while getting resources users: listing failed" in events
+        assert events.count("3") == 1
+        assert handler.worker.progress.total == 3
+        assert config.state.source["users"] == {}
+        assert counter.failure == 1
+        assert producer_done.is_set()
+
+    asyncio.run(run())
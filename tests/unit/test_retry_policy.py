@@ -0,0 +1,142 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+import asyncio
+from email.utils import formatdate
+import time
+
+import pytest
+from aiohttp import web
+
+from datadog_sync.utils.custom_client import CustomClient
+from datadog_sync.utils.resource_utils import CustomClientHTTPError
+from datadog_sync.utils.retry_policy import RetryBudget, RetryPolicy
+
+
+def test_retry_policy_retryable_statuses():
+    policy = RetryPolicy()
+
+    assert policy.is_retryable(429)
+    assert policy.is_retryable(500)
+    assert policy.is_retryable(503)
+    assert not policy.is_retryable(501)
+    assert not policy.is_retryable(404)
+    assert RetryPolicy(retry_statuses=frozenset({409})).is_retryable(409)
+
+
+def test_retry_policy_exponential_backoff_with_full_jitter():
+    bounds = []
+    policy = RetryPolicy(base_delay=1, max_delay=10, rand=lambda low, high: bounds.append((low, high)) or high)
+
+    delays = [policy.delay(attempt, 503, {}) for attempt in range(6)]
+
+    assert delays == [1, 2, 4, 8, 10, 10]
+    assert all(low == 0 for low, _ in bounds)
+    assert 0 <= RetryPolicy(base_delay=1).delay(3, 500, {}) <= 8
+
+
+def test_retry_policy_honors_server_delays():
+    policy = RetryPolicy(max_delay=30, rand=lambda low, high: pytest.fail("should not be random"))
+
+    assert policy.delay(0, 429, {"x-ratelimit-reset": "42"}) == 42
+    assert policy.delay(0, 503, {"Retry-After": "7"}) == 7
+    assert policy.delay(0, 503, {"Retry-After": "120"}) == 30
+    assert 8 <= policy.delay(0, 503, {"Retry-After": formatdate(time.time() + 10, usegmt=True)}) <= 10
+
+
+def test_retry_budget_is_earned_by_requests():
+    budget = RetryBudget(ratio=0.5, min_retries=1, max_tokens=2)
+
+    assert budget.try_retry()
+    assert not budget.try_retry()
+    for _ in range(10):
+        budget.on_request()
+    assert budget.tokens == 2
+    assert budget.try_retry() and budget.try_retry() and not budget.try_retry()
+    assert (budget.retries, budget.exhausted) == (3, 2)
+
+
+def _serve(statuses, headers=None):
+    requests = []
+
+    async def handler(request):
+        requests.append(time.monotonic())
+        status = statuses.pop(0) if statuses else 200
+        if status != 200:
+            return web.json_response({"errors": ["unavailable"]}, status=status, headers=headers)
+        return web.json_response({"data": []})
+
+    async def start():
+        app = web.Application()
+        app.router.add_get("/api/v2/users", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        return runner, site._server.sockets[0].getsockname()[1]
+
+    return requests, start
+
+
+def test_custom_client_retries_with_backoff():
+    requests, start = _serve([503, 502])
+
+    async def run():
+        runner, port = await start()
+        client = CustomClient(f"http://127.0.0.1:{port}", {}, 60, 30, False, retry_base_delay=0.05)
+        await client._init_session()
+        try:
+            return await client.get("/api/v2/users"), client
+        finally:
+            await client._end_session()
+            await runner.cleanup()
+
+    resp, client = asyncio.run(run())
+
+    assert resp == {"data": []}
+    assert len(requests) == 3
+    assert client.retry_policy.budget.retries == 2
+
+
+def test_custom_client_fails_fast_once_retry_budget_is_spent():
+    requests, start = _serve([503] * 5)
+
+    async def run():
+        runner, port = await start()
+        client = CustomClient(f"http://127.0.0.1:{port}", {}, 60, 30, False, retry_base_delay=0.01)
+        client.retry_policy.budget = RetryBudget(ratio=0, min_retries=1)
+        await client._init_session()
+        try:
+            with pytest.raises(CustomClientHTTPError):
+                await client.get("/api/v2/users")
+        finally:
+            await client._end_session()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+    assert len(requests) == 2
+
+
+def test_custom_client_retries_rate_limited_requests_beyond_the_retry_budget():
+    requests, start = _serve([429] * 50, headers={"x-ratelimit-reset": "0"})
+
+    async def run():
+        runner, port = await start()
+        client = CustomClient(f"http://127.0.0.1:{port}", {}, 60, 30, False)
+        await client._init_session()
+        try:
+            return await asyncio.gather(*(client.get("/api/v2/users", params={"page": i}) for i in range(50))), client
+        finally:
+            await client._end_session()
+            await runner.cleanup()
+
+    resp, client = asyncio.run(run())
+
+    # More than the retry budget holds
+    assert client.retry_policy.budget.tokens < 50
+    assert resp == [{"data": []}] * 50
+    assert len(requests) == 100
+    assert (client.retry_policy.rate_limited, client.retry_policy.budget.exhausted) == (50, 0)
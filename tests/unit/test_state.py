@@ -0,0 +1,307 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+import json
+import os
+import sqlite3
+
+import pytest
+
+from datadog_sync.constants import STATE_JOURNAL_FILE
+from datadog_sync.utils.state import State
+from datadog_sync.utils.storage import _base_storage, local_file
+from datadog_sync.utils.storage.local_sharded_file import ShardedResources
+from datadog_sync.utils.storage.sqlite_database import SQLiteResources
+from datadog_sync.utils.storage.storage_types import StorageType
+
+
+def _state(tmp_path, **kwargs):
+    destination = str(tmp_path / "destination")
+    return State(
+        source_resources_path=str(tmp_path / "source"),
+        destination_resources_path=destination,
+        journal_path=os.path.join(destination, STATE_JOURNAL_FILE),
+        **kwargs,
+    )
+
+
+def test_state_journal_replays_changes_of_an_interrupted_run(tmp_path):
+    state = _state(tmp_path)
+    state.set_destination("dashboards", "a", {"id": "dest-a"})
+    state.set_destination("dashboards", "b", {"id": "dest-b"})
+    state.remove_destination("dashboards", "a")
+    # Killed before dump_state()
+
+    recovered = _state(tmp_path)
+    assert dict(recovered.destination["dashboards"]) == {"b": {"id": "dest-b"}}
+
+
+def test_state_journal_is_removed_once_the_state_is_dumped(tmp_path):
+    state = _state(tmp_path)
+    state.set_destination("monitors", "1", {"id": 2})
+    state.dump_state()
+
+    assert not os.path.exists(tmp_path / "destination" / STATE_JOURNAL_FILE)
+    with open(tmp_path / "destination" / "monitors.json") as f:
+        assert json.load(f) == {"1": {"id": 2}}
+    assert dict(_state(tmp_path).destination["monitors"]) == {"1": {"id": 2}}
+
+
+def test_state_journal_is_compacted_periodically(tmp_path):
+    state = _state(tmp_path, journal_compact_interval=2)
+    state.set_destination("monitors", "1", {"id": 1})
+    state.set_destination("monitors", "2", {"id": 2})
+    state.set_destination("monitors", "3", {"id": 3})
+
+    with open(tmp_path / "destination" / "monitors.json") as f:
+        assert json.load(f) == {"1": {"id": 1}, "2": {"id": 2}}
+    with open(tmp_path / "destination" / STATE_JOURNAL_FILE) as f:
+        assert len(f.readlines()) == 1
+    assert len(_state(tmp_path).destination["monitors"]) == 3
+
+
+def test_state_journal_survives_an_interrupted_compaction(tmp_path, monkeypatch):
+    state = _state(tmp_path, journal_compact_interval=3)
+    state.set_destination("dashboards", "a", {"id": "dest-a"})
+    state.set_destination("monitors", "1", {"id": 1})
+
+    written = []
+
+    def write_file(file, content):
+        if written:
+            raise OSError("killed")
+        written.append(file)
+        local_file_write(file, content)
+
+    local_file_write = local_file.write_file
+    monkeypatch.setattr(local_file, "write_file", write_file)
+    # Compacts, dashboards.json is written and monitors.json is not
+    state.set_destination("monitors", "2", {"id": 2})
+
+    assert written == [str(tmp_path / "destination" / "dashboards.json")]
+    assert not os.path.exists(tmp_path / "destination" / "monitors.json")
+    recovered = _state(tmp_path)
+    assert dict(recovered.destination["dashboards"]) == {"a": {"id": "dest-a"}}
+    assert dict(recovered.destination["monitors"]) == {"1": {"id": 1}, "2": {"id": 2}}
+
+
+def test_state_journal_ignores_a_truncated_last_entry(tmp_path):
+    state = _state(tmp_path)
+    state.set_destination("monitors", "1", {"id": 1})
+    state._journal.close()
+    with open(tmp_path / "destination" / STATE_JOURNAL_FILE, "a") as f:
+        f.write('{"op": "put", "type": "monitors", "id": "2", "reso')
+
+    assert dict(_state(tmp_path).destination["monitors"]) == {"1": {"id": 1}}
+
+
+def test_dump_state_only_writes_changed_resource_types(tmp_path):
+    state = _state(tmp_path)
+    state.source["dashboards"]["a"] = {"id": "a"}
+    state.source["monitors"]["1"] = {"id": 1}
+    state.dump_state()
+
+    state = _state(tmp_path)
+    dashboards_file = tmp_path / "source" / "dashboards.json"
+    os.utime(dashboards_file, (0, 0))
+    monitors_file = tmp_path / "source" / "monitors.json"
+    os.utime(monitors_file, (0, 0))
+    # Read but unchanged
+    assert state.source["dashboards"]["a"] == {"id": "a"}
+    state.source["monitors"]["2"] = {"id": 2}
+    state.dump_state()
+
+    assert os.stat(dashboards_file).st_mtime == 0
+    assert os.stat(monitors_file).st_mtime != 0
+    with open(monitors_file) as f:
+        assert json.load(f) == {"1": {"id": 1}, "2": {"id": 2}}
+    assert sorted(os.listdir(tmp_path / "source")) == ["dashboards.json", "monitors.json"]
+
+
+def test_dump_state_skips_types_written_by_a_previous_dump(tmp_path, monkeypatch):
+    state = _state(tmp_path)
+    state.destination["dashboards"]["a"] = {"id": "a"}
+    state.destination["monitors"]["1"] = {"id": 1}
+    state.dump_state()
+    assert not state.destination.touched
+
+    serialized = []
+    dumps = json.dumps
+    monkeypatch.setattr(_base_storage.json, "dumps", lambda obj: serialized.append(obj) or dumps(obj))
+    state.destination["monitors"]["2"] = {"id": 2}
+    state.dump_state()
+
+    assert serialized == [{"1": {"id": 1}, "2": {"id": 2}}]
+
+
+def test_sharded_state_reads_only_the_shards_accessed(tmp_path):
+    state = _state(tmp_path, type_=StorageType.LOCAL_SHARDED)
+    for i in range(100):
+        state.source["notebooks"][str(i)] = {"id": i}
+    state.dump_state()
+    assert len(os.listdir(tmp_path / "source" / "notebooks")) > 50
+
+    state = _state(tmp_path, type_=StorageType.LOCAL_SHARDED)
+    notebooks = state.source["notebooks"]
+    assert notebooks["42"] == {"id": 42}
+    assert "1000" not in notebooks
+    assert len(notebooks._shards) == 2
+    assert len(notebooks) == 100
+
+
+def test_sharded_state_only_writes_changed_shards(tmp_path):
+    state = _state(tmp_path, type_=StorageType.LOCAL_SHARDED)
+    for i in range(100):
+        state.source["notebooks"][str(i)] = {"id": i}
+    state.dump_state()
+    path = tmp_path / "source" / "notebooks"
+    files = set(os.listdir(path))
+    for file in files:
+        os.utime(path / file, (0, 0))
+
+    state = _state(tmp_path, type_=StorageType.LOCAL_SHARDED)
+    state.source["notebooks"]["42"]["name"] = "updated"
+    del state.source["notebooks"]["7"]
+    state.dump_state()
+
+    # Shards left empty are removed
+    changed = {file for file in os.listdir(path) if os.stat(path / file).st_mtime != 0} | (
+        files - set(os.listdir(path))
+    )
+    assert changed == {f"{ShardedResources.shard('42')}.json", f"{ShardedResources.shard('7')}.json"}
+    state = _state(tmp_path, type_=StorageType.LOCAL_SHARDED)
+    assert state.source["notebooks"]["42"] == {"id": 42, "name": "updated"}
+    assert len(state.source["notebooks"]) == 99
+
+
+def test_sharded_state_converts_single_file_state(tmp_path):
+    state = _state(tmp_path)
+    state.destination["monitors"]["1"] = {"id": 2}
+    state.dump_state()
+
+    state = _state(tmp_path, type_=StorageType.LOCAL_SHARDED)
+    assert state.destination["monitors"]["1"] == {"id": 2}
+    state.dump_state()
+
+    assert os.listdir(tmp_path / "destination" / "monitors") == [f"{ShardedResources.shard('1')}.json"]
+
+
+def test_sharded_state_copies_the_source_state_to_the_destination(tmp_path):
+    state = _state(tmp_path, type_=StorageType.LOCAL_SHARDED)
+    state.source["monitors"]["1"] = {"id": 1}
+    state.destination["monitors"]["2"] = {"id": 2}
+    state.dump_state()
+
+    state = _state(tmp_path, type_=StorageType.LOCAL_SHARDED)
+    state._data.destination = state._data.source
+    assert dict(state.destination["monitors"]) == {"1": {"id": 1}}
+    state.dump_state()
+
+    state = _state(tmp_path, type_=StorageType.LOCAL_SHARDED)
+    assert dict(state.destination["monitors"]) == {"1": {"id": 1}}
+
+
+def test_sharded_state_journal_replays_changes_of_an_interrupted_run(tmp_path):
+    state = _state(tmp_path, type_=StorageType.LOCAL_SHARDED)
+    state.set_destination("dashboards", "a", {"id": "dest-a"})
+    state.set_destination("dashboards", "b", {"id": "dest-b"})
+    state.remove_destination("dashboards", "a")
+
+    recovered = _state(tmp_path, type_=StorageType.LOCAL_SHARDED)
+    assert dict(recovered.destination["dashboards"]) == {"b": {"id": "dest-b"}}
+    recovered.dump_state()
+    assert dict(_state(tmp_path, type_=StorageType.LOCAL_SHARDED).destination["dashboards"]) == {"b": {"id": "dest-b"}}
+
+
+def _sqlite_state(tmp_path):
+    return State(type_=StorageType.SQLITE, sqlite_path=str(tmp_path / "state.db"))
+
+
+def test_sqlite_state_reads_resources_by_id(tmp_path):
+    state = _sqlite_state(tmp_path)
+    for i in range(10):
+        state.source["monitors"][str(i)] = {"id": i}
+    state.dump_state()
+
+    state = _sqlite_state(tmp_path)
+    monitors = state.source["monitors"]
+    assert isinstance(monitors, SQLiteResources)
+    assert monitors["3"] == {"id": 3}
+    assert "10" not in monitors
+    assert list(monitors._loaded) == ["3"]
+    assert sorted(monitors, key=int) == [str(i) for i in range(10)]
+
+
+def test_sqlite_state_writes_destination_changes_right_away(tmp_path):
+    state = _sqlite_state(tmp_path)
+    state.set_destination("monitors", "1", {"id": 10})
+    state.set_destination("monitors", "2", {"id": 20})
+    state.remove_destination("monitors", "1")
+    # Killed before dump_state()
+
+    assert dict(_sqlite_state(tmp_path).destination["monitors"]) == {"2": {"id": 20}}
+
+
+def test_sqlite_state_writes_resources_modified_in_place(tmp_path):
+    state = _sqlite_state(tmp_path)
+    state.source["monitors"]["1"] = {"id": 1}
+    state.dump_state()
+
+    state = _sqlite_state(tmp_path)
+    state.source["monitors"]["1"]["name"] = "updated"
+    state.source["dashboards"].clear()
+    state.dump_state()
+
+    assert _sqlite_state(tmp_path).source["monitors"]["1"] == {"id": 1, "name": "updated"}
+
+
+def test_sqlite_state_resources_to_cleanup(tmp_path):
+    state = _sqlite_state(tmp_path)
+    for _id in ["1", "2", "3"]:
+        state.set_destination("monitors", _id, {"id": _id})
+    state.source["monitors"]["2"] = {"id": "2"}
+    state.dump_state()
+
+    state = _sqlite_state(tmp_path)
+    # Queried from the database
+    assert state.get_resources_to_cleanup(["monitors"]) == {("monitors", "1"): None, ("monitors", "3"): None}
+    # Pending source changes are taken into account
+    state.source["monitors"]["3"] = {"id": "3"}
+    assert state.get_resources_to_cleanup(["monitors"]) == {("monitors", "1"): None}
+
+
+def test_sqlite_state_copies_the_source_state_to_the_destination(tmp_path):
+    state = _sqlite_state(tmp_path)
+    state.source["monitors"]["1"] = {"id": 1}
+    state.set_destination("monitors", "2", {"id": 2})
+    state.dump_state()
+
+    state = _sqlite_state(tmp_path)
+    state._data.destination = state._data.source
+    assert dict(state.destination["monitors"]) == {"1": {"id": 1}}
+    state.dump_state()
+
+    state = _sqlite_state(tmp_path)
+    assert dict(state.destination["monitors"]) == {"1": {"id": 1}}
+    assert dict(state.source["monitors"]) == {"1": {"id": 1}}
+
+
+def test_resources_to_cleanup(tmp_path):
+    state = _state(tmp_path)
+    for _id in ["1", "2", "3"]:
+        state.set_destination("monitors", _id, {"id": _id})
+    state.source["monitors"]["2"] = {"id": "2"}
+
+    assert state.get_resources_to_cleanup(["monitors"]) == {("monitors", "1"): None, ("monitors", "3"): None}
+
+
+def test_sqlite_state_close_releases_the_database(tmp_path):
+    state = _sqlite_state(tmp_path)
+    state.set_destination("monitors", "1", {"id": 1})
+    state.close()
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        state._storage.connection.execute("SELECT 1")
+    assert dict(_sqlite_state(tmp_path).destination["monitors"]) == {"1": {"id": 1}}
@@ -0,0 +1,382 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+import asyncio
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from datadog_sync.constants import PROGRESS_LOG
+from datadog_sync.model.logs_pipelines import LogsPipelines
+from datadog_sync.model.roles import Roles
+from datadog_sync.model.users import Users
+from datadog_sync.utils.base_resource import ResourceConfig
+from datadog_sync.utils.workers import Workers
+
+
+def _config(max_workers=10, resources=None, resource_concurrency=None):
+    return SimpleNamespace(
+        max_workers=max_workers,
+        logger=logging.getLogger(__name__),
+        resources=resources or {},
+        resource_concurrency=resource_concurrency or {},
+        progress=PROGRESS_LOG,
+    )
+
+
+def _resource(max_concurrency=None, priority=0):
+    return SimpleNamespace(
+        resource_config=ResourceConfig(base_path="", max_concurrency=max_concurrency, priority=priority)
+    )
+
+
+@pytest.mark.parametrize("item_count", [0, 1, 250])
+def test_workers_process_all_items(item_count):
+    processed = []
+
+    async def run():
+        workers = Workers(_config())
+
+        async def cb(item):
+            await asyncio.sleep(0)
+            processed.append(item)
+
+        await workers.init_workers(cb, None, None)
+        for i in range(item_count):
+            workers.work_queue.put_nowait(i)
+        await workers.schedule_workers()
+        return workers
+
+    workers = asyncio.run(run())
+
+    assert sorted(processed) == list(range(item_count))
+    assert workers._running_workers_count == 0
+
+
+def test_workers_process_items_added_by_callback():
+    processed = []
+
+    async def run():
+        workers = Workers(_config(max_workers=3))
+
+        async def cb(item):
+            processed.append(item)
+            if item < 20:
+                await asyncio.sleep(0.001)
+                workers.work_queue.put_nowait(item + 1)
+
+        await workers.init_workers(cb, None, None)
+        workers.work_queue.put_nowait(0)
+        await workers.schedule_workers()
+
+    asyncio.run(run())
+
+    assert processed == list(range(21))
+
+
+def test_workers_survive_callback_errors():
+    processed = []
+
+    async def run():
+        workers = Workers(_config(max_workers=2))
+
+        async def cb(item):
+            if item % 2:
+                raise ValueError("boom")
+            processed.append(item)
+
+        await workers.init_workers(cb, None, None)
+        for i in range(10):
+            workers.work_queue.put_nowait(i)
+        await workers.schedule_workers()
+
+    asyncio.run(run())
+
+    assert sorted(processed) == [0, 2, 4, 6, 8]
+
+
+def test_workers_wait_for_done_event():
+    processed = []
+
+    async def run():
+        workers = Workers(_config(max_workers=4))
+        done = asyncio.Event()
+
+        async def cb(item):
+            processed.append(item)
+
+        async def producer():
+            for i in range(5):
+                # the queue is empty in between puts, workers must keep waiting for the done event
+                await asyncio.sleep(0.01)
+                workers.work_queue.put_nowait(i)
+            done.set()
+
+        await workers.init_workers(cb, done, None)
+        await workers.schedule_workers(additional_coros=[producer()])
+
+    asyncio.run(run())
+
+    assert processed == list(range(5))
+
+
+@pytest.mark.parametrize(
+    "resources, resource_concurrency, expected_limits",
+    [
+        ({"logs_pipelines": _resource(max_concurrency=1)}, {}, {"logs_pipelines": 1}),
+        ({}, {"users": 2}, {"users": 2}),
+        ({"users": _resource(max_concurrency=1)}, {"users": 3}, {"users": 3}),
+    ],
+)
+def test_workers_respect_resource_concurrency(resources, resource_concurrency, expected_limits):
+    running = {"logs_pipelines": 0, "users": 0}
+    max_running = {"logs_pipelines": 0, "users": 0}
+    processed = []
+
+    async def run():
+        workers = Workers(_config(max_workers=5, resources=resources, resource_concurrency=resource_concurrency))
+
+        async def cb(item):
+            resource_type, _id = item
+            running[resource_type] += 1
+            max_running[resource_type] = max(max_running[resource_type], running[resource_type])
+            await asyncio.sleep(0.001)
+            running[resource_type] -= 1
+            processed.append(item)
+
+        await workers.init_workers(cb, None, None)
+        for i in range(20):
+            workers.work_queue.put_nowait(("logs_pipelines", str(i)))
+            workers.work_queue.put_nowait(("users", str(i)))
+        await workers.schedule_workers()
+
+    asyncio.run(run())
+
+    assert len(processed) == 40
+    for resource_type, limit in expected_limits.items():
+        assert max_running[resource_type] == limit
+
+
+def test_workers_do_not_block_on_limited_resource_type():
+    order = []
+
+    async def run():
+        workers = Workers(_config(max_workers=2, resources={"logs_pipelines": _resource(max_concurrency=1)}))
+
+        async def cb(item):
+            resource_type, _id = item
+            if resource_type == "logs_pipelines":
+                await asyncio.sleep(0.05)
+            order.append(item)
+
+        await workers.init_workers(cb, None, None)
+        for i in range(3):
+            workers.work_queue.put_nowait(("logs_pipelines", str(i)))
+        for i in range(3):
+            workers.work_queue.put_nowait(("users", str(i)))
+        await workers.schedule_workers()
+
+    asyncio.run(run())
+
+    # users are processed by the second worker while logs pipelines run one at a time
+    assert order[:3] == [("users", "0"), ("users", "1"), ("users", "2")]
+    assert order[3:] == [("logs_pipelines", "0"), ("logs_pipelines", "1"), ("logs_pipelines", "2")]
+
+
+def test_workers_hand_out_higher_priority_resource_types_first():
+    order = []
+
+    async def run():
+        workers = Workers(_config(max_workers=1, resources={"roles": _resource(priority=10)}))
+
+        async def cb(item):
+            order.append(item[0])
+
+        await workers.init_workers(cb, None, None)
+        workers.work_queue.put_nowait(("host_tags", "1"))
+        workers.work_queue.put_nowait(("roles", "1"))
+        workers.work_queue.put_nowait(("host_tags", "2"))
+        await workers.schedule_workers()
+
+    asyncio.run(run())
+
+    assert order == ["roles", "host_tags", "host_tags"]
+
+
+def test_workers_hand_out_heavier_items_first():
+    order = []
+
+    async def run():
+        workers = Workers(_config(max_workers=1))
+
+        async def cb(item):
+            order.append(item)
+
+        item_weights = {("roles", "1"): (3, 100), ("users", "1"): (2, 1), ("users", "2"): (2, 5)}
+        await workers.init_workers(cb, None, None, item_weights=item_weights)
+        workers.work_queue.put_nowait(("host_tags", "1"))
+        workers.work_queue.put_nowait(("users", "1"))
+        workers.work_queue.put_nowait(("users", "2"))
+        workers.work_queue.put_nowait(("roles", "1"))
+        await workers.schedule_workers()
+
+    asyncio.run(run())
+
+    assert order == [("roles", "1"), ("users", "2"), ("users", "1"), ("host_tags", "1")]
+
+
+def test_workers_run_import_items_without_weights():
+    processed = []
+
+    async def run():
+        # Import items hold the raw resource dict, which can't be hashed
+        workers = Workers(_config(max_workers=2, resources={"dashboards": _resource(priority=1)}))
+
+        async def cb(item):
+            processed.append(item[1]["id"])
+
+        await workers.init_workers(cb, None, None)
+        for i in range(3):
+            workers.work_queue.put_nowait(("dashboards", {"id": str(i)}))
+        await workers.schedule_workers()
+
+    asyncio.run(run())
+
+    assert sorted(processed) == ["0", "1", "2"]
+
+
+def test_workers_report_progress_per_resource_type():
+    progress = []
+
+    async def run():
+        workers = Workers(_config(max_workers=2))
+
+        async def cb(item):
+            await asyncio.sleep(0)
+
+        await workers.init_workers(cb, None, None)
+        for i in range(3):
+            workers.work_queue.put_nowait(("users", str(i)))
+        workers.work_queue.put_nowait(("roles", "1"))
+
+        async def watch():
+            while workers.progress is None:
+                await asyncio.sleep(0)
+            progress.append(workers.progress)
+
+        await workers.schedule_workers_with_pbar(total=4, additional_coros=[watch()])
+        assert workers.progress is None
+
+    asyncio.run(run())
+
+    assert progress[0].completed == 4
+    assert dict(progress[0].per_type) == {"users": 3, "roles": 1}
+
+
+def test_workers_bounded_queue_applies_backpressure():
+    processed = []
+    max_queued = []
+
+    async def run():
+        workers = Workers(_config(max_workers=3))
+
+        async def cb(item):
+            max_queued.append(workers.work_queue.qsize())
+            await asyncio.sleep(0)
+            processed.append(item)
+
+        def items():
+            for i in range(100):
+                # the producer only advances as workers free up room
+                assert workers.work_queue.qsize() <= workers.work_queue.maxsize
+                yield i
+
+        done = asyncio.Event()
+        await workers.init_workers(cb, done, None, bounded=True)
+        assert workers.work_queue.maxsize == 6
+        await workers.schedule_workers(additional_coros=[workers.produce(items(), done)])
+
+    asyncio.run(run())
+
+    assert sorted(processed) == list(range(100))
+    assert max(max_queued) <= 6
+
+
+def test_workers_count_parked_items_against_the_queue_bound():
+    processed = []
+    peak = []
+
+    async def run():
+        workers = Workers(_config(max_workers=3, resources={"logs_pipelines": _resource(max_concurrency=1)}))
+
+        async def cb(item):
+            peak.append(workers.work_queue.qsize() + sum(len(items) for items in workers._pending.values()))
+            await asyncio.sleep(0)
+            processed.append(item)
+
+        done = asyncio.Event()
+        await workers.init_workers(cb, done, None, bounded=True)
+        items = (("logs_pipelines", str(i)) for i in range(500))
+        await workers.schedule_workers(additional_coros=[workers.produce(items, done)])
+
+    asyncio.run(run())
+
+    assert len(processed) == 500
+    assert max(peak) <= 6
+
+
+def test_workers_raise_producer_errors():
+    processed = []
+
+    async def run():
+        workers = Workers(_config(max_workers=2))
+
+        async def cb(item):
+            processed.append(item)
+
+        def items():
+            yield 1
+            yield 2
+            raise ValueError("listing failed")
+
+        done = asyncio.Event()
+        await workers.init_workers(cb, done, None, bounded=True)
+        await workers.schedule_workers(additional_coros=[workers.produce(items(), done)])
+
+    with pytest.raises(ValueError, match="listing failed"):
+        asyncio.run(run())
+    # Items produced before the error are still processed
+    assert sorted(processed) == [1, 2]
+
+
+def test_workers_use_the_model_concurrency_and_priority():
+    order = []
+    running = {"logs_pipelines": 0}
+    max_running = {"logs_pipelines": 0}
+
+    async def run():
+        resources = {"logs_pipelines": LogsPipelines, "roles": Roles, "users": Users}
+        workers = Workers(_config(max_workers=4, resources=resources))
+
+        async def cb(item):
+            order.append(item[0])
+            if item[0] == "logs_pipelines":
+                running["logs_pipelines"] += 1
+                max_running["logs_pipelines"] = max(max_running["logs_pipelines"], running["logs_pipelines"])
+                await asyncio.sleep(0.01)
+                running["logs_pipelines"] -= 1
+
+        await workers.init_workers(cb, None, None)
+        for i in range(3):
+            workers.work_queue.put_nowait(("users", str(i)))
+            workers.work_queue.put_nowait(("logs_pipelines", str(i)))
+        workers.work_queue.put_nowait(("roles", "1"))
+        await workers.schedule_workers()
+
+    asyncio.run(run())
+
+    assert order[0] == "roles"
+    assert max_running["logs_pipelines"] == 1
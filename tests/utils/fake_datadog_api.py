@@ -0,0 +1,432 @@
+# Unless explicitly stated otherwise all files in this repository are licensed
+# under the 3-clause BSD style license (see LICENSE).
+# This product includes software developed at Datadog (https://www.datadoghq.com/).
+# Copyright 2019 Datadog, Inc.
+
+"""Stand-in for the Datadog API, used to load test the HTTP layer without a real organization.
+
+It serves the list, get, create, update and delete endpoints of a subset of the resource types from a generated
+dataset, with optional latency, rate limit headers, 429 / 5xx injection and the pagination of each endpoint.
+
+    python -m tests.utils.fake_datadog_api --count users=100000 --count monitors=20000 --latency 0.05
+
+then point `--source-api-url` / `--destination-api-url` to it with any API and application keys.
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from aiohttp import web
+
+
+# Kinds of pagination
+PAGE = "page"
+OFFSET = "offset"
+
+
+@dataclass
+class FakeCollection:
+    resource_type: str
+    path: str
+    # Builds the i-th resource of the dataset
+    make: Callable[[int, Dict[str, List[str]]], Dict]
+    # `data` for the v2 envelope, None for a bare list, otherwise the key holding the list
+    list_key: Optional[str] = "data"
+    # (kind, size param, number or offset param), None for unpaginated listings
+    pagination: Optional[Tuple[str, str, str]] = None
+    total_count: bool = False
+    # Single resources are wrapped in `{"data": ...}`
+    wrap_detail: bool = True
+    id_field: str = "id"
+    # Numeric ids, as in the v1 monitors and notebooks APIs
+    int_ids: bool = False
+    # Extra path segments accepted before the id of a single resource, e.g. `/tests/api/{id}`
+    detail_prefixes: Tuple[str, ...] = ()
+
+
+def _public_id(i: int) -> str:
+    digits = ""
+    for _ in range(9):
+        i, r = divmod(i, 36)
+        digits += "0123456789abcdefghijklmnopqrstuvwxyz"[r]
+    return f"{digits[0:3]}-{digits[3:6]}-{digits[6:9]}"
+
+
+def _ref(ids: Dict[str, List[str]], resource_type: str, i: int) -> List[str]:
+    return [ids[resource_type][i % len(ids[resource_type])]] if ids.get(resource_type) else []
+
+
+COLLECTIONS: Dict[str, FakeCollection] = {
+    c.resource_type: c
+    for c in [
+        FakeCollection(
+            "roles",
+            "/api/v2/roles",
+            lambda i, ids: {
+                "id": f"role-{i}",
+                "type": "roles",
+                "attributes": {"name": f"Role {i}"},
+                "relationships": {"permissions": {"data": []}},
+            },
+            pagination=(PAGE, "page[size]", "page[number]"),
+            total_count=True,
+        ),
+        FakeCollection(
+            "users",
+            "/api/v2/users",
+            lambda i, ids: {
+                "id": f"user-{i}",
+                "type": "users",
+                "attributes": {"name": f"User {i}", "email": f"user{i}@example.com", "disabled": False},
+                "relationships": {"roles": {"data": [{"id": r, "type": "roles"} for r in _ref(ids, "roles", i)]}},
+            },
+            pagination=(PAGE, "page[size]", "page[number]"),
+            total_count=True,
+        ),
+        FakeCollection(
+            "teams",
+            "/api/v2/team",
+            lambda i, ids: {"id": f"team-{i}", "type": "team", "attributes": {"name": f"Team {i}", "handle": f"t{i}"}},
+            pagination=(PAGE, "page[size]", "page[number]"),
+        ),
+        FakeCollection(
+            "monitors",
+            "/api/v1/monitor",
+            lambda i, ids: {
+                "id": 1000 + i,
+                "name": f"Monitor {i}",
+                "type": "metric alert",
+                "query": f"avg(last_5m):avg:system.cpu.user{{host:host-{i}}} > 90",
+                "message": "",
+                "tags": [],
+                "options": {"thresholds": {"critical": 90}},
+            },
+            list_key=None,
+            pagination=(PAGE, "page_size", "page"),
+            wrap_detail=False,
+            int_ids=True,
+        ),
+        FakeCollection(
+            "dashboards",
+            "/api/v1/dashboard",
+            lambda i, ids: {
+                "id": _public_id(i),
+                "title": f"Dashboard {i}",
+                "layout_type": "ordered",
+                "widgets": [
+                    {"definition": {"type": "timeseries", "requests": [{"q": f"avg:metric.{i}.{w}{{*}}"}]}}
+                    for w in range(5)
+                ],
+            },
+            list_key="dashboards",
+            wrap_detail=False,
+        ),
+        FakeCollection(
+            "notebooks",
+            "/api/v1/notebooks",
+            lambda i, ids: {
+                "id": i + 1,
+                "type": "notebooks",
+                "attributes": {
+                    "name": f"Notebook {i}",
+                    "cells": [],
+                    "status": "published",
+                    "time": {"live_span": "1h"},
+                },
+            },
+            pagination=(OFFSET, "count", "start"),
+            total_count=True,
+            int_ids=True,
+        ),
+        FakeCollection(
+            "synthetics_tests",
+            "/api/v1/synthetics/tests",
+            lambda i, ids: {
+                "public_id": _public_id(i),
+                "monitor_id": 5000 + i,
+                "type": "api",
+                "subtype": "http",
+                "name": f"Test {i}",
+                "config": {"request": {"method": "GET", "url": "https://example.com"}, "assertions": []},
+                "locations": ["aws:us-east-1"],
+                "options": {"tick_every": 300},
+                "message": "",
+                "tags": [],
+            },
+            list_key="tests",
+            wrap_detail=False,
+            id_field="public_id",
+            detail_prefixes=("api", "browser"),
+        ),
+        FakeCollection(
+            "downtime_schedules",
+            "/api/v2/downtime",
+            lambda i, ids: {
+                "id": f"downtime-{i}",
+                "type": "downtime",
+                "attributes": {"scope": f"host:host-{i}", "monitor_identifier": {"monitor_tags": ["*"]}},
+            },
+            pagination=(OFFSET, "page[limit]", "page[offset]"),
+        ),
+        FakeCollection(
+            "powerpacks",
+            "/api/v2/powerpacks",
+            lambda i, ids: {
+                "id": f"powerpack-{i}",
+                "type": "powerpack",
+                "attributes": {"name": f"Powerpack {i}", "group_widget": {"definition": {"type": "group"}}},
+            },
+            pagination=(OFFSET, "page[limit]", "page[offset]"),
+        ),
+    ]
+}
+
+
+class FakeDatadogAPI:
+    """In-memory Datadog organization served over HTTP.
+
+    Every `(method, API)` pair gets a rate limit of `rate_limit` requests per `rate_limit_period` seconds, reported
+    with the `x-ratelimit-*` headers. `error_rate` and `throttle_rate` are the odds of answering a request with a
+    503 or a 429 regardless of the rate limit. Each request is delayed by `latency` seconds, with +/- `jitter`.
+    """
+
+    def __init__(
+        self,
+        counts: Dict[str, int],
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_limit: Optional[int] = None,
+        rate_limit_period: int = 10,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.rate_limit_period = rate_limit_period
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.requests = 0
+        self.requests_per_route: Dict[str, int] = {}
+        self._random = random.Random(seed)
+        self._windows: Dict[str, Tuple[float, int]] = {}
+        self._next_id = 0
+        self.store: Dict[str, Dict[str, Dict]] = {}
+        self._lists: Dict[str, List[Dict]] = {}
+
+        ids: Dict[str, List[str]] = {}
+        for resource_type, collection in COLLECTIONS.items():
+            items = [collection.make(i, ids) for i in range(counts.get(resource_type, 0))]
+            self.store[resource_type] = {str(r[collection.id_field]): r for r in items}
+            ids[resource_type] = list(self.store[resource_type])
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware], client_max_size=64 * 1024 * 1024)
+        app.router.add_get("/api/v1/validate", self._validate)
+        app.router.add_get("/api/v2/permissions", self._permissions)
+        app.router.add_post("/api/v1/synthetics/tests/delete", self._delete_synthetics_tests)
+        for resource_type, collection in COLLECTIONS.items():
+            path = collection.path
+            app.router.add_get(path, self._handler(self._list, resource_type))
+            app.router.add_post(path, self._handler(self._create, resource_type))
+            for prefix in ("",) + tuple(f"/{p}" for p in collection.detail_prefixes):
+                app.router.add_get(f"{path}{prefix}/{{id}}", self._handler(self._get, resource_type))
+            app.router.add_put(f"{path}/{{id}}", self._handler(self._update, resource_type))
+            app.router.add_patch(f"{path}/{{id}}", self._handler(self._update, resource_type))
+            app.router.add_delete(f"{path}/{{id}}", self._handler(self._delete, resource_type))
+        return app
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler: Callable) -> web.StreamResponse:
+        self.requests += 1
+        resource = request.match_info.route.resource
+        route = f"{request.method} {resource.canonical if resource is not None else request.path}"
+        self.requests_per_route[route] = self.requests_per_route.get(route, 0) + 1
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(self.latency + self._random.uniform(-self.jitter, self.jitter), 0))
+
+        headers, exceeded = self._rate_limit(request)
+        if exceeded:
+            return web.json_response({"errors": ["Rate limit exceeded"]}, status=429, headers=headers)
+
+        draw = self._random.random()
+        if draw < self.throttle_rate:
+            return web.json_response({"errors": ["Too many requests"]}, status=429, headers={"Retry-After": "1"})
+        if draw < self.throttle_rate + self.error_rate:
+            return web.json_response({"errors": ["Service unavailable"]}, status=503)
+
+        resp = await handler(request)
+        resp.headers.update(headers)
+        return resp
+
+    def _rate_limit(self, request: web.Request) -> Tuple[Dict[str, str], bool]:
+        """Headers of the rate limit of the request, and whether it is exceeded."""
+        if not self.rate_limit:
+            return {}, False
+        name = f"{request.method.lower()}_{'_'.join(request.path.strip('/').split('/')[1:3])}"
+        now = time.monotonic()
+        start, used = self._windows.get(name, (now, 0))
+        if now - start >= self.rate_limit_period:
+            start, used = now, 0
+        used += 1
+        self._windows[name] = (start, used)
+        headers = {
+            "x-ratelimit-name": name,
+            "x-ratelimit-limit": str(self.rate_limit),
+            "x-ratelimit-period": str(self.rate_limit_period),
+            "x-ratelimit-remaining": str(max(self.rate_limit - used, 0)),
+            "x-ratelimit-reset": str(max(int(start + self.rate_limit_period - now), 1)),
+        }
+        return headers, used > self.rate_limit
+
+    def _handler(self, func: Callable, resource_type: str) -> Callable:
+        async def handler(request: web.Request) -> web.StreamResponse:
+            return await func(request, COLLECTIONS[resource_type])
+
+        return handler
+
+    async def _validate(self, request: web.Request) -> web.Response:
+        return web.json_response({"valid": True})
+
+    async def _permissions(self, request: web.Request) -> web.Response:
+        return web.json_response({"data": []})
+
+    async def _delete_synthetics_tests(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        deleted = [_id for _id in body.get("public_ids", []) if self.store["synthetics_tests"].pop(_id, None)]
+        self._lists.pop("synthetics_tests", None)
+        return web.json_response({"deleted_tests": [{"public_id": _id} for _id in deleted]})
+
+    def _items(self, resource_type: str) -> List[Dict]:
+        if resource_type not in self._lists:
+            self._lists[resource_type] = list(self.store[resource_type].values())
+        return self._lists[resource_type]
+
+    async def _list(self, request: web.Request, collection: FakeCollection) -> web.Response:
+        items = self._items(collection.resource_type)
+        page = items
+        if collection.pagination:
+            kind, size_param, number_param = collection.pagination
+            size = int(request.query.get(size_param, 100))
+            number = int(request.query.get(number_param, 0))
+            start = number * size if kind == PAGE else number
+            page = items[start : start + size]
+
+        if collection.list_key is None:
+            return web.json_response(page)
+        body: Dict[str, Any] = {collection.list_key: page}
+        if collection.total_count:
+            body["meta"] = {"page": {"total_count": len(items)}}
+        return web.json_response(body)
+
+    async def _get(self, request: web.Request, collection: FakeCollection) -> web.Response:
+        resource = self.store[collection.resource_type].get(request.match_info["id"])
+        if resource is None:
+            return web.json_response({"errors": ["Not found"]}, status=404)
+        return web.json_response({"data": resource} if collection.wrap_detail else resource)
+
+    async def _create(self, request: web.Request, collection: FakeCollection) -> web.Response:
+        body = await request.json()
+        resource = dict(body["data"] if collection.wrap_detail else body)
+        self._next_id += 1
+        if collection.int_ids:
+            _id = 10**9 + self._next_id
+        elif collection.id_field == "public_id":
+            _id = _public_id(10**9 + self._next_id)
+            resource["monitor_id"] = 10**9 + self._next_id
+        else:
+            _id = f"created-{self._next_id}"
+        resource[collection.id_field] = _id
+        self.store[collection.resource_type][str(_id)] = resource
+        self._lists.pop(collection.resource_type, None)
+        return web.json_response({"data": resource} if collection.wrap_detail else resource)
+
+    async def _update(self, request: web.Request, collection: FakeCollection) -> web.Response:
+        _id = request.match_info["id"]
+        if _id not in self.store[collection.resource_type]:
+            return web.json_response({"errors": ["Not found"]}, status=404)
+        body = await request.json()
+        resource = {**(body["data"] if collection.wrap_detail else body), collection.id_field: _id}
+        self.store[collection.resource_type][_id] = resource
+        self._lists.pop(collection.resource_type, None)
+        return web.json_response({"data": resource} if collection.wrap_detail else resource)
+
+    async def _delete(self, request: web.Request, collection: FakeCollection) -> web.Response:
+        if self.store[collection.resource_type].pop(request.match_info["id"], None) is None:
+            return web.json_response({"errors": ["Not found"]}, status=404)
+        self._lists.pop(collection.resource_type, None)
+        return web.Response(status=204)
+
+
+@contextmanager
+def run_in_thread(api: FakeDatadogAPI, host: str = "127.0.0.1", port: int = 0) -> Iterator[str]:
+    """Serves `api` from a background thread with its own event loop and yields its base URL."""
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(api.app())
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, host, port)
+    loop.run_until_complete(site.start())
+    bound_port = site._server.sockets[0].getsockname()[1]
+
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://{host}:{bound_port}"
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve a fake Datadog API for load testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--count",
+        action="append",
+        default=[],
+        metavar="TYPE=N",
+        help=f"Number of resources of a type to generate, one of {', '.join(COLLECTIONS)}. Can be repeated.",
+    )
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- seconds added to the latency.")
+    parser.add_argument("--rate-limit", type=int, default=None, help="Requests allowed per period and route.")
+    parser.add_argument("--rate-limit-period", type=int, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with a 503.")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered with a 429.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    counts = {}
+    for count in args.count:
+        resource_type, _, n = count.partition("=")
+        if resource_type not in COLLECTIONS:
+            parser.error(f"unsupported resource type: {resource_type}")
+        counts[resource_type] = int(n)
+
+    api = FakeDatadogAPI(
+        counts,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rate_limit,
+        rate_limit_period=args.rate_limit_period,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        seed=args.seed,
+    )
+    web.run_app(api.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()